@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-class AIPrompts:
-    """فئة إعدادات الـ prompts للذكاء الاصطناعي"""
-    
-    @staticmethod
-    def get_system_prompt():
-       
-        return """
+from functools import lru_cache
+from itertools import islice
+from string import Template
+from typing import Dict, Final, Iterable, Optional, Tuple
+
+# الـ prompts الثابتة تُبنى مرة واحدة عند الاستيراد وتُعاد بالمرجع
+
+_SYSTEM_PROMPT: Final[str] = """
 أنت مساعد برمجي متقدم اسمك "وهيب AI". مهمتك هي تحليل أوامر المستخدم المتعلقة بالبرمجة والتصرف بناءً عليها.
 ستستلم دائمًا "الكود الحالي" في الملف و"أمر المستخدم".
 مبرمجك اسمه وهيب
@@ -84,118 +85,156 @@ class AIPrompts:
   "explanation": "تم إصلاح الأخطاء النحوية والمنطقية في الكود"
 }
 """
-    
-    @staticmethod
-    def get_code_analysis_prompt():
-        """prompt خاص بتحليل الكود"""
-        return """
-قم بتحليل الكود التالي وأرجع تقريراً مفصلاً بصيغة JSON:
+
+# قالب موحد لـ prompts الإجراءات؛ كل إجراء يضيف حقوله الخاصة فقط
+_ACTION_PROMPT_TEMPLATE: Final[str] = """
+{instruction} بصيغة JSON:
+
+{{
+  "action": "{action}",
+  "content": "{content}",
+{fields}
+  "explanation": "{explanation}"
+}}
+"""
+
+# action -> (التعليمات، وصف content، الحقول الإضافية، وصف explanation)
+_ACTION_SCHEMAS: Final[Dict[str, Tuple[str, str, Tuple[Tuple[str, str], ...], str]]] = {
+    'analyze_code': (
+        "قم بتحليل الكود التالي وأرجع تقريراً مفصلاً",
+        "تحليل مفصل للكود",
+        (('quality_score', '"درجة من 10"'),
+         ('issues', '["قائمة بالمشاكل"]'),
+         ('suggestions', '["قائمة بالاقتراحات"]')),
+        "شرح التحليل"
+    ),
+    'fix_errors': (
+        "قم بإصلاح الأخطاء في الكود التالي وأرجع النتيجة",
+        "الكود المُصحح",
+        (('errors_found', '["قائمة بالأخطاء التي تم العثور عليها"]'),
+         ('fixes_applied', '["قائمة بالإصلاحات المطبقة"]')),
+        "شرح الإصلاحات"
+    ),
+    'optimize_code': (
+        "قم بتحسين الكود التالي من ناحية الأداء والجودة وأرجع النتيجة",
+        "الكود المُحسن",
+        (('optimizations', '["قائمة بالتحسينات المطبقة"]'),
+         ('performance_gain', '"تقدير تحسن الأداء"')),
+        "شرح التحسينات"
+    ),
+    'explain_code': (
+        "قم بشرح الكود التالي بالتفصيل وأرجع النتيجة",
+        "شرح مفصل للكود",
+        (('main_concepts', '["المفاهيم الرئيسية"]'),
+         ('code_flow', '"تدفق تنفيذ الكود"')),
+        "ملخص الشرح"
+    ),
+    'generate_tests': (
+        "قم بإنشاء اختبارات وحدة للكود التالي وأرجع النتيجة",
+        "كود الاختبارات",
+        (('test_cases', '["قائمة بحالات الاختبار"]'),
+         ('coverage', '"تقدير تغطية الاختبارات"')),
+        "شرح الاختبارات"
+    ),
+}
+
+_ACTION_PROMPTS: Final[Dict[str, str]] = {
+    action: _ACTION_PROMPT_TEMPLATE.format(
+        instruction=instruction,
+        action=action,
+        content=content,
+        fields="\n".join(f'  "{name}": {value},' for name, value in fields),
+        explanation=explanation
+    )
+    for action, (instruction, content, fields, explanation) in _ACTION_SCHEMAS.items()
+}
+
+_FILE_CREATION_TEMPLATE: Final[Template] = Template("""
+قم بإنشاء ملف ${file_type} جديد بناءً على الوصف التالي: ${description}
+
+أرجع النتيجة بصيغة JSON:
 
 {
-  "action": "analyze_code",
-  "content": "تحليل مفصل للكود",
-  "quality_score": "درجة من 10",
-  "issues": ["قائمة بالمشاكل"],
-  "suggestions": ["قائمة بالاقتراحات"],
-  "explanation": "شرح التحليل"
+  "action": "create_file",
+  "content": "محتوى الملف الكامل",
+  "file_name": "اسم_الملف${extension}",
+  "file_type": "${file_type}",
+  "explanation": "شرح ما تم إنشاؤه",
+  "auto_create": true
 }
+
+تأكد من:
+1. إنشاء محتوى كامل ومفيد
+2. اختيار اسم ملف واضح ومناسب
+3. إضافة التوثيق والتعليقات المناسبة
+4. اتباع أفضل الممارسات للغة البرمجة
+""")
+
+_FILE_EXTENSIONS: Final[Dict[str, str]] = {
+    'python': '.py',
+    'javascript': '.js',
+    'html': '.html',
+    'css': '.css',
+    'json': '.json',
+    'markdown': '.md',
+    'text': '.txt'
+}
+
+
+@lru_cache(maxsize=32)
+def _format_context(files: Tuple[str, ...]) -> str:
+    files_context = "- " + "\n- ".join(files)
+    return f"""
+**سياق المشروع:**
+الملفات الموجودة في المشروع:
+{files_context}
+
+استخدم هذا السياق لفهم بنية المشروع واتخاذ قرارات أفضل.
 """
+
+
+class AIPrompts:
+    """فئة إعدادات الـ prompts للذكاء الاصطناعي"""
+    
+    @staticmethod
+    def get_system_prompt():
+        """الـ prompt الأساسي للنظام"""
+        return _SYSTEM_PROMPT
+    
+    @staticmethod
+    def get_code_analysis_prompt():
+        """prompt خاص بتحليل الكود"""
+        return _ACTION_PROMPTS['analyze_code']
     
     @staticmethod
     def get_error_fixing_prompt():
         """prompt خاص بإصلاح الأخطاء"""
-        return """
-قم بإصلاح الأخطاء في الكود التالي وأرجع النتيجة بصيغة JSON:
-
-{
-  "action": "fix_errors",
-  "content": "الكود المُصحح",
-  "errors_found": ["قائمة بالأخطاء التي تم العثور عليها"],
-  "fixes_applied": ["قائمة بالإصلاحات المطبقة"],
-  "explanation": "شرح الإصلاحات"
-}
-"""
+        return _ACTION_PROMPTS['fix_errors']
     
     @staticmethod
     def get_code_optimization_prompt():
         """prompt خاص بتحسين الكود"""
-        return """
-قم بتحسين الكود التالي من ناحية الأداء والجودة وأرجع النتيجة بصيغة JSON:
-
-{
-  "action": "optimize_code",
-  "content": "الكود المُحسن",
-  "optimizations": ["قائمة بالتحسينات المطبقة"],
-  "performance_gain": "تقدير تحسن الأداء",
-  "explanation": "شرح التحسينات"
-}
-"""
+        return _ACTION_PROMPTS['optimize_code']
     
     @staticmethod
     def get_code_explanation_prompt():
         """prompt خاص بشرح الكود"""
-        return """
-قم بشرح الكود التالي بالتفصيل وأرجع النتيجة بصيغة JSON:
-
-{
-  "action": "explain_code",
-  "content": "شرح مفصل للكود",
-  "main_concepts": ["المفاهيم الرئيسية"],
-  "code_flow": "تدفق تنفيذ الكود",
-  "explanation": "ملخص الشرح"
-}
-"""
+        return _ACTION_PROMPTS['explain_code']
     
     @staticmethod
     def get_test_generation_prompt():
         """prompt خاص بإنشاء الاختبارات"""
-        return """
-قم بإنشاء اختبارات وحدة للكود التالي وأرجع النتيجة بصيغة JSON:
-
-{
-  "action": "generate_tests",
-  "content": "كود الاختبارات",
-  "test_cases": ["قائمة بحالات الاختبار"],
-  "coverage": "تقدير تغطية الاختبارات",
-  "explanation": "شرح الاختبارات"
-}
-"""
+        return _ACTION_PROMPTS['generate_tests']
     
     @staticmethod
     def get_file_creation_prompt(file_type: str, description: str):
         """prompt خاص بإنشاء الملفات"""
-        file_extensions = {
-            'python': '.py',
-            'javascript': '.js',
-            'html': '.html',
-            'css': '.css',
-            'json': '.json',
-            'markdown': '.md',
-            'text': '.txt'
-        }
-        
-        extension = file_extensions.get(file_type, '.txt')
-        
-        return f"""
-قم بإنشاء ملف {file_type} جديد بناءً على الوصف التالي: {description}
-
-أرجع النتيجة بصيغة JSON:
-
-{{
-  "action": "create_file",
-  "content": "محتوى الملف الكامل",
-  "file_name": "اسم_الملف{extension}",
-  "file_type": "{file_type}",
-  "explanation": "شرح ما تم إنشاؤه",
-  "auto_create": true
-}}
-
-تأكد من:
-1. إنشاء محتوى كامل ومفيد
-2. اختيار اسم ملف واضح ومناسب
-3. إضافة التوثيق والتعليقات المناسبة
-4. اتباع أفضل الممارسات للغة البرمجة
-"""
+        extension = _FILE_EXTENSIONS.get(file_type, '.txt')
+        return _FILE_CREATION_TEMPLATE.substitute(
+            file_type=file_type,
+            description=description,
+            extension=extension
+        )
     
     @staticmethod
     def format_user_input(user_input: str, current_code: str = "", file_path: str = ""):
@@ -214,17 +253,23 @@ class AIPrompts:
 """
     
     @staticmethod
-    def get_context_prompt(project_files: list = None):
+    def get_prompt_blocks(user_input: str, current_code: str = "", file_path: str = ""):
+        """تقسيم الـ prompt إلى جزء ثابت قابل للتخزين المؤقت وجزء ديناميكي"""
+        # الجزء الثابت (system prompt) يُعلَّم للتخزين المؤقت لدى المزوّد،
+        # بينما يبقى أمر المستخدم والكود الحالي في الجزء الأخير فقط
+        return [
+            {"text": AIPrompts.get_system_prompt(), "cache_control": {"type": "ephemeral"}},
+            {"text": AIPrompts.format_user_input(user_input, current_code, file_path)},
+        ]
+    
+    @staticmethod
+    def get_context_prompt(project_files: Optional[Iterable[str]] = None):
         """إضافة سياق المشروع إلى الـ prompt"""
         if not project_files:
             return ""
         
-        files_context = "\n".join([f"- {file}" for file in project_files[:10]])  # أول 10 ملفات
-        
-        return f"""
-**سياق المشروع:**
-الملفات الموجودة في المشروع:
-{files_context}
-
-استخدم هذا السياق لفهم بنية المشروع واتخاذ قرارات أفضل.
-"""
+        # أول 10 ملفات فقط؛ يقبل أي iterable (مثل generator) دون تحويله بالكامل إلى قائمة
+        head = tuple(islice(project_files, 10))
+        if not head:
+            return ""
+        return _format_context(head)
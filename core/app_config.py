@@ -5,25 +5,73 @@ Application Configuration
 إعدادات التطبيق
 """
 
+import atexit
 import os
 import json
 import logging
+import time
+from functools import lru_cache
 from typing import Dict, Any, Optional, List # أضف List هنا
-from PyQt6.QtCore import QSettings, QStandardPaths
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# مهلة تجميع عمليات حفظ ملف JSON المتتالية (بالمللي ثانية)
+_JSON_SAVE_DELAY_MS = 500
+
+# مدة صلاحية نتائج فحص وجود المسارات (بالثواني)
+_EXISTS_TTL = 2
+
+
+@lru_cache(maxsize=512)
+def _exists_cached(path: str, _bucket: int) -> bool:
+    """os.path.exists مخزنة مؤقتاً ضمن نافذة زمنية واحدة"""
+    return os.path.exists(path)
+
+
+@lru_cache(maxsize=512)
+def _isdir_cached(path: str, _bucket: int) -> bool:
+    """os.path.isdir مخزنة مؤقتاً ضمن نافذة زمنية واحدة"""
+    return os.path.isdir(path)
+
+
+def _ttl_bucket() -> int:
+    return int(time.monotonic() // _EXISTS_TTL)
+
+
+def _json_loads(data: bytes) -> Any:
+    """Decode JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Encode an object as indented UTF-8 JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
 class AppConfig:
     """Application configuration manager"""
+
+    # يتم تحميل ملف .env مرة واحدة فقط عند أول طلب لمفتاح API
+    _dotenv_loaded = False
     
     def __init__(self):
         """Initialize configuration"""
+        # استيراد Qt هنا حتى لا يدفع مستوردو الوحدة تكلفة تحميله
+        from PyQt6.QtCore import QSettings, QTimer
+
         # تهيئة QSettings
         self.settings = QSettings("AI Waheeb Pro Team", "AI Waheeb Pro Enhanced") # اسم المؤسسة واسم التطبيق مهمان لـ QSettings
+        # ذاكرة مؤقتة للقيم المقروءة (write-through) لتجنب استدعاءات QSettings المتكررة
+        self._cache: Dict[str, Any] = {}
+        self._settings_dirty = False
 
         self.app_data_dir = self._get_app_data_dir()
         self.ensure_directories()
@@ -33,6 +81,14 @@ class AppConfig:
         self._config_data_json = {} 
         self.load_json_config() 
 
+        # تجميع عمليات الحفظ المتتالية في عملية كتابة واحدة
+        self._json_dirty = False
+        self._flush_timer = QTimer()
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(_JSON_SAVE_DELAY_MS)
+        self._flush_timer.timeout.connect(self._flush)
+        atexit.register(self._flush)
+
         # Default configuration values
         self.defaults = {
             'window': {
@@ -86,14 +142,28 @@ class AppConfig:
             }
         }
         
+        # نسخة مسطحة من القيم الافتراضية ('window.width' -> 1400) للبحث المباشر
+        self._flat_defaults = self._flatten(self.defaults)
+        
         logger.info(f"Configuration initialized. App data directory: {self.app_data_dir}")
+
+    @staticmethod
+    def _flatten(d: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+        """Flatten a nested defaults dict into dotted keys."""
+        flat = {}
+        for k, v in d.items():
+            key = f"{prefix}{k}"
+            flat[key] = v
+            if isinstance(v, dict):
+                flat.update(AppConfig._flatten(v, f"{key}."))
+        return flat
     
     def load_json_config(self):
         """Loads configuration specific to JSON file (e.g., recent lists)."""
         if os.path.exists(self.config_file_path):
             try:
-                with open(self.config_file_path, "r", encoding="utf-8") as f:
-                    self._config_data_json = json.load(f)
+                with open(self.config_file_path, "rb") as f:
+                    self._config_data_json = _json_loads(f.read())
                 logger.info(f"JSON configuration loaded from: {self.config_file_path}")
             except json.JSONDecodeError as e:
                 logger.error(f"Error decoding config file {self.config_file_path}: {e}. Starting with empty JSON config.")
@@ -106,74 +176,94 @@ class AppConfig:
     
     def save_json_config(self):
         """Saves configuration specific to JSON file (e.g., recent lists)."""
+        tmp_path = self.config_file_path + ".tmp"
         try:
-            with open(self.config_file_path, "w", encoding="utf-8") as f:
-                json.dump(self._config_data_json, f, indent=4, ensure_ascii=False)
+            # الكتابة إلى ملف مؤقت ثم الاستبدال الذري لتجنب ملفات تالفة
+            with open(tmp_path, "wb") as f:
+                f.write(_json_dumps(self._config_data_json))
+            os.replace(tmp_path, self.config_file_path)
+            self._json_dirty = False
             logger.info(f"JSON configuration saved to: {self.config_file_path}")
         except Exception as e:
             logger.error(f"Error saving JSON config file {self.config_file_path}: {e}")
 
+    def _schedule_save(self):
+        """Mark the JSON config dirty and schedule a debounced save."""
+        self._json_dirty = True
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _do_save_json(self):
+        """Flush the JSON config to disk if there are pending changes."""
+        if self._json_dirty:
+            self.save_json_config()
+
+    def _flush(self):
+        """Flush pending QSettings and JSON config changes to disk."""
+        if self._settings_dirty:
+            self.settings.sync()
+            self._settings_dirty = False
+        self._do_save_json()
+
     def _get_app_data_dir(self) -> str:
         """Get application data directory"""
+        from PyQt6.QtCore import QStandardPaths
         app_data = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
         return os.path.join(app_data, "AI Waheeb Pro Enhanced") # تأكد من أن هذا يتطابق مع اسم التطبيق
     
     def ensure_directories(self):
         """Ensure required directories exist"""
-        directories = [
-            self.app_data_dir,
-            os.path.join(self.app_data_dir, 'projects'),
-            os.path.join(self.app_data_dir, 'backups'),
-            os.path.join(self.app_data_dir, 'logs'),
-            os.path.join(self.app_data_dir, 'cache')
-        ]
+        # فحص واحد لمحتويات المجلد بدلاً من makedirs لكل مجلد فرعي
+        try:
+            with os.scandir(self.app_data_dir) as entries:
+                existing = {e.name for e in entries if e.is_dir()}
+        except FileNotFoundError:
+            os.makedirs(self.app_data_dir, exist_ok=True)
+            existing = set()
         
-        for directory in directories:
-            os.makedirs(directory, exist_ok=True)
+        for sub in ('projects', 'backups', 'logs', 'cache'):
+            if sub not in existing:
+                os.makedirs(os.path.join(self.app_data_dir, sub), exist_ok=True)
     
     def get(self, key: str, default: Any = None) -> Any:
         """Get configuration value"""
+        if key in self._cache:
+            return self._cache[key]
+
         # أولاً، حاول الحصول على القيمة من QSettings
         settings_value = self.settings.value(key)
         
         if settings_value is not None:
+            self._cache[key] = settings_value
             return settings_value
         
         # إذا لم تكن موجودة في QSettings، حاول الحصول عليها من القاموس الافتراضي
-        keys = key.split('.')
-        value = self.defaults
-        try:
-            for k in keys:
-                if isinstance(value, dict) and k in value:
-                    value = value[k]
-                else:
-                    return default # إذا لم يتم العثور على المفتاح في الافتراضيات
+        if key in self._flat_defaults:
+            value = self._flat_defaults[key]
+            self._cache[key] = value
             return value
-        except Exception as e:
-            logger.warning(f"Failed to get default value for '{key}': {e}")
-            return default
+        return default # إذا لم يتم العثور على المفتاح في الافتراضيات
     
     def set(self, key: str, value: Any):
         """Set configuration value"""
         try:
             self.settings.setValue(key, value)
-            self.settings.sync() # حفظ التغييرات فوراً إلى QSettings
-            
-            # تحديث قاموس الافتراضيات لتجنب تناقض البيانات في حال تم الوصول إليها بشكل مباشر
-            # هذا يحافظ على التناسق بين القاموس الافتراضي و QSettings
-            keys = key.split('.')
-            current = self.defaults
-            for k in keys[:-1]:
-                if k not in current:
-                    current[k] = {}
-                current = current[k]
-            current[keys[-1]] = value
+            self._cache[key] = value
+            # تأجيل sync إلى الحفظ المجمّع بدلاً من الكتابة إلى القرص مع كل تغيير
+            self._settings_dirty = True
+            if not self._flush_timer.isActive():
+                self._flush_timer.start()
             
         except Exception as e:
             logger.error(f"Failed to set config value for '{key}': {e}")
     
     def get_gemini_api_key(self) -> Optional[str]:
         """Get Gemini API key"""
+        if not AppConfig._dotenv_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            AppConfig._dotenv_loaded = True
+
         # Try environment variable first
         api_key = os.getenv('GEMINI_API_KEY')
         if api_key:
@@ -189,11 +279,16 @@ class AppConfig:
     def get_recent_files(self) -> List[str]:
         """Get recent files list (from JSON config)"""
         recent = self._config_data_json.get('files', {}).get('recent_files', [])
-        return [f for f in recent if os.path.exists(f)] if isinstance(recent, list) else [] 
+        if not isinstance(recent, list):
+            return []
+        bucket = _ttl_bucket()
+        return [f for f in recent if _exists_cached(f, bucket)]
 
     def add_recent_file(self, file_path: str):
         """Add file to recent files (and save to JSON config)"""
-        recent = self.get_recent_files() 
+        # القائمة في الذاكرة هي المصدر الأساسي؛ التحقق من وجود الملفات يتم عند القراءة فقط
+        recent = self._config_data_json.get('files', {}).get('recent_files', [])
+        recent = list(recent) if isinstance(recent, list) else []
         
         # Remove if already exists
         if file_path in recent:
@@ -210,16 +305,20 @@ class AppConfig:
         if 'files' not in self._config_data_json:
             self._config_data_json['files'] = {}
         self._config_data_json['files']['recent_files'] = recent
-        self.save_json_config()
+        self._schedule_save()
     
     def get_recent_folders(self) -> List[str]:
         """Get recent folders list (from JSON config)"""
         recent = self._config_data_json.get('files', {}).get('recent_folders', [])
-        return [f for f in recent if os.path.isdir(f)] if isinstance(recent, list) else [] 
+        if not isinstance(recent, list):
+            return []
+        bucket = _ttl_bucket()
+        return [f for f in recent if _isdir_cached(f, bucket)]
     
     def add_recent_folder(self, folder_path: str):
         """Add folder to recent folders (and save to JSON config, also update last_opened_folder)"""
-        recent = self.get_recent_folders() # استخدم الدالة الحالية للحصول على القائمة المفلتَرة
+        recent = self._config_data_json.get('files', {}).get('recent_folders', [])
+        recent = list(recent) if isinstance(recent, list) else []
         
         # Remove if already exists
         if folder_path in recent:
@@ -236,7 +335,7 @@ class AppConfig:
         if 'files' not in self._config_data_json:
             self._config_data_json['files'] = {}
         self._config_data_json['files']['recent_folders'] = recent
-        self.save_json_config()
+        self._schedule_save()
         
         # *** أضف هذا السطر لتعيين آخر مجلد مفتوح ***
         self.set_last_opened_folder(folder_path)
@@ -262,15 +361,14 @@ class AppConfig:
         else:
             logger.warning(f"Attempted to set invalid last_opened_folder: {folder_path}. Not saving.")
 
+    def _get_group(self, group: str) -> Dict[str, Any]:
+        """Read a settings group (flat dotted keys) through the value cache, merged over its defaults."""
+        return {k: self.get(f"{group}.{k}", v) for k, v in self.defaults[group].items()}
+
     def get_window_geometry(self) -> Dict[str, Any]: # تغيير int إلى Any لأن maximized هو bool
         """Get window geometry"""
-        return {
-            'x': self.get('window.x', self.defaults['window']['x']),
-            'y': self.get('window.y', self.defaults['window']['y']),
-            'width': self.get('window.width', self.defaults['window']['width']),
-            'height': self.get('window.height', self.defaults['window']['height']),
-            'maximized': self.get('window.maximized', self.defaults['window']['maximized'])
-        }
+        window = self._get_group('window')
+        return {k: window[k] for k in ('x', 'y', 'width', 'height', 'maximized')}
     
     def set_window_geometry(self, x: int, y: int, width: int, height: int, maximized: bool = False):
         """Set window geometry"""
@@ -282,11 +380,7 @@ class AppConfig:
     
     def get_editor_settings(self) -> Dict[str, Any]:
         """Get editor settings"""
-        # يمكنك جعل هذا أكثر ديناميكية بدلاً من تكرار المفاتيح
-        settings = {}
-        for key_part, default_val in self.defaults['editor'].items():
-            settings[key_part] = self.get(f'editor.{key_part}', default_val)
-        return settings
+        return self._get_group('editor')
     
     def get_projects_dir(self) -> str:
         """Get projects directory"""
@@ -307,22 +401,18 @@ class AppConfig:
     def export_settings(self, file_path: str):
         """Export settings to file (both QSettings and JSON parts)"""
         try:
-            settings_to_export = {}
+            # 1. Export from QSettings in a single pass
+            settings_to_export = {k: self.settings.value(k) for k in self.settings.allKeys()}
             
-            # 1. Export from QSettings
-            for key in self.settings.allKeys():
-                settings_to_export[key] = self.settings.value(key)
-            
-            # 2. Add JSON specific data (like recent_files/folders)
-            # يجب أن يتم دمج هذا بشكل أذكى لتجنب التكرار إذا كانت QSettings تحفظها أيضاً
-            # أو التأكد من أن QSettings لا تحفظها وأنها فقط في JSON
-            # في حالتك الحالية، يبدو أن get_recent_files/folders تقرأ من _config_data_json،
-            # لذا يجب حفظها بشكل منفصل.
-            settings_to_export['files.recent_files'] = self.get_recent_files()
-            settings_to_export['files.recent_folders'] = self.get_recent_folders()
-
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(settings_to_export, f, indent=2, ensure_ascii=False)
+            # 2. Add JSON specific data (recent_files/folders) straight from memory
+            files_json = self._config_data_json.get('files', {})
+            settings_to_export.update({
+                'files.recent_files': files_json.get('recent_files', []),
+                'files.recent_folders': files_json.get('recent_folders', [])
+            })
+
+            with open(file_path, 'wb') as f:
+                f.write(_json_dumps(settings_to_export))
             
             logger.info(f"Settings exported to: {file_path}")
             
@@ -346,6 +436,7 @@ class AppConfig:
                 else:
                     self.settings.setValue(key, value) # يتم الحفظ إلى QSettings
             
+            self._cache.clear()
             self.settings.sync()
             self.save_json_config() # حفظ إعدادات JSON المستوردة
             logger.info(f"Settings imported from: {file_path}")
@@ -359,6 +450,7 @@ class AppConfig:
         try:
             self.settings.clear()
             self.settings.sync()
+            self._cache.clear()
             
             # إعادة تهيئة _config_data_json
             self._config_data_json = {}
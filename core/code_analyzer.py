@@ -6,16 +6,39 @@ Advanced Code Analyzer
 """
 
 import ast
+import copy
+import hashlib
+import io
+import math
 import re
 import os
-import json
+import sys
+import threading
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Iterable
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# أنماط التعابير النمطية المستخدمة في التحليل، تُترجم مرة واحدة عند الاستيراد
+_SNAKE_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+_PASCAL_RE = re.compile(r'^[A-Z][a-zA-Z0-9]*$')
+_PASSWORD_RE = re.compile(r'password\s*=\s*["\'][^"\']+["\']', re.IGNORECASE)
+# نمط واحد متعدد البدائل لفحوصات JavaScript: var والمقارنة غير الصارمة ==
+_JS_RE = re.compile(r'(?P<var>\bvar\b)|(?P<eqeq>(?<![=!])==(?!=))')
+_JS_LINE_ENDINGS = (';', '{', '}', ':', ',')
+_JS_BLOCK_STARTS = ('if', 'for', 'while', 'function', 'class')
+
+# فوق هذا الحجم (بالأحرف) تُقرأ الأسطر تدريجياً بدلاً من تقسيم الملف كاملاً
+_STREAM_THRESHOLD = 1_000_000
+
+# slots=True (Python 3.10+) يلغي __dict__ لكل كائن ويقلل الذاكرة لكل مشكلة
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 class IssueType(Enum):
     """أنواع المشاكل في الكود"""
     SYNTAX_ERROR = "syntax_error"
@@ -35,7 +58,7 @@ class Severity(Enum):
     LOW = "low"
     INFO = "info"
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class CodeIssue:
     """مشكلة في الكود"""
     type: IssueType
@@ -48,7 +71,7 @@ class CodeIssue:
     code_snippet: str
     fix_suggestion: Optional[str] = None
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class CodeMetrics:
     """مقاييس الكود"""
     lines_of_code: int
@@ -61,92 +84,339 @@ class CodeMetrics:
     code_duplication: float
     maintainability_index: float
 
+class _UnifiedVisitor(ast.NodeVisitor):
+    """زائر AST موحد يجمع فحوصات الأسلوب والتعقيد والممارسات والأمان والأداء والمقاييس في مرور واحد"""
+    
+    def __init__(self, analyzer: 'PythonAnalyzer', code: str):
+        self.analyzer = analyzer
+        # فلاتر نصية سريعة: لا داعي لفحص كل استدعاء إذا لم تظهر الأسماء في الكود أصلاً
+        self._check_print = 'print' in code
+        self._check_eval = 'eval' in code or 'exec' in code
+        if not (self._check_print or self._check_eval):
+            self.visit_Call = self.generic_visit
+        self.issues: List[CodeIssue] = []
+        self._append = self.issues.append
+        self.functions_count = 0
+        self.classes_count = 0
+        self.imports_count = 0
+        self.total_complexity = 0
+        # تعقيد الدالة الجاري حسابها (الأعمق في الأعلى)
+        self.complexity_stack: List[int] = []
+        # id(عقدة الدالة) -> التعقيد الدوري
+        self.complexities: Dict[int, int] = {}
+        # عمق الحلقات الحالي أثناء المرور
+        self._loop_depth = 0
+        # مقاييس Halstead: المعاملات (operators) والمعامَلات (operands) الفريدة والإجمالية
+        self._operators = set()
+        self._operands = set()
+        self.total_operators = 0
+        self.total_operands = 0
+    
+    def _add_complexity(self, amount: int = 1):
+        if self.complexity_stack:
+            self.complexity_stack[-1] += amount
+    
+    def _add_operator(self, op: ast.AST, count: int = 1):
+        self._operators.add(type(op))
+        self.total_operators += count
+    
+    def halstead_volume(self) -> float:
+        """حجم Halstead: V = (N1 + N2) * log2(n1 + n2)"""
+        vocabulary = len(self._operators) + len(self._operands)
+        if vocabulary < 2:
+            return 0.0
+        return (self.total_operators + self.total_operands) * math.log2(vocabulary)
+    
+    def visit_Name(self, node: ast.Name):
+        self._operands.add(node.id)
+        self.total_operands += 1
+    
+    def visit_Constant(self, node: ast.Constant):
+        value = node.value
+        # النوع جزء من المفتاح حتى لا يتطابق 1 مع True
+        self._operands.add((type(value), value))
+        self.total_operands += 1
+    
+    def visit_BinOp(self, node: ast.BinOp):
+        self._add_operator(node.op)
+        self.generic_visit(node)
+    
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        self._add_operator(node.op)
+        self.generic_visit(node)
+    
+    def visit_Compare(self, node: ast.Compare):
+        for op in node.ops:
+            self._add_operator(op)
+        self.generic_visit(node)
+    
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.functions_count += 1
+        
+        # فحص اسم الدالة
+        if not self.analyzer._is_snake_case(node.name):
+            self._append(CodeIssue(
+                type=IssueType.STYLE_ISSUE,
+                severity=Severity.LOW,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="اسم دالة غير متوافق مع PEP 8",
+                description=f"اسم الدالة '{node.name}' يجب أن يكون بصيغة snake_case",
+                suggestion=f"غير الاسم إلى '{self.analyzer._to_snake_case(node.name)}'",
+                code_snippet=f"def {node.name}("
+            ))
+        
+        # حساب التعقيد الدوري أثناء نفس المرور
+        self.complexity_stack.append(1)
+        self.generic_visit(node)
+        complexity = self.complexity_stack.pop()
+        self.complexities[id(node)] = complexity
+        self.total_complexity += complexity
+        # تعقيد الدوال المتداخلة يُحتسب ضمن الدالة الحاوية أيضاً
+        self._add_complexity(complexity - 1)
+        
+        if complexity > 10:
+            severity = Severity.HIGH if complexity > 15 else Severity.MEDIUM
+            self._append(CodeIssue(
+                type=IssueType.COMPLEXITY_ISSUE,
+                severity=severity,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="تعقيد دوري عالي",
+                description=f"الدالة '{node.name}' لها تعقيد دوري = {complexity}",
+                suggestion="قسم الدالة إلى دوال أصغر",
+                code_snippet=f"def {node.name}("
+            ))
+        
+        # فحص عدد المعاملات
+        args_count = len(node.args.args)
+        if args_count > 5:
+            self._append(CodeIssue(
+                type=IssueType.COMPLEXITY_ISSUE,
+                severity=Severity.MEDIUM,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="عدد كبير من المعاملات",
+                description=f"الدالة '{node.name}' لها {args_count} معاملات",
+                suggestion="استخدم كائن أو قاموس لتجميع المعاملات",
+                code_snippet=f"def {node.name}("
+            ))
+    
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.classes_count += 1
+        
+        if not self.analyzer._is_pascal_case(node.name):
+            self._append(CodeIssue(
+                type=IssueType.STYLE_ISSUE,
+                severity=Severity.LOW,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="اسم كلاس غير متوافق مع PEP 8",
+                description=f"اسم الكلاس '{node.name}' يجب أن يكون بصيغة PascalCase",
+                suggestion=f"غير الاسم إلى '{self.analyzer._to_pascal_case(node.name)}'",
+                code_snippet=f"class {node.name}:"
+            ))
+        self.generic_visit(node)
+    
+    def visit_Import(self, node: ast.Import):
+        self.imports_count += 1
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        self.imports_count += 1
+    
+    def visit_Global(self, node: ast.Global):
+        # فحص استخدام global
+        self._append(CodeIssue(
+            type=IssueType.BEST_PRACTICE,
+            severity=Severity.MEDIUM,
+            line_number=node.lineno,
+            column=node.col_offset,
+            message="استخدام global",
+            description="تجنب استخدام المتغيرات العامة",
+            suggestion="مرر المتغيرات كمعاملات أو استخدم كلاس",
+            code_snippet=f"global {', '.join(node.names)}"
+        ))
+    
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        self._add_complexity()
+        
+        # فحص استخدام except عام
+        if node.type is None:
+            self._append(CodeIssue(
+                type=IssueType.BEST_PRACTICE,
+                severity=Severity.MEDIUM,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="except عام",
+                description="تجنب استخدام except بدون تحديد نوع الاستثناء",
+                suggestion="حدد نوع الاستثناء المتوقع",
+                code_snippet="except:"
+            ))
+        self.generic_visit(node)
+    
+    def visit_Call(self, node: ast.Call):
+        if isinstance(node.func, ast.Name):
+            # فحص استخدام print في الكود
+            if self._check_print and node.func.id == 'print':
+                self._append(CodeIssue(
+                    type=IssueType.BEST_PRACTICE,
+                    severity=Severity.LOW,
+                    line_number=node.lineno,
+                    column=node.col_offset,
+                    message="استخدام print",
+                    description="استخدم logging بدلاً من print",
+                    suggestion="استبدل print بـ logging",
+                    code_snippet="print("
+                ))
+            
+            # فحص استخدام eval/exec
+            elif self._check_eval and node.func.id in ('eval', 'exec'):
+                self._append(CodeIssue(
+                    type=IssueType.SECURITY_ISSUE,
+                    severity=Severity.CRITICAL,
+                    line_number=node.lineno,
+                    column=node.col_offset,
+                    message=f"استخدام {node.func.id} خطير",
+                    description=f"استخدام {node.func.id} يمكن أن يؤدي إلى تنفيذ كود ضار",
+                    suggestion="استخدم بدائل آمنة أو تحقق من المدخلات",
+                    code_snippet=f"{node.func.id}("
+                ))
+        self.generic_visit(node)
+    
+    def _visit_loop(self, node: ast.AST):
+        self._add_complexity()
+        
+        # فحص الحلقات المتداخلة
+        self._loop_depth += 1
+        if self._loop_depth > 2:
+            self._append(CodeIssue(
+                type=IssueType.PERFORMANCE_ISSUE,
+                severity=Severity.MEDIUM,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="حلقات متداخلة كثيرة",
+                description=f"عمق التداخل: {self._loop_depth}",
+                suggestion="فكر في خوارزمية أكثر كفاءة",
+                code_snippet="for/while loop"
+            ))
+        self.generic_visit(node)
+        self._loop_depth -= 1
+    
+    visit_For = _visit_loop
+    visit_While = _visit_loop
+    visit_AsyncFor = _visit_loop
+    
+    def visit_If(self, node: ast.If):
+        self._add_complexity()
+        self.generic_visit(node)
+    
+    def visit_With(self, node: ast.With):
+        self._add_complexity()
+        self.generic_visit(node)
+    
+    def visit_BoolOp(self, node: ast.BoolOp):
+        self._add_complexity(len(node.values) - 1)
+        self._add_operator(node.op, len(node.values) - 1)
+        self.generic_visit(node)
+    
+    @staticmethod
+    def _is_string_expr(node: ast.AST) -> bool:
+        """تقدير بسيط لما إذا كان التعبير نصاً"""
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, str)
+        if isinstance(node, ast.JoinedStr):
+            return True
+        if isinstance(node, ast.Call):
+            return isinstance(node.func, ast.Name) and node.func.id == 'str'
+        if isinstance(node, ast.BinOp):
+            return _UnifiedVisitor._is_string_expr(node.left) or _UnifiedVisitor._is_string_expr(node.right)
+        return False
+    
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self._add_operator(node.op)
+        # فحص استخدام + لربط النصوص في الحلقات
+        if isinstance(node.op, ast.Add) and self._loop_depth > 0 and self._is_string_expr(node.value):
+            self._append(CodeIssue(
+                type=IssueType.PERFORMANCE_ISSUE,
+                severity=Severity.LOW,
+                line_number=node.lineno,
+                column=node.col_offset,
+                message="ربط النصوص في حلقة",
+                description="استخدام += للنصوص في الحلقات بطيء",
+                suggestion="استخدم join() أو قائمة",
+                code_snippet="+="
+            ))
+        self.generic_visit(node)
+
 class PythonAnalyzer:
     """محلل أكواد Python"""
     
-    def __init__(self):
-        self.issues = []
-        self.metrics = None
-        
     def analyze(self, code: str, file_path: str = None) -> Tuple[List[CodeIssue], CodeMetrics]:
-        """تحليل كود Python"""
-        self.issues = []
+        """تحليل كود Python (بدون حالة مشتركة، آمن للاستدعاء المتزامن)"""
+        issues: List[CodeIssue] = []
+        
+        # تقسيم الكود إلى أسطر مرة واحدة؛ الملفات الضخمة تُقرأ تدريجياً عند الحاجة
+        lines = code.split('\n') if len(code) <= _STREAM_THRESHOLD else None
         
         try:
             # تحليل نحوي
-            tree = ast.parse(code)
+            tree = ast.parse(code, filename=file_path or '<string>', type_comments=False)
             
-            # تحليل المشاكل
-            self._analyze_syntax(code)
-            self._analyze_style(code, tree)
-            self._analyze_complexity(tree)
-            self._analyze_best_practices(code, tree)
-            self._analyze_security(code, tree)
-            self._analyze_performance(code, tree)
+            # فحوصات الأسطر (النحو، الأسلوب، كلمات المرور، عد الأسطر) في مرور واحد
+            line_counts = self._scan_lines(self._iter_lines(code, lines), issues)
+            
+            # تحليل المشاكل وجمع المقاييس في مرور واحد على الشجرة
+            visitor = _UnifiedVisitor(self, code)
+            visitor.visit(tree)
+            issues.extend(visitor.issues)
             
             # حساب المقاييس
-            self.metrics = self._calculate_metrics(code, tree)
+            metrics = self._calculate_metrics(visitor, line_counts)
             
         except SyntaxError as e:
-            self.issues.append(CodeIssue(
+            # IndentationError (ومنها TabError) تحمل موقع الخطأ بدقة، فتُعرض برسالة خاصة
+            is_indentation = isinstance(e, IndentationError)
+            issues.append(CodeIssue(
                 type=IssueType.SYNTAX_ERROR,
                 severity=Severity.CRITICAL,
                 line_number=e.lineno or 1,
                 column=e.offset or 0,
-                message="خطأ نحوي",
+                message="خطأ في المسافات البادئة" if is_indentation else "خطأ نحوي",
                 description=str(e),
-                suggestion="تحقق من صحة النحو",
+                suggestion="استخدم 4 مسافات لكل مستوى بادئة" if is_indentation else "تحقق من صحة النحو",
                 code_snippet=self._get_line(code, e.lineno or 1),
                 fix_suggestion=self._suggest_syntax_fix(e)
             ))
             
             # مقاييس أساسية للكود مع أخطاء نحوية
-            self.metrics = self._calculate_basic_metrics(code)
+            metrics = self._calculate_basic_metrics(self._iter_lines(code, lines))
         
-        return self.issues, self.metrics
+        return issues, metrics
     
-    def _analyze_syntax(self, code: str):
-        """تحليل الأخطاء النحوية"""
-        lines = code.split('\\n')
-        
-        for i, line in enumerate(lines, 1):
-            line = line.strip()
-            
-            # فحص الأقواس غير المتوازنة
-            if self._check_unbalanced_brackets(line):
-                self.issues.append(CodeIssue(
-                    type=IssueType.SYNTAX_ERROR,
-                    severity=Severity.HIGH,
-                    line_number=i,
-                    column=0,
-                    message="أقواس غير متوازنة",
-                    description="الأقواس غير متطابقة في هذا السطر",
-                    suggestion="تأكد من إغلاق جميع الأقواس",
-                    code_snippet=line
-                ))
-            
-            # فحص المسافات البادئة
-            if line and not line.startswith(' ') and not line.startswith('\\t'):
-                if i > 1 and lines[i-2].rstrip().endswith(':'):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.SYNTAX_ERROR,
-                        severity=Severity.HIGH,
-                        line_number=i,
-                        column=0,
-                        message="مسافة بادئة مفقودة",
-                        description="يجب إضافة مسافة بادئة بعد ':'",
-                        suggestion="أضف 4 مسافات في بداية السطر",
-                        code_snippet=line
-                    ))
+    def _iter_lines(self, code: str, lines: Optional[List[str]]) -> Iterable[str]:
+        """المرور على الأسطر من القائمة المقسمة، أو تدريجياً عبر StringIO للملفات الضخمة"""
+        if lines is not None:
+            return lines
+        return (line[:-1] if line.endswith('\n') else line for line in io.StringIO(code))
     
-    def _analyze_style(self, code: str, tree: ast.AST):
-        """تحليل أسلوب الكود (PEP 8)"""
-        lines = code.split('\\n')
+    def _scan_lines(self, lines: Iterable[str], issues: List[CodeIssue]) -> Tuple[int, int, int]:
+        """
+        مرور واحد على الأسطر يجمع فحوصات الأسلوب وكلمات المرور،
+        ويعيد (أسطر الكود، أسطر التعليقات، الأسطر الفارغة)
+        """
+        append = issues.append
+        lines_of_code = 0
+        lines_of_comments = 0
+        blank_lines = 0
         
+        # لا فحص للأقواس هنا: ast.parse نجح، فالأقواس متوازنة، وأي اختلال داخل سطر واحد
+        # هو تعبير متعدد الأسطر صحيح
         for i, line in enumerate(lines, 1):
+            stripped = line.strip()
+            
             # فحص طول السطر
             if len(line) > 79:
-                self.issues.append(CodeIssue(
+                append(CodeIssue(
                     type=IssueType.STYLE_ISSUE,
                     severity=Severity.LOW,
                     line_number=i,
@@ -158,8 +428,8 @@ class PythonAnalyzer:
                 ))
             
             # فحص المسافات الزائدة
-            if line.endswith(' ') or line.endswith('\\t'):
-                self.issues.append(CodeIssue(
+            if line.endswith((' ', '\t')):
+                append(CodeIssue(
                     type=IssueType.STYLE_ISSUE,
                     severity=Severity.LOW,
                     line_number=i,
@@ -171,8 +441,8 @@ class PythonAnalyzer:
                 ))
             
             # فحص استخدام التبويب والمسافات
-            if '\\t' in line and ' ' in line[:len(line) - len(line.lstrip())]:
-                self.issues.append(CodeIssue(
+            if '\t' in line and ' ' in line[:len(line) - len(line.lstrip())]:
+                append(CodeIssue(
                     type=IssueType.STYLE_ISSUE,
                     severity=Severity.MEDIUM,
                     line_number=i,
@@ -182,188 +452,21 @@ class PythonAnalyzer:
                     suggestion="استخدم 4 مسافات فقط للمسافة البادئة",
                     code_snippet=line
                 ))
-        
-        # فحص أسماء المتغيرات والدوال
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if not self._is_snake_case(node.name):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.STYLE_ISSUE,
-                        severity=Severity.LOW,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="اسم دالة غير متوافق مع PEP 8",
-                        description=f"اسم الدالة '{node.name}' يجب أن يكون بصيغة snake_case",
-                        suggestion=f"غير الاسم إلى '{self._to_snake_case(node.name)}'",
-                        code_snippet=f"def {node.name}("
-                    ))
             
-            elif isinstance(node, ast.ClassDef):
-                if not self._is_pascal_case(node.name):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.STYLE_ISSUE,
-                        severity=Severity.LOW,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="اسم كلاس غير متوافق مع PEP 8",
-                        description=f"اسم الكلاس '{node.name}' يجب أن يكون بصيغة PascalCase",
-                        suggestion=f"غير الاسم إلى '{self._to_pascal_case(node.name)}'",
-                        code_snippet=f"class {node.name}:"
-                    ))
-    
-    def _analyze_complexity(self, tree: ast.AST):
-        """تحليل تعقيد الكود"""
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                complexity = self._calculate_cyclomatic_complexity(node)
-                
-                if complexity > 10:
-                    severity = Severity.HIGH if complexity > 15 else Severity.MEDIUM
-                    self.issues.append(CodeIssue(
-                        type=IssueType.COMPLEXITY_ISSUE,
-                        severity=severity,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="تعقيد دوري عالي",
-                        description=f"الدالة '{node.name}' لها تعقيد دوري = {complexity}",
-                        suggestion="قسم الدالة إلى دوال أصغر",
-                        code_snippet=f"def {node.name}("
-                    ))
-                
-                # فحص عدد المعاملات
-                args_count = len(node.args.args)
-                if args_count > 5:
-                    self.issues.append(CodeIssue(
-                        type=IssueType.COMPLEXITY_ISSUE,
-                        severity=Severity.MEDIUM,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="عدد كبير من المعاملات",
-                        description=f"الدالة '{node.name}' لها {args_count} معاملات",
-                        suggestion="استخدم كائن أو قاموس لتجميع المعاملات",
-                        code_snippet=f"def {node.name}("
-                    ))
-    
-    def _analyze_best_practices(self, code: str, tree: ast.AST):
-        """تحليل أفضل الممارسات"""
-        # فحص استخدام global
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Global):
-                self.issues.append(CodeIssue(
-                    type=IssueType.BEST_PRACTICE,
-                    severity=Severity.MEDIUM,
-                    line_number=node.lineno,
-                    column=node.col_offset,
-                    message="استخدام global",
-                    description="تجنب استخدام المتغيرات العامة",
-                    suggestion="مرر المتغيرات كمعاملات أو استخدم كلاس",
-                    code_snippet=f"global {', '.join(node.names)}"
+            # فحص كلمات المرور في الكود
+            if _PASSWORD_RE.search(line):
+                append(CodeIssue(
+                    type=IssueType.SECURITY_ISSUE,
+                    severity=Severity.HIGH,
+                    line_number=i,
+                    column=0,
+                    message="كلمة مرور مكشوفة",
+                    description="لا تضع كلمات المرور في الكود",
+                    suggestion="استخدم متغيرات البيئة أو ملفات التكوين",
+                    code_snippet=stripped
                 ))
             
-            # فحص استخدام except عام
-            elif isinstance(node, ast.ExceptHandler):
-                if node.type is None:
-                    self.issues.append(CodeIssue(
-                        type=IssueType.BEST_PRACTICE,
-                        severity=Severity.MEDIUM,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="except عام",
-                        description="تجنب استخدام except بدون تحديد نوع الاستثناء",
-                        suggestion="حدد نوع الاستثناء المتوقع",
-                        code_snippet="except:"
-                    ))
-            
-            # فحص استخدام print في الكود
-            elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name) and node.func.id == 'print':
-                    self.issues.append(CodeIssue(
-                        type=IssueType.BEST_PRACTICE,
-                        severity=Severity.LOW,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="استخدام print",
-                        description="استخدم logging بدلاً من print",
-                        suggestion="استبدل print بـ logging",
-                        code_snippet="print("
-                    ))
-    
-    def _analyze_security(self, code: str, tree: ast.AST):
-        """تحليل الأمان"""
-        # فحص استخدام eval
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name) and node.func.id in ['eval', 'exec']:
-                    self.issues.append(CodeIssue(
-                        type=IssueType.SECURITY_ISSUE,
-                        severity=Severity.CRITICAL,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message=f"استخدام {node.func.id} خطير",
-                        description=f"استخدام {node.func.id} يمكن أن يؤدي إلى تنفيذ كود ضار",
-                        suggestion="استخدم بدائل آمنة أو تحقق من المدخلات",
-                        code_snippet=f"{node.func.id}("
-                    ))
-        
-        # فحص كلمات المرور في الكود
-        if re.search(r'password\s*=\s*["\'][^"\']+["\']', code, re.IGNORECASE):
-            lines = code.split('\\n')
-            for i, line in enumerate(lines, 1):
-                if re.search(r'password\s*=\s*["\'][^"\']+["\']', line, re.IGNORECASE):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.SECURITY_ISSUE,
-                        severity=Severity.HIGH,
-                        line_number=i,
-                        column=0,
-                        message="كلمة مرور مكشوفة",
-                        description="لا تضع كلمات المرور في الكود",
-                        suggestion="استخدم متغيرات البيئة أو ملفات التكوين",
-                        code_snippet=line.strip()
-                    ))
-    
-    def _analyze_performance(self, code: str, tree: ast.AST):
-        """تحليل الأداء"""
-        for node in ast.walk(tree):
-            # فحص الحلقات المتداخلة
-            if isinstance(node, (ast.For, ast.While)):
-                nested_loops = self._count_nested_loops(node)
-                if nested_loops > 2:
-                    self.issues.append(CodeIssue(
-                        type=IssueType.PERFORMANCE_ISSUE,
-                        severity=Severity.MEDIUM,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="حلقات متداخلة كثيرة",
-                        description=f"عمق التداخل: {nested_loops}",
-                        suggestion="فكر في خوارزمية أكثر كفاءة",
-                        code_snippet="for/while loop"
-                    ))
-            
-            # فحص استخدام + لربط النصوص في الحلقات
-            elif isinstance(node, ast.AugAssign):
-                if isinstance(node.op, ast.Add) and self._is_in_loop(node, tree):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.PERFORMANCE_ISSUE,
-                        severity=Severity.LOW,
-                        line_number=node.lineno,
-                        column=node.col_offset,
-                        message="ربط النصوص في حلقة",
-                        description="استخدام += للنصوص في الحلقات بطيء",
-                        suggestion="استخدم join() أو قائمة",
-                        code_snippet="+="
-                    ))
-    
-    def _calculate_metrics(self, code: str, tree: ast.AST) -> CodeMetrics:
-        """حساب مقاييس الكود"""
-        lines = code.split('\\n')
-        
-        # عد الأسطر
-        lines_of_code = 0
-        lines_of_comments = 0
-        blank_lines = 0
-        
-        for line in lines:
-            stripped = line.strip()
+            # عد الأسطر
             if not stripped:
                 blank_lines += 1
             elif stripped.startswith('#'):
@@ -374,26 +477,27 @@ class PythonAnalyzer:
                 if '#' in line:
                     lines_of_comments += 1
         
-        # عد العناصر
-        functions_count = 0
-        classes_count = 0
-        imports_count = 0
-        total_complexity = 0
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                functions_count += 1
-                total_complexity += self._calculate_cyclomatic_complexity(node)
-            elif isinstance(node, ast.ClassDef):
-                classes_count += 1
-            elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                imports_count += 1
+        return lines_of_code, lines_of_comments, blank_lines
+    
+    def _calculate_metrics(self, visitor: _UnifiedVisitor, line_counts: Tuple[int, int, int]) -> CodeMetrics:
+        """حساب مقاييس الكود"""
+        lines_of_code, lines_of_comments, blank_lines = line_counts
+        functions_count = visitor.functions_count
+        classes_count = visitor.classes_count
+        imports_count = visitor.imports_count
+        total_complexity = visitor.total_complexity
         
         # حساب التعقيد الدوري المتوسط
         avg_complexity = total_complexity / max(functions_count, 1)
         
-        # حساب مؤشر القابلية للصيانة (مبسط)
-        maintainability_index = max(0, 171 - 5.2 * avg_complexity - 0.23 * avg_complexity - 16.2 * (lines_of_code / max(functions_count, 1)))
+        # حساب مؤشر القابلية للصيانة (صيغة Oman/Hagemeister بحجم Halstead)
+        log = math.log
+        maintainability_index = max(
+            0.0,
+            171.0 - 5.2 * log(max(visitor.halstead_volume(), 1))
+            - 0.23 * avg_complexity
+            - 16.2 * log(max(lines_of_code, 1))
+        )
         
         return CodeMetrics(
             lines_of_code=lines_of_code,
@@ -407,10 +511,8 @@ class PythonAnalyzer:
             maintainability_index=maintainability_index
         )
     
-    def _calculate_basic_metrics(self, code: str) -> CodeMetrics:
+    def _calculate_basic_metrics(self, lines: Iterable[str]) -> CodeMetrics:
         """حساب مقاييس أساسية للكود مع أخطاء"""
-        lines = code.split('\\n')
-        
         lines_of_code = 0
         lines_of_comments = 0
         blank_lines = 0
@@ -437,83 +539,50 @@ class PythonAnalyzer:
         )
     
     # دوال مساعدة
-    def _check_unbalanced_brackets(self, line: str) -> bool:
-        """فحص الأقواس غير المتوازنة"""
-        brackets = {'(': ')', '[': ']', '{': '}'}
-        stack = []
-        
-        for char in line:
-            if char in brackets:
-                stack.append(char)
-            elif char in brackets.values():
-                if not stack:
-                    return True
-                if brackets[stack.pop()] != char:
-                    return True
-        
-        return len(stack) > 0
-    
     def _is_snake_case(self, name: str) -> bool:
         """فحص إذا كان الاسم بصيغة snake_case"""
-        return re.match(r'^[a-z_][a-z0-9_]*$', name) is not None
+        # فلتر سريع قبل التعبير النمطي
+        if not name.isascii() or name[:1].isupper():
+            return False
+        return _SNAKE_RE.match(name) is not None
     
     def _is_pascal_case(self, name: str) -> bool:
         """فحص إذا كان الاسم بصيغة PascalCase"""
-        return re.match(r'^[A-Z][a-zA-Z0-9]*$', name) is not None
+        # فلتر سريع قبل التعبير النمطي
+        if not name[:1].isupper() or '_' in name:
+            return False
+        return _PASCAL_RE.match(name) is not None
     
-    def _to_snake_case(self, name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _to_snake_case(name: str) -> str:
         """تحويل إلى snake_case"""
-        return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+        out = []
+        append = out.append
+        last = len(name) - 1
+        prev = ''
+        for i, c in enumerate(name):
+            # بداية كلمة: حرف كبير بعد صغير أو رقم، أو آخر حرف كبير في اختصار (HTTPServer)
+            if c.isupper() and out and prev != '_' and (
+                    not prev.isupper() or (i < last and name[i + 1].islower())):
+                append('_')
+            append(c.lower())
+            prev = c
+        return ''.join(out)
     
-    def _to_pascal_case(self, name: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _to_pascal_case(name: str) -> str:
         """تحويل إلى PascalCase"""
-        return ''.join(word.capitalize() for word in name.split('_'))
-    
-    def _calculate_cyclomatic_complexity(self, node: ast.FunctionDef) -> int:
-        """حساب التعقيد الدوري"""
-        complexity = 1  # البداية
-        
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(child, ast.ExceptHandler):
-                complexity += 1
-            elif isinstance(child, ast.With):
-                complexity += 1
-            elif isinstance(child, ast.BoolOp):
-                complexity += len(child.values) - 1
-        
-        return complexity
-    
-    def _count_nested_loops(self, node: ast.AST) -> int:
-        """عد الحلقات المتداخلة"""
-        max_depth = 0
-        current_depth = 0
-        
-        def visit(n):
-            nonlocal max_depth, current_depth
-            if isinstance(n, (ast.For, ast.While)):
-                current_depth += 1
-                max_depth = max(max_depth, current_depth)
-                for child in ast.iter_child_nodes(n):
-                    visit(child)
-                current_depth -= 1
-            else:
-                for child in ast.iter_child_nodes(n):
-                    visit(child)
-        
-        visit(node)
-        return max_depth
-    
-    def _is_in_loop(self, node: ast.AST, tree: ast.AST) -> bool:
-        """فحص إذا كان العقدة داخل حلقة"""
-        # تنفيذ مبسط - يحتاج تحسين
-        return False
+        return name.replace('_', ' ').title().replace(' ', '')
     
     def _get_line(self, code: str, line_number: int) -> str:
         """الحصول على سطر معين"""
-        lines = code.split('\\n')
-        if 1 <= line_number <= len(lines):
+        if line_number < 1:
+            return ""
+        # التقسيم يتوقف بعد السطر المطلوب بدلاً من تقسيم الملف كاملاً
+        lines = code.split('\n', line_number)
+        if line_number <= len(lines):
             return lines[line_number - 1]
         return ""
     
@@ -533,94 +602,76 @@ class PythonAnalyzer:
 class JavaScriptAnalyzer:
     """محلل أكواد JavaScript"""
     
-    def __init__(self):
-        self.issues = []
-    
     def analyze(self, code: str, file_path: str = None) -> Tuple[List[CodeIssue], CodeMetrics]:
-        """تحليل كود JavaScript"""
-        self.issues = []
-        
-        # تحليل أساسي للـ JavaScript
-        self._analyze_basic_issues(code)
-        self._analyze_style_issues(code)
-        
-        # حساب مقاييس أساسية
-        metrics = self._calculate_basic_metrics(code)
-        
-        return self.issues, metrics
-    
-    def _analyze_basic_issues(self, code: str):
-        """تحليل المشاكل الأساسية"""
-        lines = code.split('\\n')
-        
-        for i, line in enumerate(lines, 1):
-            # فحص استخدام var
-            if re.search(r'\\bvar\\b', line):
-                self.issues.append(CodeIssue(
-                    type=IssueType.BEST_PRACTICE,
-                    severity=Severity.LOW,
-                    line_number=i,
-                    column=line.find('var'),
-                    message="استخدام var",
-                    description="استخدم let أو const بدلاً من var",
-                    suggestion="استبدل var بـ let أو const",
-                    code_snippet=line.strip()
-                ))
-            
-            # فحص == بدلاً من ===
-            if '==' in line and '===' not in line and '!=' in line and '!==' not in line:
-                self.issues.append(CodeIssue(
-                    type=IssueType.BEST_PRACTICE,
-                    severity=Severity.MEDIUM,
-                    line_number=i,
-                    column=line.find('=='),
-                    message="مقارنة غير صارمة",
-                    description="استخدم === بدلاً من ==",
-                    suggestion="استبدل == بـ ===",
-                    code_snippet=line.strip()
-                ))
-    
-    def _analyze_style_issues(self, code: str):
-        """تحليل مشاكل الأسلوب"""
-        lines = code.split('\\n')
-        
-        for i, line in enumerate(lines, 1):
-            # فحص الفاصلة المنقوطة المفقودة
-            stripped = line.strip()
-            if stripped and not stripped.endswith((';', '{', '}', ':', ',')):
-                if not stripped.startswith(('if', 'for', 'while', 'function', 'class')):
-                    self.issues.append(CodeIssue(
-                        type=IssueType.STYLE_ISSUE,
-                        severity=Severity.LOW,
-                        line_number=i,
-                        column=len(line),
-                        message="فاصلة منقوطة مفقودة",
-                        description="أضف فاصلة منقوطة في نهاية السطر",
-                        suggestion="أضف ; في نهاية السطر",
-                        code_snippet=line.strip()
-                    ))
-    
-    def _calculate_basic_metrics(self, code: str) -> CodeMetrics:
-        """حساب مقاييس أساسية"""
-        lines = code.split('\\n')
+        """تحليل كود JavaScript (بدون حالة مشتركة، آمن للاستدعاء المتزامن)"""
+        issues: List[CodeIssue] = []
+        append = issues.append
         
         lines_of_code = 0
         lines_of_comments = 0
         blank_lines = 0
         functions_count = 0
         
-        for line in lines:
+        # مرور واحد على الأسطر لكل الفحوصات والمقاييس
+        for i, line in enumerate(code.split('\n'), 1):
             stripped = line.strip()
+            
+            # عد الأسطر
             if not stripped:
                 blank_lines += 1
-            elif stripped.startswith('//') or stripped.startswith('/*'):
+                continue
+            if stripped.startswith(('//', '/*')):
                 lines_of_comments += 1
             else:
                 lines_of_code += 1
                 if 'function' in line:
                     functions_count += 1
+            
+            # فحص var و == بنمط واحد (مشكلة واحدة لكل نوع في السطر)
+            seen = set()
+            for match in _JS_RE.finditer(line):
+                kind = match.lastgroup
+                if kind in seen:
+                    continue
+                seen.add(kind)
+                
+                if kind == 'var':
+                    append(CodeIssue(
+                        type=IssueType.BEST_PRACTICE,
+                        severity=Severity.LOW,
+                        line_number=i,
+                        column=match.start(),
+                        message="استخدام var",
+                        description="استخدم let أو const بدلاً من var",
+                        suggestion="استبدل var بـ let أو const",
+                        code_snippet=stripped
+                    ))
+                else:
+                    append(CodeIssue(
+                        type=IssueType.BEST_PRACTICE,
+                        severity=Severity.MEDIUM,
+                        line_number=i,
+                        column=match.start(),
+                        message="مقارنة غير صارمة",
+                        description="استخدم === بدلاً من ==",
+                        suggestion="استبدل == بـ ===",
+                        code_snippet=stripped
+                    ))
+            
+            # فحص الفاصلة المنقوطة المفقودة
+            if not stripped.endswith(_JS_LINE_ENDINGS) and not stripped.startswith(_JS_BLOCK_STARTS):
+                append(CodeIssue(
+                    type=IssueType.STYLE_ISSUE,
+                    severity=Severity.LOW,
+                    line_number=i,
+                    column=len(line),
+                    message="فاصلة منقوطة مفقودة",
+                    description="أضف فاصلة منقوطة في نهاية السطر",
+                    suggestion="أضف ; في نهاية السطر",
+                    code_snippet=stripped
+                ))
         
-        return CodeMetrics(
+        metrics = CodeMetrics(
             lines_of_code=lines_of_code,
             lines_of_comments=lines_of_comments,
             blank_lines=blank_lines,
@@ -631,23 +682,74 @@ class JavaScriptAnalyzer:
             code_duplication=0.0,
             maintainability_index=50.0
         )
+        
+        return issues, metrics
+
+# مفتاح الملخص المقابل لكل مستوى خطورة
+_SEV_KEY = {
+    Severity.CRITICAL: 'critical_issues',
+    Severity.HIGH: 'high_issues',
+    Severity.MEDIUM: 'medium_issues',
+    Severity.LOW: 'low_issues',
+    Severity.INFO: 'info_issues'
+}
+
+# عدد نتائج التحليل المحفوظة في الذاكرة المؤقتة
+_RESULT_CACHE_SIZE = 256
+
+# حجم الكود الإجمالي (بالأحرف) الذي يبرر تكلفة تشغيل عمليات منفصلة
+_PROCESS_POOL_THRESHOLD = 200_000
+
+def _analyze_one(job: Tuple[str, str, Optional[str]]) -> Dict[str, Any]:
+    """تحليل ملف واحد داخل عملية عاملة"""
+    code, language, file_path = job
+    return CodeAnalyzer().analyze_code(code, language, file_path)
 
 class CodeAnalyzer:
     """محلل الأكواد الرئيسي"""
     
+    # توحيد أسماء اللغات المدعومة إلى اسم واحد لكل لغة
+    _LANG_MAP = {
+        'python': 'python',
+        'py': 'python',
+        'javascript': 'javascript',
+        'js': 'javascript'
+    }
+    
     def __init__(self):
+        # المحللات بلا حالة، لذا تكفي نسخة واحدة لكل لغة مهما تعددت أسماؤها
+        python_analyzer = PythonAnalyzer()
+        javascript_analyzer = JavaScriptAnalyzer()
         self.analyzers = {
-            'python': PythonAnalyzer(),
-            'javascript': JavaScriptAnalyzer(),
-            'js': JavaScriptAnalyzer(),
-            'py': PythonAnalyzer()
+            'python': python_analyzer,
+            'javascript': javascript_analyzer,
+            'js': javascript_analyzer,
+            'py': python_analyzer
+        }
+        self._analyze_funcs = {
+            'python': python_analyzer.analyze,
+            'javascript': javascript_analyzer.analyze
         }
+        # ذاكرة LRU للنتائج: (اللغة، الجيل، بصمة الكود) -> النتيجة النهائية
+        self._cache: "OrderedDict[Tuple[str, int, bytes], Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # يزداد جيل اللغة عند تغيير إعدادات محللها لإبطال نتائجها القديمة
+        self._generations: Dict[str, int] = {}
+    
+    def invalidate_cache(self, language: Optional[str] = None):
+        """إبطال النتائج المخزنة للغة معينة أو لكل اللغات"""
+        with self._cache_lock:
+            if language is None:
+                self._cache.clear()
+            else:
+                language = self._LANG_MAP.get(language.lower(), language.lower())
+                self._generations[language] = self._generations.get(language, 0) + 1
     
     def analyze_code(self, code: str, language: str, file_path: str = None) -> Dict[str, Any]:
         """تحليل الكود"""
-        language = language.lower()
+        language = self._LANG_MAP.get(language.lower())
         
-        if language not in self.analyzers:
+        if language is None:
             return {
                 'issues': [],
                 'metrics': None,
@@ -661,21 +763,62 @@ class CodeAnalyzer:
                 'recommendations': ["نوع الملف غير مدعوم للتحليل المتقدم"]
             }
         
-        analyzer = self.analyzers[language]
-        issues, metrics = analyzer.analyze(code, file_path)
-        
-        # تلخيص النتائج
-        summary = self._create_summary(issues)
-        recommendations = self._generate_recommendations(issues, metrics)
-        
-        return {
-            'issues': [self._issue_to_dict(issue) for issue in issues],
+        digest = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+        with self._cache_lock:
+            cache_key = (language, self._generations.get(language, 0), digest)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                # نسخة مستقلة حتى لا يُفسد تعديل المستدعي النتيجة المخزنة
+                return copy.deepcopy(cached)
+        
+        issues, metrics = self._analyze_funcs[language](code, file_path)
+        
+        # تلخيص النتائج؛ عدّ مستويات الخطورة مرة واحدة للملخص والتوصيات
+        severity_counts = Counter(issue.severity for issue in issues)
+        summary = self._create_summary(issues, severity_counts)
+        recommendations = self._generate_recommendations(issues, metrics, severity_counts)
+        
+        if issues:
+            issue_to_dict = self._issue_to_dict
+            issue_dicts = [issue_to_dict(issue) for issue in issues]
+        else:
+            issue_dicts = []
+        
+        result = {
+            'issues': issue_dicts,
             'metrics': self._metrics_to_dict(metrics) if metrics else None,
             'summary': summary,
             'recommendations': recommendations
         }
+        
+        with self._cache_lock:
+            self._cache[cache_key] = result
+            if len(self._cache) > _RESULT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        
+        return copy.deepcopy(result)
+    
+    def analyze_many(self, jobs: Iterable[Tuple[str, str, Optional[str]]], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        تحليل عدة ملفات (بالتوازي عند حجم كود كبير). كل عنصر هو (الكود، اللغة، مسار الملف)،
+        والنتائج تُرجع بنفس ترتيب المدخلات.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        
+        # العمليات المنفصلة تستحق تكلفتها فقط عند حجم كود كبير
+        if sum(len(code) for code, _, _ in jobs) > _PROCESS_POOL_THRESHOLD:
+            workers = max_workers or os.cpu_count() or 1
+            chunksize = max(1, len(jobs) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_analyze_one, jobs, chunksize=chunksize))
+        
+        # التحليل عمل Python خالص مقيد بالـ GIL، فالخيوط لا تضيف توازياً
+        return [self.analyze_code(*job) for job in jobs]
     
-    def _create_summary(self, issues: List[CodeIssue]) -> Dict[str, int]:
+    def _create_summary(self, issues: List[CodeIssue], severity_counts: Optional[Counter] = None) -> Dict[str, int]:
         """إنشاء ملخص المشاكل"""
         summary = {
             'total_issues': len(issues),
@@ -686,30 +829,27 @@ class CodeAnalyzer:
             'info_issues': 0
         }
         
-        for issue in issues:
-            if issue.severity == Severity.CRITICAL:
-                summary['critical_issues'] += 1
-            elif issue.severity == Severity.HIGH:
-                summary['high_issues'] += 1
-            elif issue.severity == Severity.MEDIUM:
-                summary['medium_issues'] += 1
-            elif issue.severity == Severity.LOW:
-                summary['low_issues'] += 1
-            else:
-                summary['info_issues'] += 1
+        if severity_counts is None:
+            severity_counts = Counter(issue.severity for issue in issues)
+        for severity, count in severity_counts.items():
+            summary[_SEV_KEY[severity]] = count
         
         return summary
     
-    def _generate_recommendations(self, issues: List[CodeIssue], metrics: CodeMetrics) -> List[str]:
+    def _generate_recommendations(self, issues: List[CodeIssue], metrics: CodeMetrics,
+                                  severity_counts: Optional[Counter] = None) -> List[str]:
         """توليد التوصيات"""
         recommendations = []
         
+        if severity_counts is None:
+            severity_counts = Counter(issue.severity for issue in issues)
+        
         # توصيات بناءً على المشاكل
-        critical_count = sum(1 for issue in issues if issue.severity == Severity.CRITICAL)
+        critical_count = severity_counts[Severity.CRITICAL]
         if critical_count > 0:
             recommendations.append(f"🚨 يوجد {critical_count} مشكلة حرجة تحتاج إصلاح فوري")
         
-        high_count = sum(1 for issue in issues if issue.severity == Severity.HIGH)
+        high_count = severity_counts[Severity.HIGH]
         if high_count > 0:
             recommendations.append(f"⚠️ يوجد {high_count} مشكلة عالية الأولوية")
         
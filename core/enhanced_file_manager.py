@@ -13,19 +13,121 @@ import subprocess
 import sys
 import platform
 import mimetypes
+import mmap
+import re
 import hashlib
 import time
 import threading
-from typing import Dict, List, Optional, Any, Callable, Set, Tuple
+from itertools import islice
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Callable, Set, Tuple, Iterable, Union
 from pathlib import Path
 from PyQt6.QtCore import QObject, pyqtSignal, QFileSystemWatcher, QTimer, QThread
 from PyQt6.QtWidgets import QFileDialog, QMessageBox, QInputDialog
 
+from .app_config import _json_loads, _json_dumps
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    # بدون watchdog يعود المراقب إلى الفحص الدوري
+    Observer = None
+    FileSystemEventHandler = object
+
+try:
+    import blake3
+except ImportError:
+    # بدون blake3 يُستخدم MD5 من hashlib
+    blake3 = None
+
 logger = logging.getLogger(__name__)
 
+# المجلدات التي لا يدخلها البحث ولا فهرس المشروع
+_SEARCH_IGNORED_DIRS = frozenset({'.git', '__pycache__', 'node_modules'})
+
+# الملفات المخفية المتجاهلة في المراقبة وفهرس المشروع (عدا .gitignore و .env) بفحص واحد على مستوى C
+_HIDDEN_FILE_MATCH = re.compile(r'\.(?!(?:gitignore|env)$)').match
+
+# امتدادات الملفات النصية المعروفة للبحث في المحتوى
+_TEXT_EXTENSIONS = frozenset({
+    '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
+    '.txt', '.md', '.rst', '.log', '.cfg', '.ini', '.conf'
+})
+
+@lru_cache(maxsize=8192)
+def _is_text_cached(file_path: str, size: int, mtime_ns: int) -> bool:
+    """فحص محتوى الملف (غياب البايت الصفري في أول 1KB)، مخزن حسب (المسار، الحجم، وقت التعديل)"""
+    try:
+        with open(file_path, 'rb') as f:
+            return b'\x00' not in f.read(1024)
+    except OSError:
+        return False
+
+def is_text_file(file_path: str, stat: os.stat_result = None) -> bool:
+    """
+    فحص ما إذا كان الملف نصياً: الامتدادات المعروفة وأنواع MIME النصية دون قراءة،
+    وغيرها بفحص أول 1KB مرة واحدة لكل نسخة من الملف.
+    """
+    try:
+        _, ext = os.path.splitext(file_path)
+        mime_type = _guess_mime_type(ext)
+        if (mime_type and mime_type.startswith('text/')) or ext.lower() in _TEXT_EXTENSIONS:
+            return True
+        
+        if stat is None:
+            stat = os.stat(file_path)
+        return _is_text_cached(file_path, stat.st_size, stat.st_mtime_ns)
+    except (OSError, ValueError):
+        return False
+
+# حدود حساب الفروق النصية: حجم الملف وعدد أسطر الناتج
+_MAX_DIFF_FILE_SIZE = 10 * 1024 * 1024
+_MAX_DIFF_LINES = 50000
+
+# فوق هذا الحجم تُفك ترميز الملفات مباشرة من mmap بدلاً من قراءتها إلى bytes أولاً
+_MMAP_READ_THRESHOLD = 1024 * 1024
+
+@lru_cache(maxsize=4096)
+def _guess_mime_type(ext: str) -> Optional[str]:
+    """نوع MIME حسب الامتداد (مخزن لأن الامتدادات تتكرر كثيراً أثناء البحث)"""
+    return mimetypes.guess_type('file' + ext)[0]
+
+def _walk_files(root_path: str, ignored_dirs):
+    """
+    المرور على شجرة مجلد عبر os.scandir وإرجاع DirEntry لكل ملف.
+    DirEntry يحتفظ بنتيجة stat، فلا حاجة لاستدعاء os.stat منفصل لكل ملف.
+    المجلدات المتجاهلة والروابط الرمزية للمجلدات لا يُدخل إليها (كما في os.walk).
+    """
+    stack = [root_path]
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if entry.name not in ignored_dirs and not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                    except OSError:
+                        continue
+                    yield entry
+        except OSError:
+            continue
+        # بنفس ترتيب os.walk: المجلدات الفرعية بترتيب قراءتها
+        stack.extend(reversed(subdirs))
+
 class FileOperation:
     """عملية ملف"""
     
+    # سمات ثابتة: لا حاجة لـ __dict__ لكل عملية محفوظة في التاريخ
+    __slots__ = ('operation_type', 'source', 'destination', 'callback', 'metadata',
+                 'timestamp', 'status', 'error', 'progress')
+    
     def __init__(self, operation_type: str, source: str, destination: str = None, 
                  callback: Callable = None, metadata: Dict = None):
         self.operation_type = operation_type  # copy, move, delete, create
@@ -38,6 +140,27 @@ class FileOperation:
         self.error = None
         self.progress = 0.0
 
+class _WatchdogEventHandler(FileSystemEventHandler):
+    """تحويل أحداث نظام التشغيل (inotify/FSEvents/ReadDirectoryChangesW) إلى إشارات المراقب"""
+    
+    def __init__(self, watcher: 'FileWatcherThread'):
+        super().__init__()
+        self.watcher = watcher
+    
+    def on_created(self, event):
+        self.watcher._emit_event('added', event.src_path, event.is_directory)
+    
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher._emit_event('modified', event.src_path, False)
+    
+    def on_deleted(self, event):
+        self.watcher._emit_event('removed', event.src_path, event.is_directory)
+    
+    def on_moved(self, event):
+        self.watcher._emit_event('removed', event.src_path, event.is_directory)
+        self.watcher._emit_event('added', event.dest_path, event.is_directory)
+
 class FileWatcherThread(QThread):
     """خيط مراقبة الملفات المحسن"""
     
@@ -50,19 +173,109 @@ class FileWatcherThread(QThread):
         super().__init__()
         self.watch_paths = watch_paths
         self.is_watching = False
+        # مسار الملف -> (mtime, size, mode) كصف مضغوط بدلاً من قاموس لكل ملف
         self.file_states = {}
+        # مسار مراقب -> مسارات الملفات التابعة له (لإزالة حالاته دون المرور على كل الملفات)
+        self._by_root: Dict[str, Set[str]] = {}
         self.check_interval = 1.0  # ثانية
         self.ignore_patterns = {'.git', '__pycache__', 'node_modules', '.DS_Store'}
+        # مراقب أحداث نظام التشغيل (عند توفر watchdog): مسار -> ObservedWatch
+        self._observer = None
+        self._handler = None
+        self._watches = {}
         
     def run(self):
         """تشغيل مراقب الملفات"""
         self.is_watching = True
+        
+        if Observer is not None:
+            self._run_observer()
+            return
+        
         self.scan_initial_state()
         
         while self.is_watching:
             self.check_changes()
             self.msleep(int(self.check_interval * 1000))
     
+    def _run_observer(self):
+        """المراقبة عبر أحداث نظام التشغيل بدلاً من إعادة فحص الشجرة كل ثانية"""
+        self._observer = Observer()
+        self._handler = _WatchdogEventHandler(self)
+        for path in list(self.watch_paths):
+            self._schedule(path)
+        self._observer.start()
+        
+        try:
+            while self.is_watching:
+                self.msleep(100)
+        finally:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+            self._watches.clear()
+    
+    def _schedule(self, path: str):
+        """تسجيل مسار لدى مراقب الأحداث"""
+        if not os.path.exists(path):
+            return
+        try:
+            if os.path.isdir(path):
+                self._watches[path] = self._observer.schedule(self._handler, path, recursive=True)
+            else:
+                # الملفات المفردة تُراقب عبر مجلدها الأب وتُصفى الأحداث حسب المسار
+                self._watches[path] = self._observer.schedule(
+                    self._handler, os.path.dirname(path) or '.', recursive=False)
+        except OSError as e:
+            logger.warning(f"Cannot watch path {path}: {e}")
+    
+    def _is_watched(self, file_path: str) -> bool:
+        """هل المسار ضمن المسارات المراقبة وغير متجاهل"""
+        if _HIDDEN_FILE_MATCH(os.path.basename(file_path)):
+            return False
+        
+        for path in self.watch_paths:
+            if file_path == path:
+                return True
+            if os.path.isdir(path) and file_path.startswith(os.path.join(path, '')):
+                relative_parts = os.path.relpath(os.path.dirname(file_path), path).split(os.sep)
+                return not self.ignore_patterns.intersection(relative_parts)
+        return False
+    
+    def _emit_event(self, change_type: str, file_path: str, is_directory: bool):
+        """إرسال الإشارة المناسبة لحدث من نظام التشغيل"""
+        if not self._is_watched(file_path):
+            return
+        
+        change_info = {
+            'type': change_type,
+            'timestamp': time.time()
+        }
+        
+        if is_directory:
+            self.directory_changed.emit(file_path, change_info)
+            return
+        
+        if change_type != 'removed':
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return
+            change_info['current_state'] = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'mode': stat.st_mode,
+                'exists': True
+            }
+        
+        if change_type == 'added':
+            self.file_added.emit(file_path, change_info)
+        elif change_type == 'modified':
+            self.file_changed.emit(file_path, change_info)
+        else:
+            self.file_removed.emit(file_path, change_info)
+        logger.debug(f"File {change_type}: {file_path}")
+    
     def stop_watching(self):
         """إيقاف المراقبة"""
         self.is_watching = False
@@ -74,16 +287,21 @@ class FileWatcherThread(QThread):
         if path not in self.watch_paths:
             self.watch_paths.append(path)
             if self.is_watching:
-                self.scan_path_initial_state(path)
+                if self._observer is not None:
+                    self._schedule(path)
+                else:
+                    self.scan_path_initial_state(path)
     
     def remove_watch_path(self, path: str):
         """إزالة مسار من المراقبة"""
         if path in self.watch_paths:
             self.watch_paths.remove(path)
+            watch = self._watches.pop(path, None)
+            if watch is not None and self._observer is not None:
+                self._observer.unschedule(watch)
             # إزالة حالات الملفات المرتبطة بهذا المسار
-            to_remove = [fp for fp in self.file_states.keys() if fp.startswith(path)]
-            for fp in to_remove:
-                del self.file_states[fp]
+            for fp in self._by_root.pop(path, ()):
+                self.file_states.pop(fp, None)
     
     def scan_initial_state(self):
         """فحص الحالة الأولية لجميع المسارات"""
@@ -97,32 +315,48 @@ class FileWatcherThread(QThread):
         
         try:
             if os.path.isfile(path):
-                self._scan_file(path)
+                self._scan_file(path, root=path)
             else:
-                for root, dirs, files in os.walk(path):
-                    # تصفية المجلدات المتجاهلة
-                    dirs[:] = [d for d in dirs if d not in self.ignore_patterns]
-                    
-                    for file in files:
-                        if not file.startswith('.') or file in ['.gitignore', '.env']:
-                            file_path = os.path.join(root, file)
-                            self._scan_file(file_path)
+                for file_path, stat in self._iter_file_stats(path):
+                    if stat is not None:
+                        self._scan_file(file_path, stat, path)
         except (OSError, PermissionError) as e:
             logger.warning(f"Cannot scan path {path}: {e}")
     
-    def _scan_file(self, file_path: str):
+    def _iter_file_stats(self, path: str):
+        """
+        المرور على ملفات المجلد عبر scandir وإرجاع (المسار، stat) لكل ملف.
+        stat يأتي من DirEntry: على Windows من نتيجة قراءة المجلد نفسها دون استدعاء إضافي،
+        وعلى الأنظمة الأخرى بطلب واحد لكل ملف دون استدعاءات isdir/exists منفصلة.
+        """
+        for entry in _walk_files(path, self.ignore_patterns):
+            if not _HIDDEN_FILE_MATCH(entry.name):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    stat = None
+                yield entry.path, stat
+    
+    def _scan_file(self, file_path: str, stat: os.stat_result = None, root: str = None):
         """فحص ملف واحد"""
         try:
-            stat = os.stat(file_path)
-            self.file_states[file_path] = {
-                'mtime': stat.st_mtime,
-                'size': stat.st_size,
-                'mode': stat.st_mode,
-                'exists': True
-            }
+            if stat is None:
+                stat = os.stat(file_path)
+            self.file_states[file_path] = (stat.st_mtime, stat.st_size, stat.st_mode)
+            self._by_root.setdefault(root or file_path, set()).add(file_path)
         except (OSError, PermissionError):
             pass
     
+    @staticmethod
+    def _state_dict(state: Tuple[float, int, int], exists: bool = True) -> Dict[str, Any]:
+        """تحويل حالة الملف المضغوطة إلى القاموس المرسل مع الإشارات"""
+        return {
+            'mtime': state[0],
+            'size': state[1],
+            'mode': state[2],
+            'exists': exists
+        }
+    
     def check_changes(self):
         """فحص التغييرات في الملفات"""
         current_files = set()
@@ -134,68 +368,61 @@ class FileWatcherThread(QThread):
             try:
                 if os.path.isfile(watch_path):
                     current_files.add(watch_path)
-                    self._check_file_changes(watch_path)
+                    self._check_file_changes(watch_path, root=watch_path)
                 else:
-                    for root, dirs, files in os.walk(watch_path):
-                        # تصفية المجلدات المتجاهلة
-                        dirs[:] = [d for d in dirs if d not in self.ignore_patterns]
-                        
-                        for file in files:
-                            if not file.startswith('.') or file in ['.gitignore', '.env']:
-                                file_path = os.path.join(root, file)
-                                current_files.add(file_path)
-                                self._check_file_changes(file_path)
+                    for file_path, stat in self._iter_file_stats(watch_path):
+                        current_files.add(file_path)
+                        if stat is not None:
+                            self._check_file_changes(file_path, stat, watch_path)
             except (OSError, PermissionError):
                 continue
         
         # فحص الملفات المحذوفة
-        removed_files = set(self.file_states.keys()) - current_files
+        removed_files = self.file_states.keys() - current_files
         for file_path in removed_files:
-            if self.file_states[file_path]['exists']:
-                self.file_states[file_path]['exists'] = False
-                change_info = {
-                    'type': 'removed',
-                    'timestamp': time.time(),
-                    'previous_state': self.file_states[file_path].copy()
-                }
-                self.file_removed.emit(file_path, change_info)
-                logger.debug(f"File removed: {file_path}")
+            previous_state = self.file_states.pop(file_path)
+            for root_files in self._by_root.values():
+                root_files.discard(file_path)
+            change_info = {
+                'type': 'removed',
+                'timestamp': time.time(),
+                'previous_state': self._state_dict(previous_state, exists=False)
+            }
+            self.file_removed.emit(file_path, change_info)
+            logger.debug(f"File removed: {file_path}")
     
-    def _check_file_changes(self, file_path: str):
+    def _check_file_changes(self, file_path: str, stat: os.stat_result = None, root: str = None):
         """فحص تغييرات ملف معين"""
         try:
-            stat = os.stat(file_path)
-            current_state = {
-                'mtime': stat.st_mtime,
-                'size': stat.st_size,
-                'mode': stat.st_mode,
-                'exists': True
-            }
+            if stat is None:
+                stat = os.stat(file_path)
+            current_state = (stat.st_mtime, stat.st_size, stat.st_mode)
+            previous_state = self.file_states.get(file_path)
             
-            if file_path not in self.file_states:
+            if previous_state is None:
                 # ملف جديد
                 self.file_states[file_path] = current_state
+                self._by_root.setdefault(root or file_path, set()).add(file_path)
                 change_info = {
                     'type': 'added',
                     'timestamp': time.time(),
-                    'current_state': current_state
+                    'current_state': self._state_dict(current_state)
                 }
                 self.file_added.emit(file_path, change_info)
                 logger.debug(f"File added: {file_path}")
                 
-            elif self.file_states[file_path] != current_state:
-                # ملف متغير
-                previous_state = self.file_states[file_path].copy()
+            elif previous_state != current_state:
+                # ملف متغير (مقارنة الصفوف تتم على مستوى C، والقواميس تُبنى عند التغيير فقط)
                 self.file_states[file_path] = current_state
                 
                 change_info = {
                     'type': 'modified',
                     'timestamp': time.time(),
-                    'previous_state': previous_state,
-                    'current_state': current_state,
-                    'size_changed': previous_state['size'] != current_state['size'],
-                    'time_changed': previous_state['mtime'] != current_state['mtime'],
-                    'mode_changed': previous_state['mode'] != current_state['mode']
+                    'previous_state': self._state_dict(previous_state),
+                    'current_state': self._state_dict(current_state),
+                    'size_changed': previous_state[1] != current_state[1],
+                    'time_changed': previous_state[0] != current_state[0],
+                    'mode_changed': previous_state[2] != current_state[2]
                 }
                 self.file_changed.emit(file_path, change_info)
                 logger.debug(f"File modified: {file_path}")
@@ -203,43 +430,108 @@ class FileWatcherThread(QThread):
         except (OSError, PermissionError):
             pass
 
+class _PathEntry:
+    """بديل خفيف لـ os.DirEntry لمسارات قادمة من فهرس المشروع"""
+    
+    __slots__ = ('path', 'name')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+    
+    def stat(self) -> os.stat_result:
+        return os.stat(self.path)
+
+class ProjectIndex:
+    """
+    فهرس مشترك لملفات المشروع: يُبنى بمرور واحد على الشجرة ثم يُحدّث من إشارات
+    مراقب الملفات، فيبحث البحث في القائمة الجاهزة بدلاً من إعادة المرور على القرص.
+    """
+    
+    def __init__(self):
+        self.root: Optional[str] = None
+        # dict كمجموعة مرتبة: يحافظ على ترتيب المرور وإضافة/حذف O(1)
+        self._paths: Dict[str, None] = {}
+        self._valid = False
+        self._lock = threading.Lock()
+    
+    def rebuild(self, root: str):
+        """بناء الفهرس من جديد لمجلد المشروع"""
+        # نفس تصفية المراقب: الملفات المخفية لا تصل إشاراتها، فلا يمكن إبقاؤها محدثة في الفهرس
+        paths = dict.fromkeys(
+            entry.path for entry in _walk_files(root, _SEARCH_IGNORED_DIRS)
+            if not _HIDDEN_FILE_MATCH(entry.name)
+        )
+        with self._lock:
+            self.root = root
+            self._paths = paths
+            self._valid = True
+    
+    def invalidate(self):
+        """إبطال الفهرس (يُعاد بناؤه عند الحاجة)"""
+        with self._lock:
+            self._valid = False
+            self._paths = {}
+    
+    def add(self, file_path: str):
+        if _HIDDEN_FILE_MATCH(os.path.basename(file_path)):
+            return
+        with self._lock:
+            if self._valid:
+                self._paths[file_path] = None
+    
+    def remove(self, file_path: str):
+        with self._lock:
+            self._paths.pop(file_path, None)
+    
+    def paths_under(self, root_path: str) -> Optional[List[str]]:
+        """نسخة من مسارات الملفات تحت المجلد، أو None إذا لم يكن الفهرس صالحاً له"""
+        with self._lock:
+            if not self._valid or self.root is None:
+                return None
+            if root_path == self.root:
+                return list(self._paths)
+            prefix = os.path.join(root_path, '')
+            if not prefix.startswith(os.path.join(self.root, '')):
+                return None
+            return [path for path in self._paths if path.startswith(prefix)]
+
 class FileHistoryManager:
     """مدير تاريخ الملفات"""
     
     def __init__(self, max_history: int = 100):
         self.max_history = max_history
-        self.history = []
-        self.current_index = -1
+        # العمليات المنفذة (الأقدم يُحذف تلقائياً عند تجاوز الحد)
+        self.history = deque(maxlen=max_history)
+        # العمليات المتراجع عنها (الأحدث في الأعلى)
+        self._redo_stack: List[FileOperation] = []
+    
+    @property
+    def current_index(self) -> int:
+        """فهرس آخر عملية منفذة"""
+        return len(self.history) - 1
     
     def add_operation(self, operation: FileOperation):
         """إضافة عملية إلى التاريخ"""
-        # إزالة العمليات التي تأتي بعد الفهرس الحالي (للتراجع)
-        if self.current_index < len(self.history) - 1:
-            self.history = self.history[:self.current_index + 1]
-        
+        # إزالة العمليات المتراجع عنها (لا يمكن إعادتها بعد عملية جديدة)
+        self._redo_stack.clear()
         self.history.append(operation)
-        self.current_index = len(self.history) - 1
-        
-        # الحفاظ على الحد الأقصى للتاريخ
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-            self.current_index -= 1
     
     def can_undo(self) -> bool:
         """فحص إمكانية التراجع"""
-        return self.current_index >= 0
+        return bool(self.history)
     
     def can_redo(self) -> bool:
         """فحص إمكانية الإعادة"""
-        return self.current_index < len(self.history) - 1
+        return bool(self._redo_stack)
     
     def undo(self) -> Optional[FileOperation]:
         """التراجع عن العملية الأخيرة"""
         if not self.can_undo():
             return None
         
-        operation = self.history[self.current_index]
-        self.current_index -= 1
+        operation = self.history.pop()
+        self._redo_stack.append(operation)
         return operation
     
     def redo(self) -> Optional[FileOperation]:
@@ -247,103 +539,208 @@ class FileHistoryManager:
         if not self.can_redo():
             return None
         
-        self.current_index += 1
-        operation = self.history[self.current_index]
+        operation = self._redo_stack.pop()
+        self.history.append(operation)
         return operation
     
     def get_history(self) -> List[FileOperation]:
         """الحصول على التاريخ الكامل"""
-        return self.history.copy()
+        return list(self.history) + self._redo_stack[::-1]
     
     def clear_history(self):
         """مسح التاريخ"""
         self.history.clear()
-        self.current_index = -1
+        self._redo_stack.clear()
 
 class FileSearchEngine:
     """محرك البحث في الملفات"""
     
-    def __init__(self):
-        self.search_cache = {}
-        self.cache_timeout = 300  # 5 دقائق
+    # الحد الأقصى لعدد الملفات في ذاكرة نتائج البحث (يُحذف الأقدم أولاً)
+    MAX_CACHE_ENTRIES = 2000
+    
+    def __init__(self, cache_file: str = None):
+        # مسار الملف -> (الحجم، وقت التعديل، النمط، المطابقات، وقت التخزين)
+        self.search_cache: "OrderedDict[str, Tuple[int, int, str, List[Dict[str, Any]], float]]" = OrderedDict()
+        self.cache_timeout = 24 * 3600  # 24 ساعة
+        self.cache_file = cache_file
+        self._cache_lock = threading.Lock()
+        self._cache_dirty = False
+        self.load_cache()
+    
+    def load_cache(self):
+        """تحميل ذاكرة نتائج البحث المحفوظة من جلسات سابقة"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                entries = _json_loads(f.read())
+            if isinstance(entries, dict):
+                now = time.time()
+                # JSON يحفظ الصفوف كقوائم: [الحجم، وقت التعديل، النمط، المطابقات، وقت التخزين]
+                fresh = sorted(((path, tuple(entry)) for path, entry in entries.items()
+                                if isinstance(entry, list) and len(entry) == 5
+                                and now - entry[4] < self.cache_timeout),
+                               key=lambda item: item[1][4])
+                self.search_cache = OrderedDict(fresh[-self.MAX_CACHE_ENTRIES:])
+        except Exception as e:
+            logger.warning(f"Failed to load search cache: {e}")
+    
+    def save_cache(self):
+        """حفظ ذاكرة نتائج البحث إلى القرص بشكل ذري"""
+        if not self.cache_file or not self._cache_dirty:
+            return
+        with self._cache_lock:
+            now = time.time()
+            # الذاكرة محدودة الحجم أثناء العمل، فيكفي هنا حذف المدخلات المنتهية
+            entries = {path: entry for path, entry in self.search_cache.items()
+                       if now - entry[4] < self.cache_timeout}
+            self.search_cache = OrderedDict(entries)
+            self._cache_dirty = False
+        
+        tmp_path = self.cache_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(_json_dumps(entries))
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Failed to save search cache: {e}")
+    
+    def _cached_content_search(self, file_path: str, stat: os.stat_result, pattern: str,
+                               regex: Optional['re.Pattern']) -> List[Dict[str, Any]]:
+        """البحث في المحتوى مع إعادة استخدام النتيجة إذا لم يتغير الملف ولا النمط"""
+        with self._cache_lock:
+            entry = self.search_cache.get(file_path)
+            if (entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns
+                    and entry[2] == pattern and time.time() - entry[4] < self.cache_timeout):
+                self.search_cache.move_to_end(file_path)
+                return entry[3]
+        
+        matches = self._search_in_file_content(file_path, pattern, regex)
+        with self._cache_lock:
+            self.search_cache[file_path] = (stat.st_size, stat.st_mtime_ns, pattern, matches, time.time())
+            self.search_cache.move_to_end(file_path)
+            if len(self.search_cache) > self.MAX_CACHE_ENTRIES:
+                self.search_cache.popitem(last=False)
+            self._cache_dirty = True
+        return matches
     
     def search_files(self, root_path: str, pattern: str, 
                     include_content: bool = False,
                     file_extensions: List[str] = None,
-                    max_results: int = 1000) -> List[Dict[str, Any]]:
-        """البحث في الملفات"""
+                    max_results: int = 1000,
+                    paths_iter: Iterable[str] = None) -> List[Dict[str, Any]]:
+        """البحث في الملفات (paths_iter: مسارات جاهزة من فهرس المشروع بدلاً من المرور على الشجرة)"""
         results = []
         pattern_lower = pattern.lower()
         
         try:
-            for root, dirs, files in os.walk(root_path):
-                # تصفية المجلدات المتجاهلة
-                dirs[:] = [d for d in dirs if d not in {'.git', '__pycache__', 'node_modules'}]
-                
-                for file in files:
-                    if len(results) >= max_results:
-                        break
-                    
-                    file_path = os.path.join(root, file)
-                    file_name_lower = file.lower()
-                    
-                    # فحص الامتداد
-                    if file_extensions:
-                        _, ext = os.path.splitext(file)
-                        if ext.lower() not in file_extensions:
-                            continue
-                    
-                    # البحث في اسم الملف
-                    name_match = pattern_lower in file_name_lower
-                    content_matches = []
-                    
-                    # البحث في المحتوى
-                    if include_content and self._is_text_file(file_path):
-                        content_matches = self._search_in_file_content(file_path, pattern)
-                    
-                    if name_match or content_matches:
-                        try:
-                            stat = os.stat(file_path)
-                            result = {
-                                'path': file_path,
-                                'name': file,
-                                'size': stat.st_size,
-                                'modified': stat.st_mtime,
-                                'name_match': name_match,
-                                'content_matches': content_matches,
-                                'match_count': len(content_matches)
-                            }
+            if paths_iter is not None:
+                entries = (_PathEntry(path) for path in paths_iter)
+            else:
+                entries = _walk_files(root_path, _SEARCH_IGNORED_DIRS)
+            
+            # جمع المرشحين أولاً (مرور خفيف في خيط واحد)
+            candidates = []
+            for entry in entries:
+                # فحص الامتداد
+                if file_extensions:
+                    _, ext = os.path.splitext(entry.name)
+                    if ext.lower() not in file_extensions:
+                        continue
+                candidates.append(entry)
+            
+            # تجميع تعبير البحث مرة واحدة لكل الملفات
+            regex = self._compile_pattern(pattern) if include_content else None
+            stop_event = threading.Event()
+            
+            def search_one(entry: Union[os.DirEntry, _PathEntry]) -> Optional[Dict[str, Any]]:
+                if stop_event.is_set():
+                    return None
+                return self._search_one(entry, pattern, pattern_lower, include_content, regex)
+            
+            if include_content:
+                # الملفات مستقلة؛ القراءة و re/mmap تحرر GIL فتتداخل عمليات الإدخال والإخراج
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    for result in executor.map(search_one, candidates):
+                        if result is not None:
                             results.append(result)
-                        except OSError:
-                            continue
-                
-                if len(results) >= max_results:
-                    break
+                            if len(results) >= max_results:
+                                stop_event.set()
+                                break
+            else:
+                for candidate in candidates:
+                    result = search_one(candidate)
+                    if result is not None:
+                        results.append(result)
+                        if len(results) >= max_results:
+                            break
         
         except Exception as e:
             logger.error(f"Search error: {e}")
         
         return results
     
-    def _is_text_file(self, file_path: str) -> bool:
+    def _search_one(self, entry: Union[os.DirEntry, _PathEntry], pattern: str, pattern_lower: str,
+                    include_content: bool, regex: Optional['re.Pattern'] = None) -> Optional[Dict[str, Any]]:
+        """البحث في ملف واحد، وإرجاع النتيجة أو None"""
+        file_path = entry.path
+        file = entry.name
+        # البحث في اسم الملف
+        name_match = pattern_lower in file.lower()
+        content_matches = []
+        
+        stat = None
+        
+        # البحث في المحتوى
+        if include_content:
+            try:
+                stat = entry.stat()
+            except OSError:
+                return None
+            if self._is_text_file(file_path, stat):
+                content_matches = self._cached_content_search(file_path, stat, pattern, regex)
+        
+        if not (name_match or content_matches):
+            return None
+        
+        if stat is None:
+            try:
+                stat = entry.stat()
+            except OSError:
+                return None
+        
+        return {
+            'path': file_path,
+            'name': file,
+            'size': stat.st_size,
+            'modified': stat.st_mtime,
+            'name_match': name_match,
+            'content_matches': content_matches,
+            'match_count': len(content_matches)
+        }
+    
+    def _is_text_file(self, file_path: str, stat: os.stat_result = None) -> bool:
         """فحص ما إذا كان الملف نصياً"""
-        try:
-            mime_type, _ = mimetypes.guess_type(file_path)
-            if mime_type and mime_type.startswith('text/'):
-                return True
-            
-            # فحص الامتدادات المعروفة
-            text_extensions = {
-                '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
-                '.txt', '.md', '.rst', '.log', '.cfg', '.ini', '.conf'
-            }
-            _, ext = os.path.splitext(file_path)
-            return ext.lower() in text_extensions
-        except:
-            return False
+        return is_text_file(file_path, stat)
     
-    def _search_in_file_content(self, file_path: str, pattern: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _compile_pattern(pattern: str) -> Optional['re.Pattern']:
+        """تعبير بحث بايتي مُجمّع مسبقاً، أو None إذا احتاج النمط مطابقة حالة غير ASCII"""
+        # re.IGNORECASE على البايتات يطابق حالة أحرف ASCII فقط
+        if not (pattern.isascii() or pattern.lower() == pattern.upper()):
+            return None
+        # lookahead بعرض صفري حتى تُلتقط المطابقات المتداخلة كما في البحث السطري
+        return re.compile(b'(?=' + re.escape(pattern.encode('utf-8')) + b')', re.IGNORECASE)
+    
+    def _search_in_file_content(self, file_path: str, pattern: str,
+                                regex: Optional['re.Pattern'] = None) -> List[Dict[str, Any]]:
         """البحث في محتوى الملف"""
+        if regex is None:
+            regex = self._compile_pattern(pattern)
+        if regex is not None:
+            return self._search_in_file_bytes(file_path, pattern, regex)
+        
         matches = []
         pattern_lower = pattern.lower()
         
@@ -375,15 +772,62 @@ class FileSearchEngine:
             logger.debug(f"Cannot search in file {file_path}: {e}")
         
         return matches
+    
+    def _search_in_file_bytes(self, file_path: str, pattern: str, regex: 're.Pattern') -> List[Dict[str, Any]]:
+        """البحث في الملف كاملاً عبر mmap ومحرك re بدلاً من فك ترميز كل سطر وتحويله"""
+        matches = []
+        
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return matches
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    line_num = 1
+                    counted_to = 0
+                    line_start = line_end = -1
+                    line_content = ''
+                    
+                    for match in regex.finditer(mm):
+                        start = match.start()
+                        
+                        if start >= line_end:
+                            # حد أقصى للمطابقات لكل ملف (يُفحص عند الانتقال لسطر جديد)
+                            if len(matches) >= 50:
+                                break
+                            # عد الأسطر حتى المطابقة فقط، على مستوى C
+                            line_start = mm.rfind(b'\n', 0, start) + 1
+                            line_num += mm[counted_to:line_start].count(b'\n')
+                            counted_to = line_start
+                            line_end = mm.find(b'\n', start)
+                            if line_end == -1:
+                                line_end = len(mm)
+                            line_content = mm[line_start:line_end].decode('utf-8', errors='ignore').strip()
+                        
+                        matches.append({
+                            'line_number': line_num,
+                            'line_content': line_content,
+                            'match_position': len(mm[line_start:start].decode('utf-8', errors='ignore')),
+                            'match_length': len(pattern)
+                        })
+        
+        except Exception as e:
+            logger.debug(f"Cannot search in file {file_path}: {e}")
+        
+        return matches
 
 class FileComparisonEngine:
     """محرك مقارنة الملفات"""
     
+    # الحد الأقصى لعدد الهاشات المخزنة (يُحذف الأقل استخداماً أولاً)
+    MAX_HASH_CACHE = 4096
+    
     def __init__(self):
-        self.hash_cache = {}
+        # بصمة الملف (الجهاز، inode، الحجم، mtime_ns، ctime_ns) -> الهاش؛ أي تغيير يعني مفتاحاً جديداً
+        self.hash_cache: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+        self._hash_lock = threading.Lock()
     
-    def compare_files(self, file1: str, file2: str) -> Dict[str, Any]:
-        """مقارنة ملفين"""
+    def compare_files(self, file1: str, file2: str, use_hash: bool = False) -> Dict[str, Any]:
+        """مقارنة ملفين (use_hash لحساب الهاش وتخزينه بدلاً من المقارنة المباشرة للبايتات)"""
         result = {
             'files': [file1, file2],
             'identical': False,
@@ -394,27 +838,39 @@ class FileComparisonEngine:
         }
         
         try:
-            # فحص وجود الملفات
-            if not os.path.exists(file1) or not os.path.exists(file2):
+            # فحص وجود الملفات (stat واحد لكل ملف يغني عن exists و getsize و getmtime)
+            try:
+                stat1 = os.stat(file1)
+                stat2 = os.stat(file2)
+            except OSError:
                 result['error'] = 'أحد الملفات غير موجود'
                 return result
             
+            # الملف نفسه (أو رابط صلب إليه) مطابق دون قراءة
+            if file1 == file2 or os.path.samestat(stat1, stat2):
+                result['size_match'] = result['hash_match'] = result['identical'] = True
+                return result
+            
             # مقارنة الأحجام
-            size1 = os.path.getsize(file1)
-            size2 = os.path.getsize(file2)
-            result['size_match'] = size1 == size2
+            result['size_match'] = stat1.st_size == stat2.st_size
             
             if not result['size_match']:
                 return result
             
-            # مقارنة الهاش
-            hash1 = self._get_file_hash(file1)
-            hash2 = self._get_file_hash(file2)
-            result['hash_match'] = hash1 == hash2
+            cached1 = self._get_cached_hash(file1, stat1)
+            cached2 = self._get_cached_hash(file2, stat2)
+            if use_hash or (cached1 is not None and cached2 is not None):
+                # مقارنة الهاش (يُعاد استخدام الهاش المخزن إذا لم يتغير الحجم ووقت التعديل)
+                hash1 = cached1 if cached1 is not None else self._get_file_hash(file1, stat1)
+                hash2 = cached2 if cached2 is not None else self._get_file_hash(file2, stat2)
+                result['hash_match'] = hash1 == hash2
+            else:
+                # المقارنة المباشرة تقرأ الملفين مرة واحدة وتتوقف عند أول اختلاف
+                result['hash_match'] = self._files_equal_bytes(file1, file2)
             result['identical'] = result['hash_match']
             
             # إذا كانت الملفات نصية ومختلفة، احسب الفروق
-            if not result['identical'] and self._is_text_file(file1) and self._is_text_file(file2):
+            if not result['identical'] and self._is_text_file(file1, stat1) and self._is_text_file(file2, stat2):
                 result['content_diff'] = self._get_text_diff(file1, file2)
         
         except Exception as e:
@@ -422,55 +878,103 @@ class FileComparisonEngine:
         
         return result
     
-    def _get_file_hash(self, file_path: str) -> str:
+    def _files_equal_bytes(self, file1: str, file2: str, chunk_size: int = 1 << 20) -> bool:
+        """مقارنة محتوى ملفين بايتاً ببايت على دفعات"""
+        fd1 = os.open(file1, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            fd2 = os.open(file2, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                while True:
+                    chunk1 = os.read(fd1, chunk_size)
+                    chunk2 = os.read(fd2, chunk_size)
+                    if chunk1 != chunk2:
+                        return False
+                    if not chunk1:
+                        return True
+            finally:
+                os.close(fd2)
+        finally:
+            os.close(fd1)
+    
+    @staticmethod
+    def _hash_key(file_path: str, stat: os.stat_result) -> Tuple[Any, ...]:
+        """
+        بصمة الملف بدقة النانوثانية مع ctime، حتى لا تُرجع الكتابات السريعة المتتالية
+        هاشاً قديماً. المسار يحل محل inode في أنظمة الملفات التي لا توفره.
+        """
+        return (stat.st_dev, stat.st_ino or file_path, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+    
+    def _get_cached_hash(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        """الهاش المخزن إذا لم يتغير الملف منذ حسابه"""
+        key = self._hash_key(file_path, stat)
+        with self._hash_lock:
+            cached = self.hash_cache.get(key)
+            if cached is not None:
+                self.hash_cache.move_to_end(key)
+            return cached
+    
+    def _get_file_hash(self, file_path: str, stat: os.stat_result = None) -> str:
         """حساب هاش الملف"""
-        if file_path in self.hash_cache:
-            cached_hash, cached_mtime = self.hash_cache[file_path]
-            current_mtime = os.path.getmtime(file_path)
-            if current_mtime == cached_mtime:
-                return cached_hash
+        try:
+            if stat is None:
+                stat = os.stat(file_path)
+        except OSError as e:
+            logger.error(f"Error calculating hash for {file_path}: {e}")
+            return ""
+        
+        cached = self._get_cached_hash(file_path, stat)
+        if cached is not None:
+            return cached
         
-        hash_md5 = hashlib.md5()
         try:
-            with open(file_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            
-            file_hash = hash_md5.hexdigest()
-            self.hash_cache[file_path] = (file_hash, os.path.getmtime(file_path))
+            if blake3 is not None:
+                # BLAKE3 يقرأ الملف عبر mmap ويستخدم SIMD وعدة خيوط دون تقطيع من جهة Python
+                hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+                hasher.update_mmap(file_path)
+            else:
+                hasher = hashlib.md5()
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(4096), b""):
+                        hasher.update(chunk)
+            
+            file_hash = hasher.hexdigest()
+            with self._hash_lock:
+                self.hash_cache[self._hash_key(file_path, stat)] = file_hash
+                if len(self.hash_cache) > self.MAX_HASH_CACHE:
+                    self.hash_cache.popitem(last=False)
             return file_hash
         except Exception as e:
             logger.error(f"Error calculating hash for {file_path}: {e}")
             return ""
     
-    def _is_text_file(self, file_path: str) -> bool:
+    def _is_text_file(self, file_path: str, stat: os.stat_result = None) -> bool:
         """فحص ما إذا كان الملف نصياً"""
-        try:
-            with open(file_path, 'rb') as f:
-                chunk = f.read(1024)
-                return b'\x00' not in chunk
-        except:
-            return False
+        return is_text_file(file_path, stat)
     
     def _get_text_diff(self, file1: str, file2: str) -> List[str]:
         """حساب الفروق النصية بين ملفين"""
         try:
             import difflib
             
-            with open(file1, 'r', encoding='utf-8') as f1:
+            # الملفات الضخمة تستهلك ذاكرة ووقتاً كبيرين في حساب الفروق
+            if max(os.path.getsize(file1), os.path.getsize(file2)) > _MAX_DIFF_FILE_SIZE:
+                return ['<diff too large>']
+            
+            with open(file1, 'r', encoding='utf-8', buffering=1 << 20) as f1:
                 lines1 = f1.readlines()
             
-            with open(file2, 'r', encoding='utf-8') as f2:
+            with open(file2, 'r', encoding='utf-8', buffering=1 << 20) as f2:
                 lines2 = f2.readlines()
             
-            diff = list(difflib.unified_diff(
+            # unified_diff مولّد، فيُستهلك حتى الحد الأقصى فقط
+            diff = difflib.unified_diff(
                 lines1, lines2,
                 fromfile=os.path.basename(file1),
                 tofile=os.path.basename(file2),
                 lineterm=''
-            ))
+            )
             
-            return diff
+            return list(islice(diff, _MAX_DIFF_LINES))
         except Exception as e:
             logger.error(f"Error calculating text diff: {e}")
             return []
@@ -501,6 +1005,8 @@ class EnhancedFileManager(QObject):
         self.current_project = None
         self.current_folder = None
         self.open_files = {}  # file_path -> {'content': str, 'modified': bool, 'encoding': str}
+        # الملفات المفتوحة المعدلة وغير المحفوظة (الحفظ التلقائي يمر عليها فقط)
+        self._dirty: Set[str] = set()
         self.recent_files = []
         self.recent_folders = []
         self.bookmarks = []
@@ -508,7 +1014,8 @@ class EnhancedFileManager(QObject):
         # المكونات المحسنة
         self.file_watcher = None
         self.history_manager = FileHistoryManager()
-        self.search_engine = FileSearchEngine()
+        self.search_engine = FileSearchEngine(os.path.join(config.get_cache_dir(), 'search_cache.json'))
+        self.project_index = ProjectIndex()
         self.comparison_engine = FileComparisonEngine()
         
         # إعدادات متقدمة
@@ -565,6 +1072,7 @@ class EnhancedFileManager(QObject):
             self.config.set('max_backup_files', self.max_backup_files)
             self.config.set('file_encoding', self.file_encoding)
             self.config.set('line_ending', self.line_ending)
+            self.search_engine.save_cache()
         except Exception as e:
             logger.warning(f"Failed to save settings: {e}")
     
@@ -589,10 +1097,13 @@ class EnhancedFileManager(QObject):
         if self.file_watcher:
             self.file_watcher.stop_watching()
         
+        # الفهرس يبقى صحيحاً فقط ما دامت إشارات المراقب تصله
+        self.project_index.invalidate()
         self.file_watcher = FileWatcherThread(paths)
         self.file_watcher.file_changed.connect(self._on_file_changed_externally)
         self.file_watcher.file_added.connect(self._on_file_added_externally)
         self.file_watcher.file_removed.connect(self._on_file_removed_externally)
+        self.file_watcher.directory_changed.connect(self._on_directory_changed_externally)
         self.file_watcher.start()
     
     def stop_file_watching(self):
@@ -600,6 +1111,7 @@ class EnhancedFileManager(QObject):
         if self.file_watcher:
             self.file_watcher.stop_watching()
             self.file_watcher = None
+        self.project_index.invalidate()
     
     def _on_file_changed_externally(self, file_path: str, change_info: dict):
         """التعامل مع تغيير ملف خارجياً"""
@@ -609,13 +1121,35 @@ class EnhancedFileManager(QObject):
         if file_path in self.open_files:
             self.open_files[file_path]['externally_modified'] = True
     
+    def _indexed_paths(self, root_path: str) -> Optional[List[str]]:
+        """مسارات الملفات من فهرس المشروع إذا كان المراقب يُبقيه محدثاً، وإلا None"""
+        if not (self.file_watcher and self.current_folder):
+            return None
+        if not os.path.join(root_path, '').startswith(os.path.join(self.current_folder, '')):
+            return None
+        paths = self.project_index.paths_under(root_path)
+        if paths is None:
+            try:
+                self.project_index.rebuild(self.current_folder)
+            except OSError as e:
+                logger.warning(f"Failed to build project index: {e}")
+                return None
+            paths = self.project_index.paths_under(root_path)
+        return paths
+    
     def _on_file_added_externally(self, file_path: str, change_info: dict):
         """التعامل مع إضافة ملف خارجياً"""
         logger.info(f"File added externally: {file_path}")
+        self.project_index.add(file_path)
+    
+    def _on_directory_changed_externally(self, dir_path: str, change_info: dict):
+        """نقل أو حذف مجلد قد يغيّر مسارات كثيرة دفعة واحدة، فيُعاد بناء الفهرس عند الحاجة"""
+        self.project_index.invalidate()
     
     def _on_file_removed_externally(self, file_path: str, change_info: dict):
         """التعامل مع حذف ملف خارجياً"""
         logger.info(f"File removed externally: {file_path}")
+        self.project_index.remove(file_path)
         
         # إذا كان الملف مفتوحاً، تحديث حالته
         if file_path in self.open_files:
@@ -686,9 +1220,7 @@ class EnhancedFileManager(QObject):
                 return None
             
             # قراءة الملف
-            encoding = self._detect_file_encoding(file_path)
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
+            content, encoding = self._read_text_fast(file_path)
             
             # إضافة إلى الملفات المفتوحة
             self.open_files[file_path] = {
@@ -739,6 +1271,7 @@ class EnhancedFileManager(QObject):
                 f.write(content)
             
             # تحديث الملفات المفتوحة
+            self._dirty.discard(file_path)
             if file_path in self.open_files:
                 self.open_files[file_path].update({
                     'content': content,
@@ -816,6 +1349,7 @@ class EnhancedFileManager(QObject):
         
         # إزالة من الملفات المفتوحة
         del self.open_files[file_path]
+        self._dirty.discard(file_path)
         
         logger.info(f"File closed: {file_path}")
         return True
@@ -880,6 +1414,9 @@ class EnhancedFileManager(QObject):
             # تحديث الملفات المفتوحة
             if old_path in self.open_files:
                 self.open_files[new_path] = self.open_files.pop(old_path)
+                if old_path in self._dirty:
+                    self._dirty.discard(old_path)
+                    self._dirty.add(new_path)
             
             # تحديث الملفات الأخيرة
             if old_path in self.recent_files:
@@ -962,6 +1499,9 @@ class EnhancedFileManager(QObject):
             # تحديث الملفات المفتوحة
             if source_path in self.open_files:
                 self.open_files[dest_path] = self.open_files.pop(source_path)
+                if source_path in self._dirty:
+                    self._dirty.discard(source_path)
+                    self._dirty.add(dest_path)
             
             # تحديث الملفات الأخيرة
             if source_path in self.recent_files:
@@ -1028,7 +1568,8 @@ class EnhancedFileManager(QObject):
         def search_thread():
             try:
                 results = self.search_engine.search_files(
-                    root_path, pattern, include_content, file_extensions
+                    root_path, pattern, include_content, file_extensions,
+                    paths_iter=self._indexed_paths(root_path)
                 )
                 self.search_completed.emit(search_id, results)
             except Exception as e:
@@ -1038,9 +1579,9 @@ class EnhancedFileManager(QObject):
         threading.Thread(target=search_thread, daemon=True).start()
         return search_id
     
-    def compare_files(self, file1: str, file2: str) -> Dict[str, Any]:
+    def compare_files(self, file1: str, file2: str, use_hash: bool = False) -> Dict[str, Any]:
         """مقارنة ملفين"""
-        return self.comparison_engine.compare_files(file1, file2)
+        return self.comparison_engine.compare_files(file1, file2, use_hash)
     
     def add_recent_file(self, file_path: str):
         """إضافة ملف إلى القائمة الأخيرة"""
@@ -1255,8 +1796,13 @@ class EnhancedFileManager(QObject):
         if not self.auto_save_enabled:
             return
         
-        for file_path, file_info in self.open_files.items():
-            if file_info['modified'] and not file_info['externally_modified']:
+        # المرور على الملفات المعدلة فقط بدلاً من كل الملفات المفتوحة
+        for file_path in list(self._dirty):
+            file_info = self.open_files.get(file_path)
+            if file_info is None or not file_info['modified']:
+                self._dirty.discard(file_path)
+                continue
+            if not file_info['externally_modified']:
                 try:
                     self.save_file(file_path, file_info['content'], file_info['encoding'])
                     logger.debug(f"Auto-saved: {file_path}")
@@ -1312,13 +1858,35 @@ class EnhancedFileManager(QObject):
         except Exception as e:
             logger.warning(f"Failed to cleanup old backups: {e}")
     
-    def _detect_file_encoding(self, file_path: str) -> str:
+    def _read_text_fast(self, file_path: str) -> Tuple[str, str]:
+        """
+        قراءة ملف نصي بقراءة واحدة، يُكتشف الترميز من أولها.
+        الملفات الكبيرة تُفك من mmap مباشرة دون نسخة bytes وسيطة.
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > _MMAP_READ_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    encoding = self._detect_file_encoding(file_path, mm[:10000])
+                    content = str(mm, encoding)
+            else:
+                raw_data = f.read()
+                encoding = self._detect_file_encoding(file_path, raw_data[:10000])
+                content = raw_data.decode(encoding)
+        
+        # توحيد نهايات الأسطر كما في القراءة بالوضع النصي
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content, encoding
+    
+    def _detect_file_encoding(self, file_path: str, raw_data: bytes = None) -> str:
         """اكتشاف ترميز الملف"""
         try:
             import chardet
             
-            with open(file_path, 'rb') as f:
-                raw_data = f.read(10000)  # قراءة أول 10KB
+            if raw_data is None:
+                with open(file_path, 'rb') as f:
+                    raw_data = f.read(10000)  # قراءة أول 10KB
+            if raw_data:
                 result = chardet.detect(raw_data)
                 encoding = result['encoding']
                 
@@ -1420,6 +1988,10 @@ class EnhancedFileManager(QObject):
         """تحديد حالة تعديل الملف"""
         if file_path in self.open_files:
             self.open_files[file_path]['modified'] = modified
+            if modified:
+                self._dirty.add(file_path)
+            else:
+                self._dirty.discard(file_path)
     
     def get_operation_history(self) -> List[FileOperation]:
         """الحصول على تاريخ العمليات"""
@@ -5,16 +5,151 @@ JSON AI Processor for Enhanced Code Editor
 معالج الذكاء الاصطناعي المحسن للـ JSON
 """
 
+import hashlib
 import json
 import logging
 import os
 import re
-from typing import Dict, Any, Optional, List
-from PyQt6.QtCore import QObject, pyqtSignal, QThread
-import google.generativeai as genai
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QThreadPool, QTimer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import xxhash
+except ImportError:
+    # بدون xxhash تُستخدم blake2b من hashlib
+    xxhash = None
+
 from .ai_prompts import AIPrompts
+from .prompt_cache import PromptCache
+from .llm_cache import LLMCache, MemoryLRUBackend, DiskCacheBackend, DEFAULT_TTL
 from .unified_file_manager import UnifiedFileManager
 logger = logging.getLogger(__name__)
+
+# الإجراءات التي تعتمد على حالة الملفات ولا يجوز إعادة استخدام استجاباتها
+_UNCACHEABLE_ACTIONS = frozenset({'create_file', 'replace_code'})
+_EMBEDDING_MODEL = 'models/text-embedding-004'
+
+# مهلة تجميع عمليات حفظ سجل المحادثة (بالمللي ثانية)
+_HISTORY_SAVE_DELAY_MS = 2000
+
+# أنماط مسح وتنظيف JSON، تُترجم مرة واحدة لكل عملية
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+# خارج النصوص: بداية نص، تعليق // أو #، فاصلة زائدة قبل } أو ]، سطر فارغ
+_OUTSIDE_TOKEN_RE = re.compile(r'"|(?://|#)[^\n]*|,(?=(?:\s|(?://|#)[^\n]*)*[}\]])|\n[ \t\r]*(?=\n)')
+# داخل النصوص: نهاية النص، هروب، أو حرف تحكم خام يجب تهريبه
+_STRING_SPECIAL_RE = re.compile(r'["\\\n\r\t]')
+_MISSING_COMMA_RE = re.compile(r'\s*"')
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+def _config_flag(value) -> bool:
+    return str(value).strip().lower() == 'true'
+
+
+def _code_fingerprint(code: str) -> int:
+    """بصمة 64 بت سريعة لنص الكود"""
+    data = code.encode('utf-8', 'ignore')
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _json_loads(json_str: str) -> Any:
+    """فك JSON باستخدام orjson إن توفر، مع الرجوع لـ json لما يرفضه (مثل NaN)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(json_str)
+
+
+def _find_json_object(text: str) -> Optional[Tuple[int, int]]:
+    """
+    حدود أول كائن JSON متوازن في النص بمسح واحد يتتبع العمق وحالة النصوص والهروب.
+    إذا لم يتوازن الكائن (JSON معطوب) تُرجع المدى من أول { إلى آخر } كما في السابق.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    # القفز مباشرة بين الرموز المهمة بدلاً من المرور على كل حرف في Python
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = match.group()
+        if char == '\\':
+            if in_string:
+                escaped_pos = pos + 1
+        elif char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return start, pos + 1
+    end = text.rfind('}')
+    return (start, end + 1) if end > start else None
+
+
+def _sanitize_json(text: str) -> str:
+    """
+    تنظيف JSON في مسح واحد يميز ما داخل النصوص عما خارجها:
+    خارج النصوص تُحذف التعليقات والفواصل الزائدة والأسطر الفارغة وتُضاف الفاصلة
+    المفقودة بين نصين متتاليين؛ داخل النصوص تُهرَّب أحرف السطر الجديد والجدولة الخام.
+    المقاطع العادية تُنسخ كشرائح كاملة بين الرموز المهمة.
+    """
+    out = []
+    pos = 0
+    while True:
+        match = _OUTSIDE_TOKEN_RE.search(text, pos)
+        if match is None:
+            out.append(text[pos:])
+            return ''.join(out)
+        out.append(text[pos:match.start()])
+        pos = match.end()
+        if match.group() != '"':
+            # تعليق أو فاصلة زائدة أو سطر فارغ: يُحذف
+            continue
+
+        out.append('"')
+        while True:
+            special = _STRING_SPECIAL_RE.search(text, pos)
+            if special is None:
+                # نص غير مغلق؛ يُترك كما هو ليفشل التحليل لاحقاً
+                out.append(text[pos:])
+                return ''.join(out)
+            index = special.start()
+            out.append(text[pos:index])
+            char = text[index]
+            if char == '"':
+                out.append('"')
+                pos = index + 1
+                break
+            if char == '\\':
+                out.append(text[index:index + 2])
+                pos = index + 2
+            else:
+                out.append(_CONTROL_ESCAPES[char])
+                pos = index + 1
+
+        # نص يتبعه نص آخر مباشرة (مثل "a": "x" ثم "b": ...) ينقصه فاصلة
+        if _MISSING_COMMA_RE.match(text, pos):
+            out.append(',')
+
+
 class JSONAIProcessor(QObject):
     """معالج الذكاء الاصطناعي المحسن للـ JSON"""
 
@@ -32,28 +167,179 @@ class JSONAIProcessor(QObject):
         self.model = None
         self.chat = None
         self.is_connected = False
-        self.current_worker = None
+        # الطلبات الجارية حسب المعرّف؛ المجمع يملك دورة حياة العمال
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(int(self.config.get('ai.max_concurrent', 4)))
+        self._in_flight: Dict[str, "JSONAIWorker"] = {}
+        self._request_counter = 0
+        self._current_request_id: Optional[str] = None
+        # جلسة المحادثة ليست آمنة للخيوط، فتُرسل الرسائل عليها بالتتابع
+        self._chat_lock = threading.Lock()
         # إضافة متغيرات لتخزين سياق الكود الحالي والمسار
         self.current_code = ""
         self.current_file_path = ""
-        
-        # تهيئة الاتصال
-        self.initialize_connection()
+        self.project_files_context: Optional[List[str]] = None
+        # بصمة current_code تُحسب عند أول حاجة إليها بعد كل تغيير في السياق
+        self._code_hash = _code_fingerprint("")
+        self._hashed_code = ""
+        self.prompt_cache = PromptCache(self.config.get_cache_dir())
+        self.model_name = ""
+        self.generation_config: Dict[str, Any] = {}
+        self.response_cache = self._create_response_cache()
+        # google.generativeai يُستورد عند أول استخدام فقط (يجر grpc وprotobuf عند بدء التطبيق)
+        self._genai = None
+        self._connection_attempted = False
+        # نماذج GenerativeModel المبنية مسبقاً، تُعاد عند إعادة التهيئة بنفس الإعدادات
+        self._model_cache: Dict[tuple, Any] = {}
+
+        # سجل المحادثة يُحفظ لكل مشروع ويُستعاد عند الاتصال، مع تجميع عمليات الحفظ
+        self._history_path: Optional[str] = None
+        self._history_timer = QTimer(self)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.setInterval(_HISTORY_SAVE_DELAY_MS)
+        self._history_timer.timeout.connect(self._flush_history)
+        self.file_manager.folder_opened.connect(self._on_folder_opened)
+
     def shutdown(self):
         """إيقاف أي عامل AI نشط بشكل سلس عند إغلاق التطبيق."""
-        if self.current_worker and self.current_worker.isRunning():
-            logger.info("JSONAIProcessor: Shutting down active AI worker.")
-            self.current_worker.cancel() # اطلب من العامل إلغاء عمله
-            # *** هذا السطر هو الأهم لحل مشكلة التحذير ***
-            # انتظر حتى ينهي الخيط عمله تماماً قبل أن يتم تدميره.
-            # هذا يمنع رسالة "Destroyed while thread is still running"
-            self.current_worker.wait()
-            logger.info("JSONAIProcessor: AI worker thread has finished.")
+        self._history_timer.stop()
+        if self._in_flight:
+            logger.info(f"JSONAIProcessor: Shutting down {len(self._in_flight)} active AI worker(s).")
+            for worker in self._in_flight.values():
+                worker.cancel() # اطلب من العامل إلغاء عمله
+            # انتظر حتى تنتهي خيوط المجمع قبل تدمير المعالج
+            self.pool.waitForDone()
+            self._in_flight.clear()
+            logger.info("JSONAIProcessor: AI worker threads have finished.")
         else:
             logger.info("JSONAIProcessor: No active AI worker to shut down.")
+        self._flush_history()
+
+    def _history_file_path(self) -> str:
+        """مسار ملف سجل المحادثة الخاص بالمشروع الحالي"""
+        history_dir = self.config.get('ai.history_dir', '') or self.config.get_cache_dir()
+        project = self.file_manager.current_folder or ''
+        project_key = hashlib.sha1(os.path.abspath(project).encode('utf-8')).hexdigest()[:12] if project else 'default'
+        return os.path.join(os.path.expanduser(history_dir), f"chat_history_{project_key}.json")
+
+    def _max_history_contents(self) -> int:
+        # كل جولة = رسالة المستخدم + رد النموذج
+        return 2 * int(self.config.get('ai.history_max_turns', 10))
+
+    def _load_history(self) -> List[Dict[str, Any]]:
+        """تحميل سجل المحادثة المحفوظ للمشروع الحالي"""
+        if not _config_flag(self.config.get('ai.persist_history', True)):
+            return []
+        self._history_path = self._history_file_path()
+        try:
+            with open(self._history_path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning(f"JSONAIProcessor: Failed to load chat history {self._history_path}: {e}")
+            return []
+        if not isinstance(history, list):
+            return []
+        logger.info(f"JSONAIProcessor: Restored {len(history)} chat history entries.")
+        return history[-self._max_history_contents():]
+
+    def _start_chat(self):
+        """استئناف المحادثة المحفوظة للمشروع الحالي (بدون system prompt في history)"""
+        history = self._load_history()
+        try:
+            self.chat = self.model.start_chat(history=history)
+        except Exception as e:
+            logger.warning(f"JSONAIProcessor: Saved chat history rejected, starting fresh: {e}")
+            self.chat = self.model.start_chat(history=[])
+
+    def _on_folder_opened(self, folder_path: str):
+        """تبديل سجل المحادثة عند فتح مشروع آخر"""
+        if self.chat is None or not self._history_path:
+            return
+        if self._history_file_path() == self._history_path:
+            return
+        # رد طلب جارٍ يخص المشروع السابق
+        self.cancel_current_operation()
+        # حفظ سجل المشروع السابق في ملفه قبل تغيير المسار
+        self._history_timer.stop()
+        self._flush_history()
+        logger.info(f"JSONAIProcessor: Switching chat history to project {folder_path}")
+        self._start_chat()
+
+    def _schedule_history_save(self):
+        if self._history_path and not self._history_timer.isActive():
+            self._history_timer.start()
+
+    def _flush_history(self):
+        """حفظ سجل المحادثة إلى القرص بشكل ذري"""
+        if not self._history_path or self.chat is None:
+            return
+        # لا يُقرأ السجل أثناء استلام رد على نفس المحادثة؛ يُعاد الجدولة بدلاً من الانتظار
+        if not self._chat_lock.acquire(blocking=False):
+            self._history_timer.start()
+            return
+        try:
+            contents = list(self.chat.history)[-self._max_history_contents():]
+            history = [
+                {'role': content.role, 'parts': [{'text': part.text} for part in content.parts if part.text]}
+                for content in contents
+            ]
+        except Exception as e:
+            logger.warning(f"JSONAIProcessor: Chat history not serializable, skipping save: {e}")
+            return
+        finally:
+            self._chat_lock.release()
+
+        tmp_path = self._history_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._history_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False)
+            os.replace(tmp_path, self._history_path)
+        except Exception as e:
+            logger.warning(f"JSONAIProcessor: Failed to save chat history {self._history_path}: {e}")
+
+    def _create_response_cache(self) -> Optional[LLMCache]:
+        """إنشاء مخزن الاستجابات حسب الإعدادات"""
+        if not _config_flag(self.config.get('ai.response_cache.enabled', True)):
+            return None
+        ttl = float(self.config.get('ai.response_cache.ttl', DEFAULT_TTL))
+        backend = None
+        if self.config.get('ai.response_cache.backend', 'memory') == 'disk':
+            try:
+                backend = DiskCacheBackend(os.path.join(self.config.get_cache_dir(), 'llm_responses'))
+            except ImportError:
+                logger.warning("JSONAIProcessor: diskcache not installed, using in-memory response cache.")
+        return LLMCache(backend or MemoryLRUBackend(), ttl=ttl)
+
+    def _response_cache_active(self) -> bool:
+        """يُستخدم المخزن فقط عندما تكون الاستجابة حتمية أو بطلب صريح"""
+        if self.response_cache is None:
+            return False
+        return (self.generation_config.get('temperature') == 0
+                or _config_flag(self.config.get('ai.response_cache.deterministic', False)))
+
+    def _semantic_embedder(self):
+        """دالة حساب متجه الطلب لطبقة التشابه الدلالي، أو None إذا كانت معطلة"""
+        if not (self.response_cache.semantic_available
+                and _config_flag(self.config.get('ai.response_cache.semantic', False))):
+            return None
+
+        def embed(text: str):
+            result = self._genai.embed_content(model=_EMBEDDING_MODEL, content=text)
+            return result['embedding']
+        return embed
     
+    def _ensure_connected(self) -> bool:
+        """تهيئة الاتصال عند أول حاجة إليه"""
+        if not self._connection_attempted:
+            self.initialize_connection()
+        return self.is_connected
+
     def initialize_connection(self):
         """تهيئة الاتصال مع Gemini AI"""
+        self._connection_attempted = True
         try:
             api_key = self.config.get_gemini_api_key()
             if not api_key or api_key == "your_api_key_here":
@@ -62,6 +348,8 @@ class JSONAIProcessor(QObject):
                 self.connection_status_changed.emit(False) # إصدار الإشارة: فشل الاتصال
                 return False
             
+            import google.generativeai as genai
+            self._genai = genai
             genai.configure(api_key=api_key)
             
             # إعداد النموذج
@@ -84,15 +372,39 @@ class JSONAIProcessor(QObject):
             # الحصول على الـ system prompt
             system_prompt_text = AIPrompts.get_system_prompt()
 
-            # تهيئة GenerativeModel مع system_instruction
-            self.model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=generation_config,
-                system_instruction=system_prompt_text # تم نقل system_prompt إلى هنا
-            )
+            # استخدام الـ system prompt المخزن مؤقتاً إن أمكن، وإلا system_instruction العادي
+            self.model_name = model_name
+            self.generation_config = generation_config
+            self.model = None
+            cached_name = self.prompt_cache.register(system_prompt_text, model_name)
+            if cached_name:
+                try:
+                    self.model = genai.GenerativeModel.from_cached_content(
+                        cached_content=cached_name,
+                        generation_config=generation_config
+                    )
+                except Exception as e:
+                    logger.warning(f"JSONAIProcessor: Cached prompt {cached_name} unusable, falling back: {e}")
+                    self.prompt_cache.invalidate(system_prompt_text, model_name)
+            if self.model is None:
+                # النموذج يحتفظ بعميل مرتبط بالمفتاح، لذا تدخل بصمة المفتاح في المفتاح أيضاً
+                model_key = (
+                    model_name,
+                    hashlib.blake2b(system_prompt_text.encode('utf-8'), digest_size=16).hexdigest(),
+                    tuple(sorted(generation_config.items())),
+                    hashlib.blake2b(api_key.encode('utf-8'), digest_size=16).hexdigest(),
+                )
+                self.model = self._model_cache.get(model_key)
+                if self.model is None:
+                    # تهيئة GenerativeModel مع system_instruction
+                    self.model = genai.GenerativeModel(
+                        model_name=model_name,
+                        generation_config=generation_config,
+                        system_instruction=system_prompt_text # تم نقل system_prompt إلى هنا
+                    )
+                    self._model_cache[model_key] = self.model
             
-            # بدء محادثة جديدة بدون system prompt في history
-            self.chat = self.model.start_chat(history=[]) # تم إزالة system_prompt من history
+            self._start_chat()
             
             self.is_connected = True
             logger.info("JSON AI Processor connected successfully")
@@ -108,14 +420,13 @@ class JSONAIProcessor(QObject):
     def process_user_input(self, user_input: str, current_code: str = "", file_path: str = "", project_files: List[str] = None):
         """معالجة مدخلات المستخدم وإرجاع استجابة JSON"""
         logger.info(f"JSONAIProcessor: Received user input for processing. Input length: {len(user_input)}")
-        if not self.is_connected:
+        if not self._ensure_connected():
             self.error_occurred.emit("الذكاء الاصطناعي غير متصل")
             logger.error("JSONAIProcessor: AI is not connected, cannot process input.")
             return
         
-        if self.current_worker and self.current_worker.isRunning():
-            self.current_worker.cancel()
-            self.current_worker.wait()
+        # الطلب الجديد يلغي السابق دون انتظاره؛ العامل الملغى يتوقف قبل الإرسال أو يتجاهل الرد
+        if self.cancel_current_operation():
             logger.info("JSONAIProcessor: Cancelled previous worker.")
         
         # استخدام السياق المخزن إذا لم يتم توفيره مباشرة في الاستدعاء
@@ -126,23 +437,52 @@ class JSONAIProcessor(QObject):
 
         # تنسيق المدخلات
         formatted_input = AIPrompts.format_user_input(user_input, current_code, file_path)
-        logger.debug(f"JSONAIProcessor: Formatted input length: {len(formatted_input)}")
+        logger.debug("JSONAIProcessor: Formatted input length: %d", len(formatted_input))
         
         # إضافة سياق المشروع إذا كان متوفراً
+        context = ""
         if project_files:
             context = AIPrompts.get_context_prompt(project_files)
             formatted_input = context + "\n" + formatted_input
-            logger.debug(f"JSONAIProcessor: Added project context. New input length: {len(formatted_input)}")
+            logger.debug("JSONAIProcessor: Added project context. New input length: %d", len(formatted_input))
+
+        # محاولة إعادة استخدام استجابة مخزنة قبل أي اتصال بالشبكة
+        cache_key = None
+        embedder = None
+        if self._response_cache_active():
+            # المفتاح يُبنى من بصمة الكود بدلاً من تمرير الكود كاملاً إلى sha256 في كل طلب
+            code_hash = self.get_code_hash() if current_code is self.current_code else _code_fingerprint(current_code)
+            cache_key = self.response_cache.key(
+                self.model_name, f"{user_input}\0{code_hash:x}\0{file_path}\0{context}", self.generation_config
+            )
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("JSONAIProcessor: Serving response from cache.")
+                cached['from_cache'] = True
+                self._handle_ai_response(cached)
+                return
+            embedder = self._semantic_embedder()
         
-        # بدء المعالجة في خيط منفصل
-        self.current_worker = JSONAIWorker(self.chat, formatted_input, self.file_manager)
-        self.current_worker.response_ready.connect(self._handle_ai_response)
-        self.current_worker.error_occurred.connect(self.error_occurred.emit)
-        self.current_worker.progress_updated.connect(self.progress_updated.emit)
-        self.current_worker.file_creation_requested.connect(self.file_creation_requested.emit)
-        self.current_worker.finished.connect(self._worker_finished)
-        self.current_worker.start()
-        logger.info("JSONAIProcessor: JSONAIWorker started.")
+        # بدء المعالجة في مجمع الخيوط المشترك
+        self._request_counter += 1
+        request_id = f"ai_{self._request_counter}"
+        worker = JSONAIWorker(request_id, self.chat, self._chat_lock, formatted_input, self.file_manager,
+                              cache=self.response_cache if embedder else None, embedder=embedder)
+
+        def on_response(response: Dict[str, Any]):
+            # تجاهل رد وصل بعد إلغاء الطلب
+            if not worker.is_cancelled:
+                self._handle_ai_response(response, cache_key, worker.query_embedding)
+
+        worker.signals.response_ready.connect(on_response)
+        worker.signals.error_occurred.connect(self.error_occurred.emit)
+        worker.signals.progress_updated.connect(self.progress_updated.emit)
+        worker.signals.file_creation_requested.connect(self.file_creation_requested.emit)
+        worker.signals.finished.connect(self._worker_finished)
+        self._in_flight[request_id] = worker
+        self._current_request_id = request_id
+        self.pool.start(worker)
+        logger.info(f"JSONAIProcessor: JSONAIWorker {request_id} started.")
     
     def process_general_query(self, query: str):
         """
@@ -156,17 +496,38 @@ class JSONAIProcessor(QObject):
 
    
     def set_context(self, current_code: str, file_path: str, project_files: Optional[List[str]] = None):
+        # تُستدعى بكثرة من المحرر؛ السياق غير المتغير لا يُعاد تخزينه فتبقى بصمة الكود المحسوبة صالحة.
+        # مقارنة النصوص أرخص من حساب بصمة جديدة (تتوقف فوراً عند اختلاف الطول)
+        if (file_path == self.current_file_path and project_files == self.project_files_context
+                and (current_code is self.current_code or current_code == self.current_code)):
+            return
         self.current_code = current_code
         self.current_file_path = file_path
         self.project_files_context = project_files
-        logger.debug(f"JSONAIProcessor: Context updated. File: {file_path}, Code length: {len(current_code)}")
+        logger.debug("JSONAIProcessor: Context updated. File: %s, Code length: %d", file_path, len(current_code))
         # Make absolutely sure there is NO call to self.process_user_input() or starting a worker here.
         # This method should be passive.
-    def _handle_ai_response(self, response: Dict[str, Any]):
+
+    def get_code_hash(self) -> int:
+        """بصمة current_code؛ تُعاد من الذاكرة ما لم يتغير الكود منذ آخر حساب"""
+        if self._hashed_code is not self.current_code:
+            self._code_hash = _code_fingerprint(self.current_code)
+            self._hashed_code = self.current_code
+        return self._code_hash
+
+    def _handle_ai_response(self, response: Dict[str, Any], cache_key: Optional[str] = None,
+                            query_embedding=None):
         """معالجة استجابة الذكاء الاصطناعي"""
         logger.info(f"JSONAIProcessor: Handling AI response. Action: {response.get('action')}")
         try:
             action = response.get('action', '')
+
+            # التخزين قبل أن تُضاف حقول نتيجة تنفيذ الإجراء
+            if (cache_key and action not in _UNCACHEABLE_ACTIONS and action != 'error'
+                    and not response.get('from_cache')):
+                self.response_cache.set(cache_key, response, query_embedding)
+            if not response.get('from_cache'):
+                self._schedule_history_save()
             
             # معالجة الإجراءات الخاصة
             if action == 'create_file' and response.get('auto_create', False):
@@ -184,133 +545,218 @@ class JSONAIProcessor(QObject):
                 else:
                     response['error'] = f"فشل في إنشاء الملف: {file_name}"
                     logger.error(f"JSONAIProcessor: Failed to auto-create file: {file_name}")
-            elif action in ["add_code", "replace_code", "optimize_code", "add_comment"]:
-                content = response.get("content", "") # Ensure content is always defined here
+            elif action in ("add_code", "add_comment", "replace_code", "optimize_code"):
                 if self.current_file_path:
-                    current_content = self.file_manager.open_file(self.current_file_path)
-                    if current_content is not None:
-                        if action == 'add_code':
-                            new_content = current_content + '\n\n' + content
-                        elif action == 'add_comment':
-                            new_content = current_content + '\n' + content
-                        else: # replace_code, optimize_code
-                            new_content = content
-                        
-                        success = self.file_manager.save_file(self.current_file_path, new_content)
-                        if success:
-                            response['file_updated'] = True
-                            response['file_path'] = self.current_file_path
-                            logger.info(f"JSONAIProcessor: File updated in-place: {self.current_file_path}")
-                        else:
-                            response['error'] = f"فشل في تحديث الملف: {self.current_file_path}"
-                            logger.error(f"JSONAIProcessor: Failed to update file in-place: {self.current_file_path}")
-                    else:
-                        response['error'] = f"فشل في قراءة الملف الحالي: {self.current_file_path}"
-                        logger.error(f"JSONAIProcessor: Failed to read current file for in-place update: {self.current_file_path}")
-                else:
-                    response['error'] = "لا يوجد ملف حالي لتحديثه."
-                    logger.error("JSONAIProcessor: No current file path for in-place update.")
+                    # الكتابة تتم خارج خيط الواجهة، و response_ready يُرسل بعد انتهائها
+                    self._apply_file_action(response, action, self.current_file_path)
+                    return
+                response['error'] = "لا يوجد ملف حالي لتحديثه."
+                logger.error("JSONAIProcessor: No current file path for in-place update.")
             
-            self.response_ready.emit(response)
-            logger.info("JSONAIProcessor: Emitted response_ready signal.")
+            self._emit_response(response)
             
         except Exception as e:
             logger.error(f"JSONAIProcessor: Error handling AI response: {e}", exc_info=True)
             self.error_occurred.emit(f"خطأ في معالجة الاستجابة: {str(e)}")
     
-    def _worker_finished(self):
+    def _apply_file_action(self, response: Dict[str, Any], action: str, file_path: str):
+        """تطبيق إجراء تعديل الملف الحالي؛ النتيجة تُضاف إلى response قبل إرساله"""
+        content = response.get("content", "")
+
+        def done(new_content: Optional[str]):
+            if new_content is not None:
+                if file_path == self.current_file_path:
+                    self.current_code = new_content
+                response['file_updated'] = True
+                response['file_path'] = file_path
+                logger.info(f"JSONAIProcessor: File updated in-place: {file_path}")
+            else:
+                response['error'] = f"فشل في تحديث الملف: {file_path}"
+                logger.error(f"JSONAIProcessor: Failed to update file in-place: {file_path}")
+            self._emit_response(response)
+
+        if action in ("add_code", "add_comment"):
+            # الإلحاق يعتمد على المحتوى المعروف في الذاكرة بدلاً من قراءة الملف ثم إعادة كتابته
+            separator = '\n\n' if action == 'add_code' else '\n'
+            self.file_manager.append_file(file_path, separator + content, on_done=done)
+        elif not os.path.isfile(file_path):
+            response['error'] = f"فشل في قراءة الملف الحالي: {file_path}"
+            logger.error(f"JSONAIProcessor: Failed to read current file for in-place update: {file_path}")
+            self._emit_response(response)
+        else: # replace_code, optimize_code
+            self.file_manager.save_file_async(
+                file_path, content, lambda success: done(content if success else None)
+            )
+
+    def _emit_response(self, response: Dict[str, Any]):
+        self.response_ready.emit(response)
+        logger.info("JSONAIProcessor: Emitted response_ready signal.")
+
+    def _worker_finished(self, request_id: str):
         """التعامل مع انتهاء العامل"""
-        logger.info("JSONAIProcessor: JSONAIWorker finished.")
-        if self.current_worker:
-            if self.current_worker.isRunning():
-               logger.debug("JSONAIProcessor: Waiting for worker to finish before deleting.")
-               self.current_worker.wait()
-            self.current_worker.deleteLater()
-            self.current_worker = None
+        logger.info(f"JSONAIProcessor: JSONAIWorker {request_id} finished.")
+        self._in_flight.pop(request_id, None)
+        if self._current_request_id == request_id:
+            self._current_request_id = None
 
     
     def is_busy(self):
         """فحص ما إذا كان المعالج مشغولاً"""
-        return self.current_worker is not None and self.current_worker.isRunning()
+        return self._current_request_id is not None
     
-    def cancel_current_operation(self):
+    def cancel_current_operation(self) -> bool:
         """إلغاء العملية الحالية"""
-        if self.current_worker and self.current_worker.isRunning():
-            logger.info("JSONAIProcessor: Cancelling current operation.")
-            self.current_worker.cancel()
-            self.current_worker.wait()
+        worker = self._in_flight.get(self._current_request_id) if self._current_request_id else None
+        if worker is None:
+            return False
+        logger.info(f"JSONAIProcessor: Cancelling current operation {self._current_request_id}.")
+        worker.cancel()
+        self._current_request_id = None
+        return True
 
     def is_available(self) -> bool:
         """
         فحص ما إذا كان معالج الذكاء الاصطناعي متاحاً (متصلاً).
         هذه الدالة تُستخدم بواسطة EnhancedMainWindow للتحقق من حالة الاتصال.
         """
+        if not self._connection_attempted:
+            # الاتصال يتم بعد عودة حلقة الأحداث ليظهر الإطار أولاً؛ النتيجة تصل عبر connection_status_changed
+            QTimer.singleShot(0, self._ensure_connected)
         return self.is_connected
 
-class JSONAIWorker(QThread):
-    """عامل معالجة الذكاء الاصطناعي في خيط منفصل"""
-    
+class JSONAIWorkerSignals(QObject):
+    """إشارات عامل الذكاء الاصطناعي (QRunnable ليس QObject)"""
     response_ready = pyqtSignal(dict)
     error_occurred = pyqtSignal(str)
     progress_updated = pyqtSignal(str)
     file_creation_requested = pyqtSignal(str, str, str)
+    finished = pyqtSignal(str)  # request_id
+
+
+class JSONAIWorker(QRunnable):
+    """عامل معالجة الذكاء الاصطناعي في QThreadPool"""
     
-    def __init__(self, chat, user_input: str, file_manager: UnifiedFileManager):
+    def __init__(self, request_id: str, chat, chat_lock: threading.Lock, user_input: str,
+                 file_manager: UnifiedFileManager, cache: Optional[LLMCache] = None, embedder=None):
         super().__init__()
+        self.request_id = request_id
+        self.signals = JSONAIWorkerSignals()
         self.chat = chat
+        self.chat_lock = chat_lock
         self.user_input = user_input
         self.file_manager = file_manager
+        self.cache = cache
+        self.embedder = embedder
+        self.query_embedding = None
         self.is_cancelled = False
         logger.debug("JSONAIWorker: Initialized.")
     
     def run(self):
         """تشغيل المعالجة"""
         try:
-            self.progress_updated.emit("جاري معالجة الطلب...")
-            logger.info("JSONAIWorker: Sending message to Gemini AI.")
-            
-            # إرسال الطلب إلى Gemini
-            response = self.chat.send_message(self.user_input)
-            logger.info(f"JSONAIWorker: Received raw AI response. Text length: {len(response.text) if response.text else 0}")
-            logger.debug(f"JSONAIWorker: Raw AI response text: \n{response.text}") # Log raw response for debugging
+            self._process()
+        finally:
+            self.signals.finished.emit(self.request_id)
+
+    def _process(self):
+        try:
+            self.signals.progress_updated.emit("جاري معالجة الطلب...")
+            if self.cache is not None and self.embedder is not None:
+                cached = self._lookup_similar()
+                if cached is not None:
+                    if not self.is_cancelled:
+                        self.signals.response_ready.emit(cached)
+                    return
+
+            # إرسال الطلب إلى Gemini؛ ينتظر العامل انتهاء أي طلب سابق على نفس المحادثة
+            with self.chat_lock:
+                if self.is_cancelled:
+                    logger.info("JSONAIWorker: Operation cancelled before sending.")
+                    return
+                logger.info("JSONAIWorker: Sending message to Gemini AI.")
+                response_text = self._stream_response()
             
-            if self.is_cancelled:
+            if response_text is None or self.is_cancelled:
                 logger.info("JSONAIWorker: Operation cancelled during AI response.")
                 return
+            logger.info(f"JSONAIWorker: Received raw AI response. Text length: {len(response_text)}")
+            logger.debug("JSONAIWorker: Raw AI response text: \n%s", response_text) # Log raw response for debugging
             
-            self.progress_updated.emit("جاري تحليل الاستجابة...")
+            self.signals.progress_updated.emit("جاري تحليل الاستجابة...")
             
             # تحليل الاستجابة
-            parsed_response = self._parse_ai_response(response.text)
+            parsed_response = self._parse_ai_response(response_text)
             logger.info(f"JSONAIWorker: Parsed AI response. Action: {parsed_response.get('action')}, Content length: {len(parsed_response.get('content', ''))}")
-            logger.debug(f"JSONAIWorker: Parsed AI response: {parsed_response}") # Log parsed response for debugging
+            logger.debug("JSONAIWorker: Parsed AI response: %s", parsed_response) # Log parsed response for debugging
             
             if not self.is_cancelled:
-                self.response_ready.emit(parsed_response)
+                self.signals.response_ready.emit(parsed_response)
                 logger.info("JSONAIWorker: Emitted response_ready from worker.")
                 
         except Exception as e:
             if not self.is_cancelled:
                 logger.error(f"JSONAIWorker: Error in JSON AI Worker: {e}", exc_info=True)
-                self.error_occurred.emit(f"خطأ في معالجة الطلب: {str(e)}")
+                self.signals.error_occurred.emit(f"خطأ في معالجة الطلب: {str(e)}")
             else:
                 logger.info("JSONAIWorker: Error occurred but operation was cancelled.")
     
+    def _stream_response(self) -> Optional[str]:
+        """
+        استلام الاستجابة كدفعات مع تحديث التقدم وفحص الإلغاء بين الدفعات.
+        يُرجع None عند الإلغاء بعد حذف الجولة الناقصة من سجل المحادثة.
+        """
+        stream = self.chat.send_message(self.user_input, stream=True)
+        parts = []
+        for chunk in stream:
+            if self.is_cancelled:
+                self._discard_stream(stream)
+                return None
+            try:
+                text = chunk.text
+            except ValueError:
+                # دفعة بدون نص (مثل دفعة سبب الانتهاء)
+                continue
+            parts.append(text)
+            self.signals.progress_updated.emit(f"جاري استلام الاستجابة... ({len(parts)})")
+        return ''.join(parts)
+
+    def _discard_stream(self, stream):
+        """إيقاف استلام استجابة ملغاة دون ترك المحادثة في حالة مكسورة"""
+        try:
+            self.chat.rewind()
+        except Exception as e:
+            # تعذر حذف الجولة؛ استهلاك الباقي يبقي السجل متسقاً للطلب التالي
+            logger.debug("JSONAIWorker: Could not rewind cancelled turn (%s), resolving stream.", e)
+            stream.resolve()
+
+    def _lookup_similar(self) -> Optional[Dict[str, Any]]:
+        """البحث في الطبقة الدلالية للمخزن؛ أي فشل في حساب المتجه يعني المتابعة بدونها"""
+        try:
+            self.query_embedding = self.embedder(self.user_input)
+        except Exception as e:
+            logger.warning(f"JSONAIWorker: Embedding failed, skipping semantic cache: {e}")
+            return None
+        cached = self.cache.get_similar(self.query_embedding)
+        if cached is not None:
+            cached['from_cache'] = True
+            logger.info("JSONAIWorker: Serving semantically similar cached response.")
+        return cached
+
     def _parse_ai_response(self, response_text: str) -> Dict[str, Any]:
         """تحليل استجابة الذكاء الاصطناعي وتحويلها إلى JSON"""
-        logger.debug(f"JSONAIWorker: Parsing AI response text:\n{response_text}")
+        logger.debug("JSONAIWorker: Parsing AI response text:\n%s", response_text)
         try:
             # محاولة استخراج JSON من النص
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+            bounds = _find_json_object(response_text)
             
-            if json_match:
-                json_str = json_match.group()
-                logger.debug(f"JSONAIWorker: Extracted JSON string: {json_str}")
+            if bounds:
+                json_str = response_text[bounds[0]:bounds[1]]
+                logger.debug("JSONAIWorker: Extracted JSON string: %s", json_str)
                 # تنظيف النص
                 json_str = self._clean_json_string(json_str)
-                logger.debug(f"JSONAIWorker: Cleaned JSON string: {json_str}")
-                parsed = json.loads(json_str)
-                logger.debug(f"JSONAIWorker: Successfully parsed JSON: {parsed}")
+                logger.debug("JSONAIWorker: Cleaned JSON string: %s", json_str)
+                parsed = _json_loads(json_str)
+                logger.debug("JSONAIWorker: Successfully parsed JSON: %s", parsed)
                 
                 # التحقق من وجود الحقول المطلوبة
                 if 'action' not in parsed:
@@ -329,7 +775,7 @@ class JSONAIWorker(QThread):
                 # إذا لم يتم العثور على JSON، إنشاء استجابة افتراضية
                 return self._create_fallback_response(response_text)
                 
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValueError) as e:
             logger.warning(f"JSONAIWorker: Failed to parse JSON response: {e}. Creating fallback response.", exc_info=True)
             return self._create_fallback_response(response_text)
         except Exception as e:
@@ -342,40 +788,24 @@ class JSONAIWorker(QThread):
     
     def _clean_json_string(self, json_str: str) -> str:
         """تنظيف نص JSON من الأخطاء الشائعة والمعقدة."""
-        logger.debug(f"JSONAIWorker: Attempting to clean JSON string:\n{json_str}")
+        logger.debug("JSONAIWorker: Attempting to clean JSON string:\n%s", json_str)
         
         # 1. إزالة أي نص قبل أول قوس مفتوح { وبعد آخر قوس مغلق }
         # هذا يزيل أي نص زائد قد يرسله AI خارج كائن JSON.
-        json_match = re.search(r'\{.*\}', json_str, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            logger.debug(f"JSONAIWorker: Extracted main JSON block: {json_str[:200]}...") # Log start of block
+        bounds = _find_json_object(json_str)
+        if bounds:
+            json_str = json_str[bounds[0]:bounds[1]]
+            logger.debug("JSONAIWorker: Extracted main JSON block: %.200s...", json_str) # Log start of block
         else:
             logger.warning("JSONAIWorker: No complete JSON object found in string during cleaning.")
             return json_str # Return as is if no JSON block is found
 
-        # 2. إزالة التعليقات بأسلوب JavaScript (//) أو Python (#)
-        # تأكد من عدم إزالة // التي قد تكون جزءًا من URL داخل قيمة نصية
-        json_str = re.sub(r'(?<![:"\w])//.*', '', json_str) # يزيل // إلا إذا سبقتها : " أو حرف
-        json_str = re.sub(r'(?<![:"\w])#.*', '', json_str) # يزيل # إلا إذا سبقتها : " أو حرف
-        
-        # 3. إزالة الأسطر الجديدة غير المهربة داخل النصوص، واستبدالها بـ \n مهربة
-        # هذا يمنع الأسطر الجديدة في القيم النصية من كسر JSON
-        # (؟ <!) \ "تطابق حرف السطر الجديد فقط إذا لم يسبقه خط مائل عكسي (\)
-        json_str = re.sub(r'(?<!\\)\n', '\\n', json_str)
-        
-        # 4. إصلاح الفواصل المفقودة بين الأزواج (key-value)
-        # يبحث عن علامة اقتباس متبوعة بمسافات وأسطر جديدة ثم علامة اقتباس أخرى، ويضيف فاصلة
-        # قد يحتاج هذا إلى تعديل دقيق بناءً على الأخطاء الفعلية
-        json_str = re.sub(r'("\s*?\n?\s*?")\s*(")', r'\1,\2', json_str)
-        
-        # 5. التعامل مع الفواصل الزائدة في النهاية (ليس بالضرورة هنا ولكن مفيد)
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-        
-        # 6. إزالة أي أسطر فارغة إضافية قد تكون ناتجة عن التنظيف
-        json_str = os.linesep.join([s for s in json_str.splitlines() if s.strip()])
+        # 2. إزالة التعليقات (// و #) والفواصل الزائدة والأسطر الفارغة، وإضافة الفواصل
+        # المفقودة، وتهريب الأسطر الجديدة الخام داخل النصوص، كل ذلك في مسح واحد
+        # لا يلمس محتوى النصوص (مثل URL أو تعليقات داخل الكود المُرجع)
+        json_str = _sanitize_json(json_str)
 
-        logger.debug(f"JSONAIWorker: Finished cleaning JSON string.")
+        logger.debug("JSONAIWorker: Finished cleaning JSON string.")
         return json_str
 
     
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM Response Cache
+مخزن مؤقت لاستجابات النموذج: مطابقة تامة بالبصمة مع طبقة تشابه دلالي اختيارية
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Protocol, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية الاستجابة المخزنة بالثواني
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 256
+# الحد الأدنى لتشابه جيب التمام لاعتبار الطلب مطابقاً دلالياً
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+
+class CacheBackend(Protocol):
+    """واجهة مخزن الاستجابات"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+
+class MemoryLRUBackend:
+    """مخزن في الذاكرة بسياسة LRU وانتهاء صلاحية لكل مدخل"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expire_time, value = entry
+            if expire_time <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend:
+    """مخزن دائم على القرص عبر مكتبة diskcache (اختيارية)"""
+
+    def __init__(self, directory: str):
+        import diskcache
+        self._cache = diskcache.Cache(directory)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._cache.set(key, value, expire=ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class LLMCache:
+    """مخزن استجابات النموذج مع إحصائيات الإصابة"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = DEFAULT_TTL,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_embeddings: int = DEFAULT_MAX_ENTRIES):
+        self.backend = backend if backend is not None else MemoryLRUBackend()
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_embeddings = max_embeddings
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0}
+        self._lock = threading.Lock()
+        # طبقة التشابه الدلالي: مصفوفة متجهات مطبّعة ومفاتيحها بنفس الترتيب
+        self._embedding_keys: List[str] = []
+        self._embedding_matrix = None
+
+    @property
+    def semantic_available(self) -> bool:
+        return np is not None
+
+    @staticmethod
+    def key(model_name: str, formatted_input: str, generation_config: Any) -> str:
+        """بصمة sha256 للنموذج والمدخلات وإعدادات التوليد"""
+        config_text = json.dumps(generation_config, sort_keys=True, default=str)
+        return hashlib.sha256(
+            f"{model_name}\0{config_text}\0{formatted_input}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """إرجاع نسخة من الاستجابة المخزنة أو None"""
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"LLMCache: Backend lookup failed: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+        return dict(value)
+
+    def set(self, key: str, value: Dict[str, Any], embedding: Optional[Sequence[float]] = None):
+        """تخزين نسخة من الاستجابة، مع متجه الطلب إن وُجد"""
+        try:
+            self.backend.set(key, dict(value), self.ttl)
+        except Exception as e:
+            logger.warning(f"LLMCache: Backend store failed: {e}")
+            return
+        with self._lock:
+            self.stats['stores'] += 1
+        if embedding is not None:
+            self._add_embedding(key, embedding)
+
+    def _add_embedding(self, key: str, embedding: Sequence[float]):
+        if np is None:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        vector = vector / norm
+        with self._lock:
+            if key in self._embedding_keys:
+                return
+            if self._embedding_matrix is None or self._embedding_matrix.shape[1] != vector.shape[0]:
+                self._embedding_keys = [key]
+                self._embedding_matrix = vector[np.newaxis, :]
+            else:
+                self._embedding_keys.append(key)
+                self._embedding_matrix = np.vstack((self._embedding_matrix, vector))
+            # الإبقاء على أحدث المتجهات فقط
+            if len(self._embedding_keys) > self.max_embeddings:
+                self._embedding_keys = self._embedding_keys[-self.max_embeddings:]
+                self._embedding_matrix = self._embedding_matrix[-self.max_embeddings:]
+
+    def get_similar(self, embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """البحث عن استجابة لطلب مشابه دلالياً (تشابه جيب التمام فوق الحد)"""
+        if np is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self._lock:
+            matrix = self._embedding_matrix
+            keys = self._embedding_keys
+        if not norm or matrix is None or matrix.shape[1] != query.shape[0]:
+            return None
+        # صفوف المصفوفة مطبّعة مسبقاً، فيكفي الضرب النقطي
+        scores = matrix @ (query / norm)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        try:
+            value = self.backend.get(keys[best])
+        except Exception as e:
+            logger.warning(f"LLMCache: Backend lookup failed: {e}")
+            return None
+        if value is None:
+            return None
+        with self._lock:
+            self.stats['semantic_hits'] += 1
+        logger.info(f"LLMCache: Semantic hit (similarity {float(scores[best]):.3f})")
+        return dict(value)
+
+    def clear(self):
+        """مسح المخزن بالكامل"""
+        self.backend.clear()
+        with self._lock:
+            self._embedding_keys = []
+            self._embedding_matrix = None
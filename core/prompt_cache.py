@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prompt Cache
+مخزن مشترك للـ prompts الثابتة المسجلة لدى Gemini
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية الـ prompt المخزن مؤقتاً لدى Gemini
+DEFAULT_TTL = datetime.timedelta(hours=1)
+
+_CACHE_FILE_NAME = "prompt_cache.json"
+
+
+class PromptCache:
+    """مخزن يربط بصمة sha1 لكل prompt ثابت باسم CachedContent المسجل لدى Gemini"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_file_path = os.path.join(cache_dir, _CACHE_FILE_NAME)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def _key(text: str, model_name: str) -> str:
+        # CachedContent مرتبط بالنموذج، لذا يدخل اسم النموذج في البصمة
+        return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """تحميل الخريطة من القرص"""
+        try:
+            with open(self.cache_file_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"PromptCache: Failed to load {self.cache_file_path}: {e}")
+            return {}
+
+    def _save(self):
+        """حفظ الخريطة إلى القرص بشكل ذري مع حذف المدخلات المنتهية"""
+        now = time.time()
+        self._entries = {k: v for k, v in self._entries.items() if v.get("expire_time", 0) > now}
+        tmp_path = self.cache_file_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.cache_file_path)
+        except Exception as e:
+            logger.warning(f"PromptCache: Failed to save {self.cache_file_path}: {e}")
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and entry.get("expire_time", 0) > time.time():
+            return entry.get("name")
+        return None
+
+    def register(self, text: str, model_name: str, ttl: datetime.timedelta = DEFAULT_TTL) -> Optional[str]:
+        """
+        إرجاع اسم CachedContent للنص المعطى، وتسجيله لدى Gemini إذا لم يكن مسجلاً.
+        يُرجع None إذا رفض المزوّد التخزين المؤقت.
+        """
+        key = self._key(text, model_name)
+        with self._lock:
+            name = self._lookup(key)
+            if name is None:
+                # ربما سجلته جلسة أو عملية أخرى منذ آخر تحميل
+                self._entries.update(self._load())
+                name = self._lookup(key)
+            if name is not None:
+                logger.info(f"PromptCache: Reusing cached prompt {name}")
+                return name
+
+            try:
+                # استيراد متأخر: لا يُحمّل genai إلا عند تهيئة الاتصال
+                from google.generativeai import caching
+                cached_content = caching.CachedContent.create(
+                    model=model_name,
+                    system_instruction=text,
+                    ttl=ttl
+                )
+            except Exception as e:
+                # قد يرفض المزوّد التخزين المؤقت (مثلاً prompt أقصر من الحد الأدنى)
+                logger.warning(f"PromptCache: Prompt caching unavailable: {e}")
+                return None
+
+            expire_time = cached_content.expire_time
+            self._entries[key] = {
+                "name": cached_content.name,
+                "expire_time": expire_time.timestamp() if expire_time else time.time() + ttl.total_seconds()
+            }
+            self._save()
+            logger.info(f"PromptCache: Registered cached prompt {cached_content.name}")
+            return cached_content.name
+
+    def invalidate(self, text: str, model_name: str):
+        """إزالة المدخل الخاص بالنص (مثلاً بعد حذفه من جهة المزوّد)"""
+        with self._lock:
+            if self._entries.pop(self._key(text, model_name), None) is not None:
+                self._save()
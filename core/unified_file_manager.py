@@ -5,24 +5,305 @@ Enhanced File Manager with VS Code-like Features
 مدير الملفات المحسن مع ميزات مشابهة لـ VS Code
 """
 
+import errno
 import os
 import shutil
+import stat
 import json
 import logging
 import subprocess
 import sys
+import tempfile
 import platform
+import queue
 import mimetypes
 import hashlib
 import time
 import threading
-from typing import Dict, List, Optional, Any, Callable, Set, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Callable, Set, Tuple, Union
 from pathlib import Path
-from PyQt6.QtCore import QObject, pyqtSignal, QFileSystemWatcher, QTimer, QThread
+from PyQt6.QtCore import QObject, pyqtSignal, QFileSystemWatcher, QTimer, QThread, QThreadPool, QRunnable
 from PyQt6.QtWidgets import QFileDialog, QMessageBox, QInputDialog
 
 logger = logging.getLogger(__name__)
 
+# حجم الدفعة لكل استدعاء copy_file_range / sendfile
+_COPY_CHUNK = 2 ** 30
+# حجم المخزن في المسار الاحتياطي (قراءة/كتابة)
+_COPY_BUFFER = 1 << 20
+# مخزن النسخ يُعاد استخدامه؛ النسخ قد يجري في خيوط عاملة متعددة
+_copy_buffers = threading.local()
+# أخطاء تعني أن النواة أو نظام الملفات لا يدعم النسخ داخل النواة
+_FASTCOPY_FALLBACK_ERRNOS = frozenset({errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF})
+
+# umask الحالي لا يُقرأ إلا بتغييره، فيُقرأ مرة واحدة عند التحميل
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _try_stat(path: str, follow_symlinks: bool = True) -> Optional[os.stat_result]:
+    """stat واحد بدلاً من exists ثم isfile/isdir/stat؛ يُرجع None إذا لم يوجد المسار"""
+    try:
+        return os.stat(path, follow_symlinks=follow_symlinks)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+def _atomic_write_text(file_path: str, content: str, encoding: str):
+    """
+    كتابة ملف نصي عبر ملف مؤقت ثم os.replace: لا يُعدَّل الـ inode القديم أبداً
+    (فتبقى النسخ الاحتياطية المرتبطة به صلبياً سليمة) ولا يُترك ملف نصف مكتوب.
+    """
+    # الكتابة على هدف الرابط الرمزي بدلاً من استبدال الرابط نفسه
+    target = os.path.realpath(file_path)
+    # اسم مؤقت فريد لكل كتابة: قد يحفظ خيط المجمع وخيط الواجهة نفس الملف في آن واحد
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target),
+                                    prefix='.' + os.path.basename(target) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+        try:
+            shutil.copymode(target, tmp_path)
+        except FileNotFoundError:
+            # ملف جديد: mkstemp ينشئ بصلاحيات 0600، فتُطبق الصلاحيات الافتراضية
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, target)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _count_tree_files(root_path: str, follow_symlinks: bool) -> int:
+    """عدد الملفات (غير المجلدات) تحت مجلد، لحساب نسبة التقدم"""
+    count = 0
+    stack = [root_path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    stack.append(entry.path)
+                else:
+                    count += 1
+    return count
+
+def _progress_ticker(total: int, progress: Callable[[float], None]) -> Callable[[], None]:
+    """دالة تُستدعى بعد كل ملف وتُبلغ النسبة المنجزة (حوالي 100 إشعار كحد أقصى)"""
+    done = 0
+    step = max(1, total // 100)
+    
+    def tick():
+        nonlocal done
+        done += 1
+        if done % step == 0 or done == total:
+            progress(done / total)
+    
+    return tick
+
+def _copytree_fast(src: str, dst: str, on_file: Optional[Callable[[], None]] = None):
+    """
+    بديل shutil.copytree: مرور os.scandir ونسخ كل ملف بـ _fastcopy_linux (reflink حيث أمكن).
+    يتبع الروابط الرمزية ويفشل إذا كان الهدف موجوداً، كما يفعل copytree افتراضياً.
+    """
+    os.makedirs(dst)
+    with os.scandir(src) as it:
+        entries = list(it)
+    for entry in entries:
+        dst_path = os.path.join(dst, entry.name)
+        if entry.is_dir():
+            _copytree_fast(entry.path, dst_path, on_file)
+        else:
+            # الهدف مسار ملف داخل مجلد أُنشئ للتو، فلا حاجة لفحوص _fastcopy_linux لكل ملف
+            _copy_file_data(entry.path, dst_path)
+            if on_file is not None:
+                on_file()
+    shutil.copystat(src, dst)
+
+def _rmtree_fast(path: str, on_file: Optional[Callable[[], None]] = None):
+    """بديل shutil.rmtree: نوع العنصر من scandir بدلاً من lstat لكل عنصر؛ الروابط الرمزية لا تُتبع"""
+    with os.scandir(path) as it:
+        entries = list(it)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            _rmtree_fast(entry.path, on_file)
+        else:
+            os.unlink(entry.path)
+            if on_file is not None:
+                on_file()
+    os.rmdir(path)
+
+def _rename_noreplace(old_path: str, new_path: str):
+    """
+    إعادة تسمية دون الكتابة فوق هدف موجود. os.link يفشل بـ FileExistsError ذرياً،
+    ثم يُحذف الاسم القديم. المجلدات وأنظمة الملفات بلا روابط صلبة تستخدم os.replace بعد فحص.
+    """
+    try:
+        os.link(old_path, new_path, follow_symlinks=False)
+    except FileExistsError:
+        raise
+    except OSError:
+        if os.path.lexists(new_path):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), new_path)
+        os.replace(old_path, new_path)
+        return
+    os.unlink(old_path)
+
+# نوع الملف حسب الامتداد (بدون النقطة)
+_FILE_TYPE_MAPPING = {
+    'py': 'python',
+    'js': 'javascript',
+    'jsx': 'javascriptreact',
+    'ts': 'typescript',
+    'tsx': 'typescriptreact',
+    'html': 'html',
+    'htm': 'html',
+    'css': 'css',
+    'scss': 'scss',
+    'less': 'less',
+    'json': 'json',
+    'xml': 'xml',
+    'yaml': 'yaml',
+    'yml': 'yaml',
+    'md': 'markdown',
+    'txt': 'text',
+    'sql': 'sql',
+    'sh': 'shellscript',
+    'bash': 'shellscript',
+    'php': 'php',
+    'java': 'java',
+    'c': 'c',
+    'cpp': 'cpp',
+    'cs': 'csharp',
+    'go': 'go',
+    'rs': 'rust',
+    'swift': 'swift',
+    'kt': 'kotlin',
+    'rb': 'ruby',
+    'pl': 'perl',
+    'lua': 'lua',
+    'r': 'r',
+    'vue': 'vue',
+    'svelte': 'svelte',
+    'csv': 'csv',
+    'log': 'log',
+    'cfg': 'ini',
+    'ini': 'ini',
+    'conf': 'ini',
+    'env': 'dotenv',
+}
+
+# ملفات تُعرف باسمها الكامل
+_FILE_NAME_TYPES = {
+    'dockerfile': 'dockerfile',
+    'makefile': 'makefile',
+}
+
+# علامات BOM (UTF-32 قبل UTF-16 لأن بادئة UTF-32 LE تبدأ ببادئة UTF-16 LE)
+_ENCODING_BOMS = (
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe\x00\x00', 'utf-32'),
+    (b'\x00\x00\xfe\xff', 'utf-32'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+)
+
+# عناصر لا تظهر في شجرة الملفات
+_FOLDER_LISTING_IGNORED = frozenset({
+    '.git', '__pycache__', 'node_modules', '.vscode', '.idea', '.venv',
+    'build', 'dist', 'temp', '.DS_Store', '.backups'
+})
+
+@lru_cache(maxsize=1024)
+def _guess_mime_type(ext: str) -> Optional[str]:
+    """نوع MIME حسب الامتداد (مخزن لأن الامتدادات تتكرر كثيراً في المجلد الواحد)"""
+    return mimetypes.guess_type('file' + ext)[0]
+
+def _copy_fd_range(src_fd: int, dst_fd: int) -> bool:
+    """نسخ داخل النواة بـ copy_file_range (يسمح بالنسخ المرجعي reflink). يُرجع False إذا لم يكن مدعوماً"""
+    copy_range = getattr(os, 'copy_file_range', None)
+    if copy_range is None:
+        return False
+    copied = 0
+    try:
+        while copy_range(src_fd, dst_fd, _COPY_CHUNK):
+            copied += 1
+    except OSError as e:
+        # الفشل قبل نسخ أي بايت يعني عدم الدعم، فنجرب الطريقة التالية
+        if copied == 0 and e.errno in _FASTCOPY_FALLBACK_ERRNOS:
+            return False
+        raise
+    return True
+
+def _sendfile_fd(src_fd: int, dst_fd: int) -> bool:
+    """نسخ داخل النواة بـ sendfile. يُرجع False إذا لم يكن مدعوماً"""
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is None or not sys.platform.startswith('linux'):
+        return False
+    offset = 0
+    try:
+        while True:
+            sent = sendfile(dst_fd, src_fd, offset, _COPY_CHUNK)
+            if not sent:
+                return True
+            offset += sent
+    except OSError as e:
+        if offset == 0 and e.errno in _FASTCOPY_FALLBACK_ERRNOS:
+            return False
+        raise
+
+def _readinto_copy(src_fd: int, dst_fd: int):
+    """المسار الاحتياطي: قراءة/كتابة بمخزن معاد الاستخدام (واحد لكل خيط)"""
+    buf = getattr(_copy_buffers, 'buf', None)
+    if buf is None:
+        buf = _copy_buffers.buf = memoryview(bytearray(_COPY_BUFFER))
+    with open(src_fd, 'rb', buffering=0, closefd=False) as src, \
+         open(dst_fd, 'wb', buffering=0, closefd=False) as dst:
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            dst.write(buf[:n])
+
+def _copy_from_fd(src_fd: int, dst: str):
+    """نسخ محتوى واصف مفتوح (من بدايته) إلى ملف، مع الصلاحيات والأوقات من fstat"""
+    st = os.fstat(src_fd)
+    dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        if not _copy_fd_range(src_fd, dst_fd) and not _sendfile_fd(src_fd, dst_fd):
+            _readinto_copy(src_fd, dst_fd)
+    finally:
+        os.close(dst_fd)
+    os.chmod(dst, stat.S_IMODE(st.st_mode))
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def _fastcopy_linux(src: str, dst: str) -> str:
+    """
+    بديل لـ shutil.copy2: copy_file_range ثم sendfile ثم قراءة/كتابة،
+    مع نسخ البيانات الوصفية بعد نسخ المحتوى. متوافق مع copy_function في copytree.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise shutil.SameFileError(f"{src!r} and {dst!r} are the same file")
+    _copy_file_data(src, dst)
+    return dst
+
+def _copy_file_data(src: str, dst: str):
+    """نسخ محتوى ملف إلى مسار ملف محدد ثم بياناته الوصفية (بلا فحوص الهدف)"""
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            if not _copy_fd_range(src_fd, dst_fd) and not _sendfile_fd(src_fd, dst_fd):
+                _readinto_copy(src_fd, dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    
+    shutil.copystat(src, dst)
+
 class FileOperation:
     """عملية ملف"""
     
@@ -367,8 +648,9 @@ class FileSearchEngine:
     def search_files(self, root_path: str, pattern: str, 
                      include_content: bool = False,
                      file_extensions: List[str] = None,
-                     max_results: int = 1000) -> List[Dict[str, Any]]:
-        """البحث في الملفات"""
+                     max_results: int = 1000,
+                     cancel_event: threading.Event = None) -> List[Dict[str, Any]]:
+        """البحث في الملفات (cancel_event: إيقاف مبكر عند استبدال البحث ببحث أحدث)"""
         results = []
         pattern_lower = pattern.lower()
         
@@ -380,6 +662,8 @@ class FileSearchEngine:
                 for file in files:
                     if len(results) >= max_results:
                         break
+                    if cancel_event is not None and cancel_event.is_set():
+                        return results
                         
                     file_path = os.path.join(root, file)
                     file_name_lower = file.lower()
@@ -578,6 +862,62 @@ class FileComparisonEngine:
 # ---
 # UnifiedFileManager
 # ---
+class _FileOpSignals(QObject):
+    """إشارات عامل عمليات الملفات (QRunnable ليس QObject)"""
+    finished = pyqtSignal(str, object)  # operation_id, الاستثناء أو None
+    progress = pyqtSignal(str, float)  # operation_id, النسبة المنجزة
+
+class _FileOpRunnable(QRunnable):
+    """تنفيذ الجزء الحاجز من عملية ملف في QThreadPool"""
+    
+    def __init__(self, operation_id: str, fn: Callable, args: tuple, report_progress: bool = False):
+        super().__init__()
+        self.operation_id = operation_id
+        self.fn = fn
+        self.args = args
+        self.report_progress = report_progress
+        self.signals = _FileOpSignals()
+    
+    def _emit_progress(self, fraction: float):
+        self.signals.progress.emit(self.operation_id, fraction)
+    
+    def run(self):
+        error = None
+        try:
+            if self.report_progress:
+                self.fn(*self.args, progress=self._emit_progress)
+            else:
+                self.fn(*self.args)
+        except Exception as e:
+            error = e
+        self.signals.finished.emit(self.operation_id, error)
+
+class _SearchSignals(QObject):
+    """إشارات مهمة البحث"""
+    finished = pyqtSignal(str, list)  # search_id, النتائج
+
+class _SearchJob(QRunnable):
+    """مهمة بحث في QThreadPool قابلة للإلغاء"""
+    
+    def __init__(self, search_id: str, engine: FileSearchEngine, root_path: str, pattern: str,
+                 include_content: bool, file_extensions: Optional[List[str]]):
+        super().__init__()
+        self.search_id = search_id
+        self.engine = engine
+        self.args = (root_path, pattern, include_content, file_extensions)
+        self.cancel = threading.Event()
+        self.signals = _SearchSignals()
+    
+    def run(self):
+        try:
+            results = self.engine.search_files(*self.args, cancel_event=self.cancel)
+        except Exception as e:
+            logger.error(f"Search error: {e}")
+            results = []
+        # نتائج بحث مُلغى لا تُرسل
+        if not self.cancel.is_set():
+            self.signals.finished.emit(self.search_id, results)
+
 class UnifiedFileManager(QObject):
     """مدير الملفات المحسن مع ميزات متقدمة"""
     
@@ -613,10 +953,23 @@ class UnifiedFileManager(QObject):
         self.current_project = None
         self.current_folder = None # سيتم تعيينه عند فتح مجلد
         self.open_files = {}  # file_path -> {'content': str, 'modified': bool, 'encoding': str, 'last_known_disk_content_hash': str}
-        self.recent_files = []
-        self.recent_folders = []
+        self._dirty_paths: Set[str] = set()  # الملفات المفتوحة غير المحفوظة (للحفظ التلقائي)
+        # ملفات يجري حفظها في المجمع -> عمليات الحفظ المؤجلة عليها (تُنفذ بالترتيب بعد انتهائه)
+        self._saving_paths: Dict[str, List[Callable[[], None]]] = {}
+        self._backup_dirs_ready: Set[str] = set()  # مجلدات أُنشئ فيها .backups (لتفادي makedirs عند كل حفظ)
+        # تُعدّل من خيط الواجهة ومن خيوط المجمع (الحذف ينشئ نسخة احتياطية في المجمع)
+        self._backup_dirs_lock = threading.Lock()
+        
+        # نسخ الحفظ الاحتياطية تُكمل في خيط خلفي واحد
+        self._backup_queue: queue.Queue = queue.Queue()
+        self._backup_pending: Set[str] = set()
+        self._backup_thread = threading.Thread(target=self._backup_worker, daemon=True)
+        self._backup_thread.start()
+        # OrderedDict كقائمة LRU: الأحدث في النهاية، وعمليات الإضافة/النقل O(1)
+        self.recent_files: OrderedDict = OrderedDict()
+        self.recent_folders: OrderedDict = OrderedDict()
         self.output_process = None # لعمليات subprocess الجارية (مثل تشغيل ملف بايثون)
-        self.bookmarks = []
+        self.bookmarks: Dict[str, Dict[str, Any]] = {}  # path -> bookmark (الترتيب ترتيب الإضافة)
         self.current_project_path = None # عادة ما يكون هو نفسه current_folder للمشاريع البسيطة
         
         # علامة لمنع إطلاق أحداث مراقب الملفات ذاتياً عند إجراء عمليات داخلية
@@ -642,6 +995,11 @@ class UnifiedFileManager(QObject):
         # عمليات الملفات الجارية (لتتبع التقدم والإشعارات)
         self.pending_operations = {}
         self.operation_counter = 0
+        self._pool = QThreadPool.globalInstance()
+        self._active_search: Optional[_SearchJob] = None
+        
+        # ذاكرة مؤقتة قصيرة لنتائج os.path.exists (قوائم الأخيرة والإشارات تُستعلم عند كل تحديث للواجهة)
+        self._exists_cache: Dict[str, Tuple[float, bool]] = {}
         
         # مؤقت الحفظ التلقائي
         self.auto_save_timer = QTimer()
@@ -658,9 +1016,10 @@ class UnifiedFileManager(QObject):
         """تحميل الإعدادات"""
         try:
             # تحميل الملفات والمجلدات الأخيرة والإشارات المرجعية
-            self.recent_files = self.config.get('recent_files', [])
-            self.recent_folders = self.config.get('recent_folders', [])
-            self.bookmarks = self.config.get('bookmarks', [])
+            # الإعدادات تحفظ القوائم بالأحدث أولاً
+            self.recent_files = OrderedDict.fromkeys(reversed(self.config.get('recent_files', [])))
+            self.recent_folders = OrderedDict.fromkeys(reversed(self.config.get('recent_folders', [])))
+            self.bookmarks = {b['path']: b for b in self.config.get('bookmarks', [])}
             
             # تحميل إعدادات إدارة الملفات
             self.auto_save_enabled = self.config.get('file_management.auto_save_enabled', True)
@@ -676,9 +1035,9 @@ class UnifiedFileManager(QObject):
     def save_settings(self):
         """حفظ الإعدادات"""
         try:
-            self.config.set('recent_files', self.recent_files)
-            self.config.set('recent_folders', self.recent_folders)
-            self.config.set('bookmarks', self.bookmarks)
+            self.config.set('recent_files', list(reversed(self.recent_files)))
+            self.config.set('recent_folders', list(reversed(self.recent_folders)))
+            self.config.set('bookmarks', list(self.bookmarks.values()))
             self.config.set('file_management.auto_save_enabled', self.auto_save_enabled)
             self.config.set('file_management.auto_save_interval', self.auto_save_interval)
             self.config.set('file_management.backup_enabled', self.backup_enabled)
@@ -713,8 +1072,7 @@ class UnifiedFileManager(QObject):
             # Write the file
             # Use 'file_encoding' from config if not provided, otherwise utf-8 as fallback
             encoding = self.file_encoding or 'utf-8'  
-            with open(file_path, 'w', encoding=encoding, newline='') as f:
-                f.write(content)
+            _atomic_write_text(file_path, content, encoding)
             
             # Add to open files (if the UI is expected to open it, or for internal tracking)
             file_hash = hashlib.md5(content.encode(encoding, errors='ignore')).hexdigest()
@@ -988,10 +1346,11 @@ class UnifiedFileManager(QObject):
         self.file_changed_externally.emit(file_path, change_info)
         
         # إذا كان الملف مفتوحاً في المحرر، قم بتحديث حالته لتنبيه UI
-        if file_path in self.open_files:
+        file_info = self.open_files.get(file_path)
+        if file_info is not None:
             # يمكن هنا مقارنة محتوى الملف على القرص مع محرر لتحديد ما إذا كان "معدلاً خارجياً"
             # ومعالجة التعارضات. حالياً، نكتفي بتحديد العلامة.
-            self.open_files[file_path]['externally_modified'] = True
+            file_info['externally_modified'] = True
             logger.info(f"UnifiedFileManager: File '{file_path}' externally modified. Marked for refresh.")
 
     def _handle_internal_file_added(self, file_path: str, change_info: dict):
@@ -1013,8 +1372,9 @@ class UnifiedFileManager(QObject):
         logger.info(f"UnifiedFileManager: File removed externally: {file_path}")
         
         # إذا كان الملف مفتوحاً، قم بتحديث حالته (لا داعي لإغلاقه هنا، بل في UI)
-        if file_path in self.open_files:
-            self.open_files[file_path]['externally_deleted'] = True
+        file_info = self.open_files.get(file_path)
+        if file_info is not None:
+            file_info['externally_deleted'] = True
             logger.info(f"UnifiedFileManager: File '{file_path}' opened in editor, but deleted externally.")
             # يمكنك هنا إضافة منطق لتنبيه المستخدم بوجود ملف مفتوح تم حذفه
 
@@ -1047,8 +1407,7 @@ class UnifiedFileManager(QObject):
                 
             # كتابة الملف
             encoding = self._detect_encoding(content) if content else self.file_encoding
-            with open(file_path, 'w', encoding=encoding, newline='') as f:
-                f.write(content)
+            _atomic_write_text(file_path, content, encoding)
             
             # إضافة إلى الملفات المفتوحة
             self.open_files[file_path] = {
@@ -1136,67 +1495,206 @@ class UnifiedFileManager(QObject):
             
     def save_file(self, file_path: str, content: str, encoding: str = None) -> bool:
         """حفظ ملف"""
+        if self._defer_while_saving(file_path, lambda: self.save_file(file_path, content, encoding)):
+            return True
         try:
             self._ignore_watcher_events = True # تجاهل حدث المراقب
             # إنشاء نسخة احتياطية إذا كانت مفعلة
             encoding = encoding or self.file_encoding or 'utf-8'
             if self.backup_enabled and os.path.exists(file_path):
-                self._create_backup(file_path)
+                self._queue_backup(file_path)
                 
           
             
-            # التأكد من وجود المجلد الأب
-            parent_dir = os.path.dirname(file_path)
-            if parent_dir and not os.path.exists(parent_dir):
-                os.makedirs(parent_dir, exist_ok=True)
-            
-            # كتابة الملف
-            with open(file_path, 'w', encoding=encoding, newline='') as f:
-                f.write(content)
-            file_hash = hashlib.md5(content.encode(encoding, errors='ignore')).hexdigest() # حساب الهاش عند الحفظ
+            file_hash = self._write_file_sync(file_path, content, encoding)
+            self._finish_save(file_path, content, encoding, file_hash)
+            return True
             
-            # تحديث الملفات المفتوحة
-            if file_path in self.open_files:
-                self.open_files[file_path].update({
-                    'content': content, 
-                    'modified': False, # لم يعد معدلاً بعد الحفظ
-                    'encoding': encoding,
-                    'externally_modified': False, # لا يوجد تعديل خارجي بعد الحفظ
-                    'last_known_editor_content': content, # تحديث آخر محتوى للمحرر
-                    'last_known_disk_content_hash': file_hash # تحديث هاش محتوى القرص بعد الحفظ
-                })
-            else: # إذا لم يكن الملف مفتوحاً من قبل، أضفه (قد يحدث عند save_file_as)
-                self.open_files[file_path] = {
-                    'content': content,
-                    'modified': False,
-                    'encoding': encoding,
-                    'line_ending': self._detect_line_ending(content),
-                    'externally_modified': False,
-                    'externally_deleted': False,
-                    'last_known_editor_content': content,
-                    'last_known_disk_content_hash': file_hash
-                }
+        except Exception as e:
+            error_msg = f"فشل في حفظ الملف: {e}"
+            self.error_occurred.emit(error_msg)
+            logger.error(error_msg)
+            return False
+        finally:
+            QTimer.singleShot(500, self._reset_ignore_watcher_flag) # إعادة تعيين العلامة بعد فترة قصيرة
+
+    def save_file_async(self, file_path: str, content: str, on_done: Callable[[bool], None],
+                        encoding: str = None):
+        """
+        حفظ ملف مع تنفيذ الكتابة في QThreadPool؛ on_done(success) يُستدعى في خيط الواجهة
+        بعد تحديث open_files وإرسال file_saved كما في save_file.
+        """
+        if self._defer_while_saving(file_path, lambda: self.save_file_async(file_path, content, on_done, encoding)):
+            return
+        self._saving_paths[file_path] = []
+        self._ignore_watcher_events = True # تجاهل حدث المراقب
+        encoding = encoding or self.file_encoding or 'utf-8'
+        try:
+            # النسخة الاحتياطية رابط صلب سريع ويجب أن تسبق استبدال الملف
+            if self.backup_enabled and os.path.exists(file_path):
+                self._queue_backup(file_path)
+        except Exception as e:
+            logger.warning(f"Backup before async save failed for {file_path}: {e}")
+        
+        result = {}
+        
+        def write():
+            result['hash'] = self._write_file_sync(file_path, content, encoding)
+        
+        def finished(error: Optional[Exception]):
+            try:
+                if error is not None:
+                    error_msg = f"فشل في حفظ الملف: {error}"
+                    self.error_occurred.emit(error_msg)
+                    logger.error(error_msg)
+                    on_done(False)
+                    return
+                self._finish_save(file_path, content, encoding, result['hash'])
+                on_done(True)
+            finally:
+                self._run_deferred_saves(file_path)
+        
+        self._run_async(write, op_id=self._generate_operation_id(), on_done=finished)
+
+    def _defer_while_saving(self, file_path: str, operation: Callable[[], None]) -> bool:
+        """تأجيل عملية كتابة على ملف يجري حفظه في المجمع، حتى لا تتداخل الكتابتان"""
+        pending = self._saving_paths.get(file_path)
+        if pending is None:
+            return False
+        pending.append(operation)
+        logger.debug(f"Deferred write to {file_path} until the running save finishes")
+        return True
+
+    def _run_deferred_saves(self, file_path: str):
+        """تنفيذ العمليات المؤجلة بعد انتهاء الحفظ في المجمع"""
+        pending = self._saving_paths.pop(file_path, [])
+        for index, operation in enumerate(pending):
+            operation()
+            if file_path in self._saving_paths:
+                # بدأ حفظ غير متزامن جديد: تنتظر بقية العمليات انتهاءه
+                self._saving_paths[file_path].extend(pending[index + 1:])
+                return
+
+    @staticmethod
+    def _write_file_sync(file_path: str, content: str, encoding: str) -> str:
+        """الجزء الحاجز من الحفظ: الكتابة الذرية وحساب هاش المحتوى"""
+        # التأكد من وجود المجلد الأب
+        parent_dir = os.path.dirname(file_path)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir, exist_ok=True)
+        
+        # كتابة الملف
+        _atomic_write_text(file_path, content, encoding)
+        return hashlib.md5(content.encode(encoding, errors='ignore')).hexdigest() # حساب الهاش عند الحفظ
+
+    def _finish_save(self, file_path: str, content: str, encoding: str, file_hash: str):
+        """تحديث الحالة الداخلية وإرسال الإشارات بعد كتابة الملف"""
+        # تحديث الملفات المفتوحة
+        self._dirty_paths.discard(file_path)
+        file_info = self.open_files.get(file_path)
+        if file_info is not None:
+            file_info.update({
+                'content': content, 
+                'modified': False, # لم يعد معدلاً بعد الحفظ
+                'encoding': encoding,
+                'externally_modified': False, # لا يوجد تعديل خارجي بعد الحفظ
+                'last_known_editor_content': content, # تحديث آخر محتوى للمحرر
+                'last_known_disk_content_hash': file_hash # تحديث هاش محتوى القرص بعد الحفظ
+            })
+        else: # إذا لم يكن الملف مفتوحاً من قبل، أضفه (قد يحدث عند save_file_as)
+            self.open_files[file_path] = {
+                'content': content,
+                'modified': False,
+                'encoding': encoding,
+                'line_ending': self._detect_line_ending(content),
+                'externally_modified': False,
+                'externally_deleted': False,
+                'last_known_editor_content': content,
+                'last_known_disk_content_hash': file_hash
+            }
+        
+        # إضافة إلى التاريخ
+        operation = FileOperation('save', file_path, metadata={'content': content})
+        self.history_manager.add_operation(operation)
+        
+        # إضافة إلى الملفات الأخيرة
+        self.add_recent_file(file_path)
+        
+        # إرسال الإشارة
+        self.file_saved.emit(file_path)
+        
+        logger.info(f"File saved: {file_path}")
+
+    def append_file(self, file_path: str, text: str, encoding: str = None,
+                    on_done: Optional[Callable[[Optional[str]], None]] = None) -> Optional[str]:
+        """
+        إلحاق نص بنهاية ملف وإرجاع المحتوى الجديد (أو None عند الفشل).
+        إذا كان محتوى القرص معروفاً من open_files (ملف مفتوح غير معدّل) لا يُقرأ الملف من القرص؛
+        ومع تعطيل النسخ الاحتياطية يُكتب النص الملحق فقط بدلاً من إعادة كتابة الملف كاملاً.
+        مع on_done يُنفَّذ الحفظ الكامل في QThreadPool وتصل النتيجة عبر on_done(new_content أو None) فقط.
+        """
+        if self._defer_while_saving(file_path, lambda: self.append_file(file_path, text, encoding, on_done)):
+            return None
+        file_info = self.open_files.get(file_path)
+        if file_info is None or file_info.get('modified') or file_info.get('externally_modified'):
+            # محتوى القرص غير معروف بدقة: القراءة ثم الحفظ الكامل
+            # (open_file يُرجع المسار؛ المحتوى المقروء يُؤخذ من open_files)
+            if self.open_file(file_path) is None:
+                return self._append_done(None, on_done)
+            return self._save_appended(file_path, self.open_files[file_path]['content'] + text, encoding, on_done)
+        
+        new_content = file_info['content'] + text
+        if self.backup_enabled:
+            # النسخة الاحتياطية رابط صلب للـ inode الحالي، فالإلحاق في مكانه سيعدّلها أيضاً؛
+            # الحفظ الذري يكتب inode جديداً
+            return self._save_appended(file_path, new_content, encoding, on_done)
+        
+        try:
+            self._ignore_watcher_events = True # تجاهل حدث المراقب
+            encoding = encoding or file_info.get('encoding') or self.file_encoding or 'utf-8'
+            # وضع 'a' في TextIOWrapper لا يكرر BOM الترميزات مثل utf-16 عند الإلحاق
+            with open(file_path, 'a', encoding=encoding, newline='') as f:
+                f.write(text)
+            file_info.update({
+                'content': new_content,
+                'modified': False,
+                'encoding': encoding,
+                'last_known_editor_content': new_content,
+                'last_known_disk_content_hash': hashlib.md5(new_content.encode(encoding, errors='ignore')).hexdigest()
+            })
+            self._dirty_paths.discard(file_path)
             
-            # إضافة إلى التاريخ
-            operation = FileOperation('save', file_path, metadata={'content': content})
+            operation = FileOperation('save', file_path, metadata={'content': new_content})
             self.history_manager.add_operation(operation)
-            
-            # إضافة إلى الملفات الأخيرة
             self.add_recent_file(file_path)
-            
-            # إرسال الإشارة
             self.file_saved.emit(file_path)
             
-            logger.info(f"File saved: {file_path}")
-            return True
+            logger.info(f"File appended: {file_path}")
+            result = new_content
             
         except Exception as e:
             error_msg = f"فشل في حفظ الملف: {e}"
             self.error_occurred.emit(error_msg)
             logger.error(error_msg)
-            return False
+            result = None
         finally:
-            QTimer.singleShot(500, self._reset_ignore_watcher_flag) # إعادة تعيين العلامة بعد فترة قصيرة
+            QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        return self._append_done(result, on_done)
+
+    def _save_appended(self, file_path: str, new_content: str, encoding: Optional[str],
+                       on_done: Optional[Callable[[Optional[str]], None]]) -> Optional[str]:
+        """الحفظ الكامل لمحتوى ملحق، متزامناً أو عبر save_file_async"""
+        if on_done is None:
+            return new_content if self.save_file(file_path, new_content, encoding) else None
+        self.save_file_async(file_path, new_content,
+                             lambda success: on_done(new_content if success else None), encoding)
+        return None
+
+    @staticmethod
+    def _append_done(result: Optional[str], on_done: Optional[Callable[[Optional[str]], None]]) -> Optional[str]:
+        if on_done is not None:
+            on_done(result)
+        return result
 
     def save_file_as(self, current_path: str, content: str, new_path: str = None) -> Optional[str]:
         """حفظ ملف باسم جديد"""
@@ -1212,8 +1710,8 @@ class UnifiedFileManager(QObject):
                 return None
         
         # عند الحفظ باسم، إذا كان الملف القديم مفتوحاً، أغلقه من open_files
-        if current_path and current_path in self.open_files:
-            del self.open_files[current_path] # إزالة الإدخال القديم
+        if current_path:
+            self.open_files.pop(current_path, None) # إزالة الإدخال القديم
 
         if self.save_file(new_path, content):
             # إذا نجح الحفظ باسم، أضف الملف الجديد إلى الملفات المفتوحة
@@ -1223,10 +1721,9 @@ class UnifiedFileManager(QObject):
         
     def close_file(self, file_path: str, save_if_modified: bool = True) -> bool:
         """إغلاق ملف"""
-        if file_path not in self.open_files:
+        file_info = self.open_files.get(file_path)
+        if file_info is None:
             return True # الملف ليس مفتوحاً بالفعل
-            
-        file_info = self.open_files[file_path]
         
         # فحص التعديلات
         if file_info['modified'] and save_if_modified:
@@ -1246,36 +1743,31 @@ class UnifiedFileManager(QObject):
         
         # إزالة من الملفات المفتوحة
         del self.open_files[file_path]
+        self._dirty_paths.discard(file_path)
         
         logger.info(f"File closed: {file_path}")
         return True
         
     def delete_file(self, file_path: str) -> bool:
-        """حذف ملف أو مجلد"""
+        """حذف ملف أو مجلد (التنفيذ في خيط عامل؛ النتيجة عبر operation_completed)"""
         operation_id = self._generate_operation_id()
         
-        try:
-            if not os.path.exists(file_path):
-                self.error_occurred.emit(f"الملف غير موجود: {file_path}")
-                return False
-                
-            # إغلاق الملف إذا كان مفتوحاً في المحرر (دون حفظ)
-            if file_path in self.open_files:
-                self.close_file(file_path, save_if_modified=False)
-                # يجب إزالة الملف من open_files في close_file، لذا لا داعي لحذفه هنا مرة أخرى.
+        st = _try_stat(file_path, follow_symlinks=False)
+        if st is None:
+            self.error_occurred.emit(f"الملف غير موجود: {file_path}")
+            return False
             
-            self._ignore_watcher_events = True # تجاهل حدث المراقب
-            # إنشاء نسخة احتياطية (إذا كان ملفاً)
-            if self.backup_enabled and os.path.isfile(file_path): # Backup only for files
-                self._create_backup(file_path)
-            
-            # حذف الملف أو المجلد
-            if os.path.isdir(file_path):
-                shutil.rmtree(file_path)
-                logger.debug(f"Directory removed: {file_path}")
-            else:
-                os.remove(file_path)
-                logger.debug(f"File removed: {file_path}")
+        # إغلاق الملف إذا كان مفتوحاً في المحرر (دون حفظ)
+        if file_path in self.open_files:
+            self.close_file(file_path, save_if_modified=False)
+            # يجب إزالة الملف من open_files في close_file، لذا لا داعي لحذفه هنا مرة أخرى.
+        
+        def on_done(error: Optional[Exception]):
+            self._exists_cache.pop(file_path, None)
+            self._forget_backup_dirs(file_path)
+            if error is not None:
+                self._fail_operation(operation_id, f"فشل في حذف الملف: {error}")
+                return
             
             # إضافة إلى التاريخ (فقط لتتبع العملية، لا يمكن التراجع عن الحذف بدون سلة مهملات)
             operation = FileOperation('delete', file_path)
@@ -1286,45 +1778,62 @@ class UnifiedFileManager(QObject):
             self.operation_completed.emit(operation_id, True, f"تم حذف: {os.path.basename(file_path)}")
             
             logger.info(f"File deleted: {file_path}")
-            return True
-            
-        except Exception as e:
-            error_msg = f"فشل في حذف الملف: {e}"
-            self.error_occurred.emit(error_msg)
-            self.operation_completed.emit(operation_id, False, error_msg)
-            logger.error(error_msg)
-            return False
-        finally:
-            QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        
+        self._ignore_watcher_events = True # تجاهل حدث المراقب
+        self._run_async(self._delete_file_sync, file_path, st.st_mode, op_id=operation_id, on_done=on_done,
+                        report_progress=stat.S_ISDIR(st.st_mode))
+        return True
+    
+    def _delete_file_sync(self, file_path: str, mode: int,
+                          progress: Optional[Callable[[float], None]] = None):
+        """الجزء الحاجز من الحذف: نسخة احتياطية ثم حذف"""
+        # إنشاء نسخة احتياطية (إذا كان ملفاً)
+        if self.backup_enabled and stat.S_ISREG(mode): # Backup only for files
+            self._create_backup(file_path)
+        
+        # حذف الملف أو المجلد (الرابط الرمزي يُحذف نفسه ولا يُتبع)
+        if stat.S_ISDIR(mode):
+            on_file = None
+            if progress is not None:
+                on_file = _progress_ticker(_count_tree_files(file_path, follow_symlinks=False), progress)
+            _rmtree_fast(file_path, on_file)
+            logger.debug(f"Directory removed: {file_path}")
+        else:
+            os.remove(file_path)
+            logger.debug(f"File removed: {file_path}")
             
     def rename_file(self, old_path: str, new_path: str) -> bool:
         """إعادة تسمية ملف أو مجلد"""
         operation_id = self._generate_operation_id()
         
         try:
-            if not os.path.exists(old_path):
+            if _try_stat(old_path, follow_symlinks=False) is None:
                 self.error_occurred.emit(f"الملف غير موجود: {old_path}")
                 return False
-                
-            if os.path.exists(new_path):
-                self.error_occurred.emit(f"الملف موجود بالفعل: {new_path}")
-                return False
             
             self._ignore_watcher_events = True # تجاهل حدث المراقب
-            # إعادة التسمية
-            os.rename(old_path, new_path)
+            # إعادة التسمية (ترفض الهدف الموجود ذرياً بدلاً من فحص مسبق)
+            try:
+                _rename_noreplace(old_path, new_path)
+            except FileExistsError:
+                self.error_occurred.emit(f"الملف موجود بالفعل: {new_path}")
+                return False
+            self._exists_cache.pop(old_path, None)
+            self._exists_cache.pop(new_path, None)
             
             # تحديث الملفات المفتوحة
-            if old_path in self.open_files:
-                self.open_files[new_path] = self.open_files.pop(old_path)
-                # تحديث مسار الملف المحفوظ في القاموس الداخلي
-                self.open_files[new_path]['content'] = self.open_files[new_path]['content'] # المحتوى لا يتغير
-                self.open_files[new_path]['modified'] = True # قد يحتاج المستخدم لحفظه بالاسم الجديد
+            file_info = self.open_files.pop(old_path, None)
+            if file_info is not None:
+                self.open_files[new_path] = file_info # المحتوى لا يتغير
+                file_info['modified'] = True # قد يحتاج المستخدم لحفظه بالاسم الجديد
+                self._dirty_paths.discard(old_path)
+                self._dirty_paths.add(new_path)
             
             # تحديث الملفات الأخيرة
             if old_path in self.recent_files:
-                index = self.recent_files.index(old_path)
-                self.recent_files[index] = new_path
+                self.recent_files = OrderedDict(
+                    (new_path if k == old_path else k, v) for k, v in self.recent_files.items()
+                )
             
             # إضافة إلى التاريخ
             operation = FileOperation('rename', old_path, new_path)
@@ -1347,25 +1856,20 @@ class UnifiedFileManager(QObject):
             QTimer.singleShot(500, self._reset_ignore_watcher_flag)
             
     def copy_file(self, source_path: str, dest_path: str) -> bool:
-        """نسخ ملف أو مجلد"""
+        """نسخ ملف أو مجلد (التنفيذ في خيط عامل؛ النتيجة عبر operation_completed)"""
         operation_id = self._generate_operation_id()
         
-        try:
-            if not os.path.exists(source_path):
-                self.error_occurred.emit(f"الملف المصدر غير موجود: {source_path}")
-                return False
-            
-            # التأكد من وجود المجلد الهدف
-            dest_dir = os.path.dirname(dest_path)
-            if dest_dir and not os.path.exists(dest_dir):
-                os.makedirs(dest_dir, exist_ok=True)
-            
-            self._ignore_watcher_events = True # تجاهل حدث المراقب
-            # نسخ الملف أو المجلد
-            if os.path.isdir(source_path):
-                shutil.copytree(source_path, dest_path)
-            else:
-                shutil.copy2(source_path, dest_path)
+        # النسخ يتبع الروابط الرمزية، لذا stat وليس lstat
+        st = _try_stat(source_path)
+        if st is None:
+            self.error_occurred.emit(f"الملف المصدر غير موجود: {source_path}")
+            return False
+        
+        def on_done(error: Optional[Exception]):
+            self._exists_cache.pop(dest_path, None)
+            if error is not None:
+                self._fail_operation(operation_id, f"فشل في نسخ الملف: {error}")
+                return
             
             # إضافة إلى التاريخ
             operation = FileOperation('copy', source_path, dest_path)
@@ -1376,43 +1880,59 @@ class UnifiedFileManager(QObject):
             self.operation_completed.emit(operation_id, True, f"تم نسخ: {os.path.basename(dest_path)}")
             
             logger.info(f"File copied: {source_path} -> {dest_path}")
-            return True
-            
-        except Exception as e:
-            error_msg = f"فشل في نسخ الملف: {e}"
-            self.error_occurred.emit(error_msg)
-            self.operation_completed.emit(operation_id, False, error_msg)
-            logger.error(error_msg)
-            return False
-        finally:
-            QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        
+        self._ignore_watcher_events = True # تجاهل حدث المراقب
+        self._run_async(self._copy_file_sync, source_path, dest_path, stat.S_ISDIR(st.st_mode),
+                        op_id=operation_id, on_done=on_done, report_progress=stat.S_ISDIR(st.st_mode))
+        return True
+    
+    def _copy_file_sync(self, source_path: str, dest_path: str, is_dir: Optional[bool] = None,
+                        progress: Optional[Callable[[float], None]] = None):
+        """الجزء الحاجز من النسخ"""
+        # التأكد من وجود المجلد الهدف
+        dest_dir = os.path.dirname(dest_path)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        
+        # نسخ الملف أو المجلد
+        if is_dir is None:
+            is_dir = os.path.isdir(source_path)
+        if is_dir:
+            on_file = None
+            if progress is not None:
+                on_file = _progress_ticker(_count_tree_files(source_path, follow_symlinks=True), progress)
+            _copytree_fast(source_path, dest_path, on_file)
+        else:
+            _fastcopy_linux(source_path, dest_path)
             
     def move_file(self, source_path: str, dest_path: str) -> bool:
-        """نقل ملف أو مجلد"""
+        """نقل ملف أو مجلد (التنفيذ في خيط عامل؛ النتيجة عبر operation_completed)"""
         operation_id = self._generate_operation_id()
         
-        try:
-            if not os.path.exists(source_path):
-                self.error_occurred.emit(f"الملف المصدر غير موجود: {source_path}")
-                return False
-                
-            # التأكد من وجود المجلد الهدف
-            dest_dir = os.path.dirname(dest_path)
-            if dest_dir and not os.path.exists(dest_dir):
-                os.makedirs(dest_dir, exist_ok=True)
-            
-            self._ignore_watcher_events = True # تجاهل حدث المراقب
-            # نقل الملف
-            shutil.move(source_path, dest_path)
+        if _try_stat(source_path, follow_symlinks=False) is None:
+            self.error_occurred.emit(f"الملف المصدر غير موجود: {source_path}")
+            return False
+        
+        def on_done(error: Optional[Exception]):
+            self._exists_cache.pop(source_path, None)
+            self._exists_cache.pop(dest_path, None)
+            if error is not None:
+                self._fail_operation(operation_id, f"فشل في نقل الملف: {error}")
+                return
             
             # تحديث الملفات المفتوحة
-            if source_path in self.open_files:
-                self.open_files[dest_path] = self.open_files.pop(source_path)
+            file_info = self.open_files.pop(source_path, None)
+            if file_info is not None:
+                self.open_files[dest_path] = file_info
+                if source_path in self._dirty_paths:
+                    self._dirty_paths.discard(source_path)
+                    self._dirty_paths.add(dest_path)
             
             # تحديث الملفات الأخيرة
             if source_path in self.recent_files:
-                index = self.recent_files.index(source_path)
-                self.recent_files[index] = dest_path
+                self.recent_files = OrderedDict(
+                    (dest_path if k == source_path else k, v) for k, v in self.recent_files.items()
+                )
             
             # إضافة إلى التاريخ
             operation = FileOperation('move', source_path, dest_path)
@@ -1423,28 +1943,32 @@ class UnifiedFileManager(QObject):
             self.operation_completed.emit(operation_id, True, f"تم نقل: {os.path.basename(dest_path)}")
             
             logger.info(f"File moved: {source_path} -> {dest_path}")
-            return True
-            
-        except Exception as e:
-            error_msg = f"فشل في نقل الملف: {e}"
-            self.error_occurred.emit(error_msg)
-            self.operation_completed.emit(operation_id, False, error_msg)
-            logger.error(error_msg)
-            return False
-        finally:
-            QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        
+        self._ignore_watcher_events = True # تجاهل حدث المراقب
+        self._run_async(self._move_file_sync, source_path, dest_path, op_id=operation_id, on_done=on_done)
+        return True
+    
+    def _move_file_sync(self, source_path: str, dest_path: str):
+        """الجزء الحاجز من النقل"""
+        # التأكد من وجود المجلد الهدف
+        dest_dir = os.path.dirname(dest_path)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        shutil.move(source_path, dest_path)
             
     def create_folder(self, folder_path: str) -> bool:
-        """إنشاء مجلد"""
+        """إنشاء مجلد (التنفيذ في خيط عامل؛ النتيجة عبر operation_completed)"""
         operation_id = self._generate_operation_id()
         
-        try:
-            if os.path.exists(folder_path):
-                self.error_occurred.emit(f"المجلد موجود بالفعل: {folder_path}")
-                return False
-            
-            self._ignore_watcher_events = True # تجاهل حدث المراقب
-            os.makedirs(folder_path, exist_ok=True)
+        if os.path.exists(folder_path):
+            self.error_occurred.emit(f"المجلد موجود بالفعل: {folder_path}")
+            return False
+        
+        def on_done(error: Optional[Exception]):
+            self._exists_cache.pop(folder_path, None)
+            if error is not None:
+                self._fail_operation(operation_id, f"فشل في إنشاء المجلد: {error}")
+                return
             
             # إضافة إلى التاريخ
             operation = FileOperation('create_folder', folder_path)
@@ -1455,16 +1979,53 @@ class UnifiedFileManager(QObject):
             self.operation_completed.emit(operation_id, True, f"تم إنشاء المجلد: {os.path.basename(folder_path)}")
             
             logger.info(f"Folder created: {folder_path}")
-            return True
-            
-        except Exception as e:
-            error_msg = f"فشل في إنشاء المجلد: {e}"
-            self.error_occurred.emit(error_msg)
-            self.operation_completed.emit(operation_id, False, error_msg)
-            logger.error(error_msg)
-            return False
-        finally:
-            QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        
+        self._ignore_watcher_events = True # تجاهل حدث المراقب
+        self._run_async(self._create_folder_sync, folder_path, op_id=operation_id, on_done=on_done)
+        return True
+    
+    def _create_folder_sync(self, folder_path: str):
+        """الجزء الحاجز من إنشاء المجلد"""
+        os.makedirs(folder_path, exist_ok=True)
+    
+    def _forget_backup_dirs(self, path: str):
+        """نسيان مجلدات النسخ الاحتياطية المخزنة التي قد تختفي بحذف المسار"""
+        prefix = os.path.join(path, '')
+        with self._backup_dirs_lock:
+            if os.path.basename(path) == '.backups':
+                self._backup_dirs_ready.discard(os.path.dirname(path))
+            self._backup_dirs_ready.difference_update(
+                [d for d in self._backup_dirs_ready if d == path or d.startswith(prefix)]
+            )
+    
+    def _run_async(self, fn: Callable, *args, op_id: str, on_done: Callable[[Optional[Exception]], None],
+                   report_progress: bool = False):
+        """
+        تشغيل الجزء الحاجز من عملية ملف في QThreadPool. on_done يُستدعى في خيط الواجهة
+        (الإشارة تُنقل عبر اتصال مؤجل) مع الاستثناء أو None.
+        report_progress: تمرير progress(fraction) إلى fn وإعادة بثه عبر operation_progress.
+        """
+        runnable = _FileOpRunnable(op_id, fn, args, report_progress)
+        if report_progress:
+            runnable.signals.progress.connect(self.operation_progress.emit)
+        
+        def finished(finished_op_id: str, error: Optional[Exception]):
+            self.pending_operations.pop(finished_op_id, None)
+            try:
+                on_done(error)
+            finally:
+                QTimer.singleShot(500, self._reset_ignore_watcher_flag)
+        
+        runnable.signals.finished.connect(finished)
+        # الاحتفاظ بمرجع حتى انتهاء العملية
+        self.pending_operations[op_id] = runnable
+        self._pool.start(runnable)
+    
+    def _fail_operation(self, operation_id: str, error_msg: str):
+        """إرسال إشارات فشل عملية ملف"""
+        self.error_occurred.emit(error_msg)
+        self.operation_completed.emit(operation_id, False, error_msg)
+        logger.error(error_msg)
             
     def search_files(self, pattern: str, root_path: str = None, 
                      include_content: bool = False,
@@ -1475,86 +2036,96 @@ class UnifiedFileManager(QObject):
         if not root_path:
             root_path = self.current_folder or os.path.expanduser("~")
             
-        # تشغيل البحث في خيط منفصل لتجنب تجميد UI
-        def search_thread():
-            try:
-                results = self.search_engine.search_files(
-                    root_path, pattern, include_content, file_extensions
-                )
-                self.search_completed.emit(search_id, results)
-            except Exception as e:
-                logger.error(f"Search error: {e}")
-                self.search_completed.emit(search_id, [])
+        # بحث جديد يلغي السابق (مثلاً أثناء الكتابة في حقل البحث)
+        if self._active_search is not None:
+            self._active_search.cancel.set()
         
-        threading.Thread(target=search_thread, daemon=True).start()
+        # تشغيل البحث في QThreadPool لتجنب تجميد UI دون إنشاء خيط لكل بحث
+        job = _SearchJob(search_id, self.search_engine, root_path, pattern, include_content, file_extensions)
+        job.signals.finished.connect(self._on_search_finished)
+        self._active_search = job
+        self._pool.start(job)
         return search_id
+    
+    def _on_search_finished(self, search_id: str, results: list):
+        """استلام نتائج البحث في خيط الواجهة"""
+        if self._active_search is not None and self._active_search.search_id == search_id:
+            self._active_search = None
+        self.search_completed.emit(search_id, results)
         
     def compare_files(self, file1: str, file2: str) -> Dict[str, Any]:
         """مقارنة ملفين"""
         return self.comparison_engine.compare_files(file1, file2)
         
+    def _exists_cached(self, path: str, ttl: float = 1.0) -> bool:
+        """os.path.exists مع تخزين النتيجة لمدة ttl ثانية"""
+        now = time.monotonic()
+        cached = self._exists_cache.get(path)
+        if cached is not None and now - cached[0] < ttl:
+            return cached[1]
+        exists = os.path.exists(path)
+        self._exists_cache[path] = (now, exists)
+        return exists
+    
     def add_recent_file(self, file_path: str):
         """إضافة ملف إلى القائمة الأخيرة"""
-        if file_path in self.recent_files:
-            self.recent_files.remove(file_path)
-            
-        self.recent_files.insert(0, file_path)
+        self._exists_cache.pop(file_path, None)
+        self.recent_files.pop(file_path, None)
+        self.recent_files[file_path] = None
         
         # الحفاظ على حد أقصى 20 ملف
-        if len(self.recent_files) > 20:
-            self.recent_files = self.recent_files[:20]
+        while len(self.recent_files) > 20:
+            self.recent_files.popitem(last=False)
             
     def add_recent_folder(self, folder_path: str):
         """إضافة مجلد إلى القائمة الأخيرة"""
-        if folder_path in self.recent_folders:
-            self.recent_folders.remove(folder_path)
-            
-        self.recent_folders.insert(0, folder_path)
+        self._exists_cache.pop(folder_path, None)
+        self.recent_folders.pop(folder_path, None)
+        self.recent_folders[folder_path] = None
         
         # الحفاظ على حد أقصى 10 مجلدات
-        if len(self.recent_folders) > 10:
-            self.recent_folders = self.recent_folders[:10]
+        while len(self.recent_folders) > 10:
+            self.recent_folders.popitem(last=False)
             
     def add_bookmark(self, path: str, name: str = None):
         """إضافة إشارة مرجعية"""
+        self._exists_cache.pop(path, None)
         if not name:
             name = os.path.basename(path)
             
-        bookmark = {'path': path, 'name': name, 'timestamp': time.time()}
-        
-        # إزالة الإشارة إذا كانت موجودة
-        self.bookmarks = [b for b in self.bookmarks if b['path'] != path]
-        
-        self.bookmarks.append(bookmark)
+        # إزالة الإشارة إذا كانت موجودة لتنتقل إلى آخر القائمة
+        self.bookmarks.pop(path, None)
+        self.bookmarks[path] = {'path': path, 'name': name, 'timestamp': time.time()}
         
     def remove_bookmark(self, path: str):
         """إزالة إشارة مرجعية"""
-        self.bookmarks = [b for b in self.bookmarks if b['path'] != path]
+        self.bookmarks.pop(path, None)
         
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """الحصول على معلومات الملف"""
         try:
-            if not os.path.exists(file_path):
+            st = _try_stat(file_path)
+            if st is None:
                 return {'error': 'الملف غير موجود'}
                 
-            stat = os.stat(file_path)
             info = {
                 'path': file_path,
                 'name': os.path.basename(file_path),
-                'size': stat.st_size,
-                'modified': stat.st_mtime,
-                'created': stat.st_ctime,
-                'accessed': stat.st_atime,
-                'is_file': os.path.isfile(file_path),
-                'is_dir': os.path.isdir(file_path),
+                'size': st.st_size,
+                'modified': st.st_mtime,
+                'created': st.st_ctime,
+                'accessed': st.st_atime,
+                'is_file': stat.S_ISREG(st.st_mode),
+                'is_dir': stat.S_ISDIR(st.st_mode),
                 'extension': os.path.splitext(file_path)[1],
-                'permissions': oct(stat.st_mode)[-3:],
+                'permissions': oct(st.st_mode)[-3:],
                 'mime_type': mimetypes.guess_type(file_path)[0],
-                'is_open': file_path in self.open_files
+                'is_open': False
             }
             
-            if file_path in self.open_files:
-                file_data = self.open_files[file_path]
+            file_data = self.open_files.get(file_path)
+            if file_data is not None:
+                info['is_open'] = True
                 info.update({
                     'encoding': file_data['encoding'],
                     'line_ending': file_data['line_ending'],
@@ -1576,40 +2147,42 @@ class UnifiedFileManager(QObject):
             if not os.path.isdir(folder_path):
                 return {'files': [], 'folders': [], 'error': 'المجلد غير صالح'}
                 
-            items = os.listdir(folder_path)
             files = []
             folders = []
             
-            for item in items:
-                # تجاهل بعض المجلدات الخاصة التي لا ينبغي أن تظهر في شجرة الملفات
-                if item in ['.git', '__pycache__', 'node_modules', '.vscode', '.idea', '.venv', 'build', 'dist', 'temp', '.DS_Store', '.backups']:
-                    continue
+            # os.scandir يعطي نوع العنصر من readdir ويخزن stat، بدلاً من عدة استدعاءات stat لكل عنصر
+            with os.scandir(folder_path) as it:
+                for entry in it:
+                    item = entry.name
+                    # تجاهل بعض المجلدات الخاصة التي لا ينبغي أن تظهر في شجرة الملفات
+                    if item in _FOLDER_LISTING_IGNORED:
+                        continue
 
-                if not show_hidden and item.startswith('.'):
-                    continue
-                    
-                item_path = os.path.join(folder_path, item)
-                
-                try:
-                    stat = os.stat(item_path)
-                    item_info = {
-                        'name': item,
-                        'path': item_path,
-                        'size': stat.st_size,
-                        'modified': stat.st_mtime,
-                        'is_file': os.path.isfile(item_path),
-                        'is_dir': os.path.isdir(item_path),
-                        'extension': os.path.splitext(item)[1] if os.path.isfile(item_path) else '',
-                        'mime_type': mimetypes.guess_type(item_path)[0] if os.path.isfile(item_path) else None
-                    }
+                    if not show_hidden and item.startswith('.'):
+                        continue
                     
-                    if item_info['is_file']:
-                        files.append(item_info)
-                    else:
-                        folders.append(item_info)
+                    try:
+                        st = entry.stat()
+                        is_file = entry.is_file()
+                        extension = os.path.splitext(item)[1] if is_file else ''
+                        item_info = {
+                            'name': item,
+                            'path': entry.path,
+                            'size': st.st_size,
+                            'modified': st.st_mtime,
+                            'is_file': is_file,
+                            'is_dir': entry.is_dir(),
+                            'extension': extension,
+                            'mime_type': _guess_mime_type(extension) if is_file else None
+                        }
                         
-                except OSError: # Permission denied or file disappeared
-                    continue
+                        if is_file:
+                            files.append(item_info)
+                        else:
+                            folders.append(item_info)
+                            
+                    except OSError: # Permission denied or file disappeared
+                        continue
                     
             # ترتيب العناصر
             # ترتيب المجلدات أولاً، ثم الملفات. ثم ترتيب أبجدي.
@@ -1714,10 +2287,7 @@ class UnifiedFileManager(QObject):
                     success = True
             elif operation.operation_type == 'copy': # إذا كانت نسخ، أعد النسخ
                 if os.path.exists(operation.source):
-                    if os.path.isdir(operation.source):
-                        shutil.copytree(operation.source, operation.destination)
-                    else:
-                        shutil.copy2(operation.source, operation.destination)
+                    self._copy_file_sync(operation.source, operation.destination)
                     logger.info(f"Redo: Re-copied item {operation.source} to {operation.destination}")
                     success = True
             elif operation.operation_type == 'save': # إعادة الحفظ تعني تطبيق نفس المحتوى مرة أخرى
@@ -1745,35 +2315,57 @@ class UnifiedFileManager(QObject):
             
     def _auto_save_all(self):
         """حفظ تلقائي لجميع الملفات المعدلة"""
-        if not self.auto_save_enabled:
+        if not self.auto_save_enabled or not self._dirty_paths:
             return
-            
-        for file_path, file_info in self.open_files.items():
-            if file_info['modified'] and not file_info['externally_modified']:
+        
+        # المرور على الملفات المعدلة فقط بدلاً من كل الملفات المفتوحة
+        for file_path in list(self._dirty_paths):
+            file_info = self.open_files.get(file_path)
+            if file_info is None or not file_info['modified']:
+                self._dirty_paths.discard(file_path)
+                continue
+            if file_path in self._saving_paths:
+                # محتوى المحرر هنا أقدم من الحفظ الجاري (مثلاً كتابة من AI)
+                continue
+            if not file_info['externally_modified']:
                 try:
                     self.save_file(file_path, file_info['content'], file_info['encoding'])
                     logger.debug(f"Auto-saved: {file_path}")
                 except Exception as e:
                     logger.error(f"Auto-save failed for {file_path}: {e}")
                     
+    def _backup_target(self, file_path: str) -> Tuple[str, str, str]:
+        """مجلد النسخ الاحتياطية (يُنشأ مرة واحدة لكل مجلد)، اسم الملف، ومسار نسخة جديدة بطابع زمني"""
+        parent = os.path.dirname(file_path)
+        backup_dir = os.path.join(parent, '.backups')
+        with self._backup_dirs_lock:
+            ready = parent in self._backup_dirs_ready
+        if not ready:
+            os.makedirs(backup_dir, exist_ok=True)
+            with self._backup_dirs_lock:
+                self._backup_dirs_ready.add(parent)
+        
+        # اسم النسخة الاحتياطية مع الطابع الزمني
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+        file_name = os.path.basename(file_path)
+        return backup_dir, file_name, os.path.join(backup_dir, f"{file_name}.{timestamp}.backup")
+    
     def _create_backup(self, file_path: str):
-        """إنشاء نسخة احتياطية"""
+        """إنشاء نسخة احتياطية (متزامن؛ يُستخدم من خيوط العمليات العاملة)"""
         try:
             if not os.path.exists(file_path):
                 return
                 
-            # إنشاء مجلد النسخ الاحتياطية داخل مجلد الملف
-            backup_dir = os.path.join(os.path.dirname(file_path), '.backups')
-            os.makedirs(backup_dir, exist_ok=True)
+            backup_dir, file_name, backup_path = self._backup_target(file_path)
+            if os.path.lexists(backup_path):
+                return  # نسخة واحدة لكل ثانية؛ الأقدم تبقى
             
-            # اسم النسخة الاحتياطية مع الطابع الزمني
-            timestamp = time.strftime('%Y%m%d_%H%M%S')
-            file_name = os.path.basename(file_path)
-            backup_name = f"{file_name}.{timestamp}.backup"
-            backup_path = os.path.join(backup_dir, backup_name)
-            
-            # نسخ الملف
-            shutil.copy2(file_path, backup_path)
+            # رابط صلب يشارك الـ inode دون نسخ أي بايت؛ الحفظ يكتب ملفاً جديداً (os.replace)
+            # فتبقى النسخة بالمحتوى القديم. عند تعذره (EXDEV/EPERM/Windows...) نسخ فعلي
+            try:
+                os.link(os.path.realpath(file_path), backup_path)
+            except OSError:
+                _fastcopy_linux(file_path, backup_path)
             
             # تنظيف النسخ الاحتياطية القديمة
             self._cleanup_old_backups(backup_dir, file_name)
@@ -1781,26 +2373,79 @@ class UnifiedFileManager(QObject):
             logger.debug(f"Backup created: {backup_path}")
             
         except Exception as e:
+            # ربما حُذف مجلد النسخ خارجياً؛ يُعاد إنشاؤه في المرة القادمة
+            with self._backup_dirs_lock:
+                self._backup_dirs_ready.discard(os.path.dirname(file_path))
             logger.warning(f"Failed to create backup for {file_path}: {e}")
+    
+    def _queue_backup(self, file_path: str):
+        """
+        نسخة احتياطية قبل الحفظ دون حجز خيط الواجهة: تُثبَّت لقطة من المحتوى الحالي فوراً
+        (رابط صلب O(1)، أو واصف مفتوح على POSIX يبقى صالحاً بعد os.replace)، ثم ينسخ
+        وينظف الخيط الخلفي. الحفظ المتكرر لملف لم تُعالج نسخته بعد لا ينشئ نسخة جديدة.
+        """
+        if file_path in self._backup_pending:
+            return
+        snapshot = None
+        try:
+            backup_dir, file_name, backup_path = self._backup_target(file_path)
+            if os.path.lexists(backup_path):
+                return  # نسخة واحدة لكل ثانية؛ الأقدم تبقى
+            source = os.path.realpath(file_path)
+            try:
+                os.link(source, backup_path)
+            except OSError:
+                if os.name == 'posix':
+                    snapshot = open(source, 'rb')
+                else:
+                    _fastcopy_linux(source, backup_path)
+        except Exception as e:
+            with self._backup_dirs_lock:
+                self._backup_dirs_ready.discard(os.path.dirname(file_path))
+            logger.warning(f"Failed to create backup for {file_path}: {e}")
+            return
+        
+        self._backup_pending.add(file_path)
+        self._backup_queue.put((file_path, backup_dir, file_name, backup_path, snapshot))
+    
+    def _backup_worker(self):
+        """خيط النسخ الاحتياطية: نسخ اللقطات المفتوحة وتدوير النسخ القديمة"""
+        while True:
+            job = self._backup_queue.get()
+            if job is None:
+                break
+            file_path, backup_dir, file_name, backup_path, snapshot = job
+            self._backup_pending.discard(file_path)
+            try:
+                if snapshot is not None:
+                    with snapshot:
+                        _copy_from_fd(snapshot.fileno(), backup_path)
+                self._cleanup_old_backups(backup_dir, file_name)
+                logger.debug(f"Backup created: {backup_path}")
+            except Exception as e:
+                logger.warning(f"Failed to create backup for {file_path}: {e}")
             
     def _cleanup_old_backups(self, backup_dir: str, file_name: str):
         """تنظيف النسخ الاحتياطية القديمة"""
         try:
-            # البحث عن النسخ الاحتياطية لهذا الملف
-            backup_files = []
-            for item in os.listdir(backup_dir):
-                if item.startswith(file_name + '.') and item.endswith('.backup'):
-                    backup_path = os.path.join(backup_dir, item)
-                    backup_files.append((backup_path, os.path.getmtime(backup_path)))
+            # البحث عن النسخ الاحتياطية لهذا الملف: <name>.<YYYYmmdd_HHMMSS>.backup
+            prefix = file_name + '.'
+            stamp_len = len('YYYYmmdd_HHMMSS')
+            with os.scandir(backup_dir) as it:
+                backup_names = [
+                    entry.name for entry in it
+                    if entry.name.startswith(prefix) and entry.name.endswith('.backup')
+                    and len(entry.name) == len(prefix) + stamp_len + len('.backup')
+                ]
                     
-            # ترتيب حسب التاريخ (الأحدث أولاً)
-            backup_files.sort(key=lambda x: x[1], reverse=True)
+            # الطابع الزمني في الاسم يُرتّب أبجدياً كترتيب زمني، فلا حاجة لـ stat (الأحدث أولاً)
+            backup_names.sort(reverse=True)
             
             # حذف النسخ الزائدة
-            if len(backup_files) > self.max_backup_files:
-                for backup_path, _ in backup_files[self.max_backup_files:]:
-                    os.remove(backup_path)
-                    logger.debug(f"Removed old backup: {backup_path}")
+            for name in backup_names[self.max_backup_files:]:
+                backup_path = os.path.join(backup_dir, name)
+                os.remove(backup_path)
+                logger.debug(f"Removed old backup: {backup_path}")
                     
         except Exception as e:
             logger.warning(f"Failed to cleanup old backups: {e}")
@@ -1808,11 +2453,23 @@ class UnifiedFileManager(QObject):
     def _detect_file_encoding(self, file_path: str) -> str:
         """اكتشاف ترميز الملف باستخدام chardet إذا كان متاحاً"""
         try:
-            import chardet
-            
             with open(file_path, 'rb') as f:
-                raw_data = f.read(10000)  # قراءة أول 10KB
-                result = chardet.detect(raw_data)
+                # علامة BOM تحدد الترميز مباشرة دون الحاجة إلى chardet
+                head = f.read(4)
+                for bom, bom_encoding in _ENCODING_BOMS:
+                    if head.startswith(bom):
+                        return bom_encoding
+                
+                from chardet.universaldetector import UniversalDetector
+                
+                # تغذية الكاشف على دفعات صغيرة والتوقف فور حسمه (غالباً بعد 1-2KB)
+                detector = UniversalDetector()
+                detector.feed(head)
+                for chunk in iter(lambda: f.read(1024), b''):
+                    detector.feed(chunk)
+                    if detector.done or f.tell() >= 10000:  # حتى أول 10KB
+                        break
+                result = detector.close()
                 encoding = result['encoding']
                 
                 # استخدام الترميز المكتشف إذا كانت الثقة عالية
@@ -1827,115 +2484,80 @@ class UnifiedFileManager(QObject):
         # الافتراضي إذا لم يتم الكشف أو الثقة منخفضة
         return self.file_encoding
         
-    def _detect_encoding(self, content: str) -> str:
-        """اكتشاف ترميز المحتوى (للسلاسل النصية)"""
+    def _detect_encoding(self, content: Union[str, bytes]) -> str:
+        """
+        اكتشاف ترميز المحتوى. السلسلة النصية مفكوكة الترميز أصلاً فيُستخدم الترميز الافتراضي؛
+        أما البايتات الخام فتُفحص: BOM ثم utf-8 ثم chardet عند الفشل فقط.
+        """
+        if isinstance(content, str):
+            return self.file_encoding or 'utf-8'
+        
+        for bom, bom_encoding in _ENCODING_BOMS:
+            if content.startswith(bom):
+                return bom_encoding
+        
         try:
-            # محاولة ترميزات مختلفة
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1256'] # أضف cp1256 للعربية
-            
-            for encoding in encodings:
-                try:
-                    content.encode(encoding)
-                    return encoding # إذا نجح الترميز، استخدمه
-                except UnicodeEncodeError:
-                    continue # حاول الترميز التالي
-                    
-        except Exception:
-            pass # تجاهل أي أخطاء هنا
+            content.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        
+        try:
+            import chardet
+            result = chardet.detect(content[:10000])
+            if result['encoding'] and result['confidence'] > 0.7:
+                return result['encoding']
+        except ImportError:
+            logger.debug("chardet not installed. Falling back to default encoding.")
             
         return self.file_encoding # الافتراضي
         
     def _detect_line_ending(self, content: str) -> str:
-        """اكتشاف نوع نهاية السطر"""
-        if '\r\n' in content:
-            return 'crlf'
-        elif '\r' in content:
-            return 'cr'
-        elif '\n' in content:
-            return 'lf'
-        else:
-            return 'lf'  # افتراضي
+        """اكتشاف نوع نهاية السطر (من أول سطر فقط، بمرور واحد يتوقف مبكراً)"""
+        idx = content.find('\n')
+        if idx == -1:
+            return 'cr' if '\r' in content else 'lf'  # افتراضي lf
+        return 'crlf' if idx > 0 and content[idx - 1] == '\r' else 'lf'
             
     def _detect_file_type(self, file_path: str) -> str:
         """اكتشاف نوع الملف بناءً على الامتداد"""
-        _, ext = os.path.splitext(file_path)
-        ext = ext.lower()
-        
-        type_mapping = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.jsx': 'javascriptreact',
-            '.ts': 'typescript',
-            '.tsx': 'typescriptreact',
-            '.html': 'html',
-            '.htm': 'html',
-            '.css': 'css',
-            '.scss': 'scss',
-            '.less': 'less',
-            '.json': 'json',
-            '.xml': 'xml',
-            '.yaml': 'yaml',
-            '.yml': 'yaml',
-            '.md': 'markdown',
-            '.txt': 'text',
-            '.sql': 'sql',
-            '.sh': 'shellscript',
-            '.bash': 'shellscript',
-            '.php': 'php',
-            '.java': 'java',
-            '.c': 'c',
-            '.cpp': 'cpp',
-            '.cs': 'csharp',
-            '.go': 'go',
-            '.rs': 'rust',
-            '.swift': 'swift',
-            '.kt': 'kotlin',
-            '.rb': 'ruby',
-            '.pl': 'perl',
-            '.lua': 'lua',
-            '.r': 'r',
-            '.vue': 'vue',
-            '.svelte': 'svelte',
-            '.csv': 'csv',
-            '.log': 'log',
-            '.cfg': 'ini',
-            '.ini': 'ini',
-            '.conf': 'ini',
-            '.env': 'dotenv',
-            'dockerfile': 'dockerfile',
-            'makefile': 'makefile',
-        }
+        name = os.path.basename(file_path).lower()
         
         # بعض الملفات لا تحتوي على امتداد ولكن يمكن التعرف عليها بالاسم الكامل
-        if os.path.basename(file_path).lower() == 'dockerfile':
-            return 'dockerfile'
-        if os.path.basename(file_path).lower() == 'makefile':
-            return 'makefile'
-
-        return type_mapping.get(ext, 'unknown')
+        file_type = _FILE_NAME_TYPES.get(name)
+        if file_type:
+            return file_type
+        
+        _, dot, ext = name.rpartition('.')
+        if not dot:
+            return 'unknown'
+        return _FILE_TYPE_MAPPING.get(ext, 'unknown')
         
     def _generate_operation_id(self) -> str:
         """توليد معرف عملية فريد"""
         self.operation_counter += 1
-        return f"op_{self.operation_counter}_{int(time.time())}"
+        return f"op_{self.operation_counter}"
         
     def get_recent_files(self) -> List[str]:
         """الحصول على الملفات الأخيرة"""
         # تصفية الملفات غير الموجودة لضمان قائمة نظيفة
-        self.recent_files = [f for f in self.recent_files if os.path.exists(f)]
-        return self.recent_files.copy()
+        for f in [f for f in self.recent_files if not self._exists_cached(f)]:
+            del self.recent_files[f]
+        return list(reversed(self.recent_files))  # الأحدث أولاً
         
     def get_recent_folders(self) -> List[str]:
         """الحصول على المجلدات الأخيرة"""
         # تصفية المجلدات غير الموجودة لضمان قائمة نظيفة
-        self.recent_folders = [f for f in self.recent_folders if os.path.exists(f)]
-        return self.recent_folders.copy()
+        for f in [f for f in self.recent_folders if not self._exists_cached(f)]:
+            del self.recent_folders[f]
+        return list(reversed(self.recent_folders))  # الأحدث أولاً
         
     def get_bookmarks(self) -> List[Dict[str, Any]]:
         """الحصول على الإشارات المرجعية"""
         # تصفية الإشارات غير الموجودة لضمان قائمة نظيفة
-        self.bookmarks = [b for b in self.bookmarks if os.path.exists(b['path'])]
-        return self.bookmarks.copy()
+        for path in [path for path in self.bookmarks if not self._exists_cached(path)]:
+            del self.bookmarks[path]
+        return list(self.bookmarks.values())
         
     def get_open_files(self) -> Dict[str, Dict[str, Any]]:
         """الحصول على الملفات المفتوحة حالياً"""
@@ -1943,12 +2565,13 @@ class UnifiedFileManager(QObject):
         
     def is_file_modified(self, file_path: str) -> bool:
         """فحص ما إذا كان الملف معدلاً في المحرر (مقارنة بالقرص)"""
-        if file_path not in self.open_files:
+        file_info = self.open_files.get(file_path)
+        if file_info is None:
             return False
             
         # تحديث حالة 'modified' بناءً على آخر محتوى من المحرر وهاش القرص
         # هذا يضمن أن 'modified' تعكس الحالة الحقيقية (إذا تم تحديثها بواسطة mark_file_modified)
-        return self.open_files[file_path]['modified']
+        return file_info['modified']
         
     def mark_file_modified(self, file_path: str, current_editor_content: str, modified: Optional[bool] = None):
         """
@@ -1961,11 +2584,10 @@ class UnifiedFileManager(QObject):
             modified (Optional[bool]): حالة التعديل المراد فرضها (True/False).
                                        إذا كانت None، فسيتم تحديد الحالة بناءً على مقارنة المحتوى.
         """
-        if file_path not in self.open_files:
+        file_info = self.open_files.get(file_path)
+        if file_info is None:
             logger.warning(f"UnifiedFileManager: Attempted to mark non-open file '{file_path}' as modified.")
             return
-
-        file_info = self.open_files[file_path]
         
         # Determine the encoding to use for hashing
         encoding = file_info.get('encoding', self.file_encoding or 'utf-8')
@@ -1992,6 +2614,10 @@ class UnifiedFileManager(QObject):
 
         # تحديث المحتوى المخزن في الذاكرة ليمثل أحدث محتوى للمحرر
         file_info['content'] = current_editor_content
+        if file_info['modified']:
+            self._dirty_paths.add(file_path)
+        else:
+            self._dirty_paths.discard(file_path)
         
     def get_operation_history(self) -> List[FileOperation]:
         """الحصول على تاريخ العمليات"""
@@ -2017,6 +2643,11 @@ class UnifiedFileManager(QObject):
         # حفظ الإعدادات النهائية
         self.save_settings()
         
+        # إنهاء خيط النسخ الاحتياطية بعد إكمال ما في الطابور
+        if self._backup_thread.is_alive():
+            self._backup_queue.put(None)
+            self._backup_thread.join(timeout=5)
+        
         logger.info("Enhanced File Manager cleaned up successfully.")
         
     def __del__(self):